@@ -0,0 +1,111 @@
+"""
+Synthetic ihateani.me API data and Discord objects for the benchmarks.
+
+Everything is generated from a seeded random.Random so every run get
+the same dataset for the same size.
+"""
+
+import random
+import time
+import typing as t
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import discord
+
+from vtutils.groups import HOLOPRO_GROUPS, NIJISANJI_GROUPS
+from vtutils.render import create_live_embed
+
+PLATFORMS = ["youtube", "youtube", "youtube", "youtube", "bilibili", "twitch", "twitcasting", "mildom"]
+OTHER_GROUPS = ["vspo", "animare", "sugarlyric", "independen", "vapart", "honeystrap"]
+TITLE_WORDS = [
+    "Minecraft", "Apex", "Karaoke", "Zatsudan", "Collab", "ASMR", "Birthday", "Anniversary",
+    "Free", "Chat", "Morning", "Horror", "Mario", "Tetris", "Watchalong", "3D", "Live",
+]
+
+
+def generate_streams(size: int, upcoming: bool = False, seed: int = 4649) -> t.List[dict]:
+    """Generate ``size`` API items shaped like the live/upcoming query results"""
+    rng = random.Random(seed + size)
+    groups = HOLOPRO_GROUPS + NIJISANJI_GROUPS + OTHER_GROUPS
+    now = time.time()
+    streams = []
+    for i in range(size):
+        platform = rng.choice(PLATFORMS)
+        group = rng.choice(groups)
+        channel_no = rng.randrange(max(size // 2, 1))
+        if upcoming:
+            start_time = now + rng.randrange(-15 * 60, 7 * 86400)
+        else:
+            start_time = now - rng.randrange(0, 6 * 3600)
+        title = " ".join(rng.choice(TITLE_WORDS) for _ in range(rng.randrange(2, 8)))
+        streams.append(
+            {
+                "id": f"bili{i:08d}" if platform == "bilibili" else f"{platform[:2]}{i:08d}",
+                "room_id": str(100000 + i),
+                "title": f"【{title}】#{i}",
+                "thumbnail": f"https://i.ytimg.com/vi/{i:08d}/maxresdefault.jpg",
+                "timeData": {"startTime": int(start_time)},
+                "group": group,
+                "channel": {
+                    "id": f"UC{channel_no:022d}",
+                    "name": f"Channel {channel_no}",
+                    "en_name": f"Channel {channel_no} EN",
+                    "image": f"https://yt3.ggpht.com/{channel_no}.jpg",
+                },
+                "platform": platform,
+                "is_premiere": rng.random() < 0.05,
+                "is_member": rng.random() < 0.1,
+            }
+        )
+    return streams
+
+
+class FakeMessage:
+    """Just enough of discord.Message for the live diff loop"""
+
+    def __init__(self, message_id: int, embed: discord.Embed):
+        self.id = message_id
+        self.channel = SimpleNamespace(id=0)
+        self.webhook_id = None
+        self.embeds = [embed]
+        self.created_at = datetime.utcnow() - timedelta(minutes=message_id % 600)
+
+    async def delete(self):
+        pass
+
+    async def edit(self, **kwargs):
+        pass
+
+
+class FakeChannel:
+    """Just enough of discord.TextChannel for the live diff loop"""
+
+    def __init__(self):
+        self.id = 0
+        self.sent = 0
+
+    async def send(self, *args, **kwargs):
+        self.sent += 1
+
+    async def delete_messages(self, messages):
+        pass
+
+
+def generate_posted_messages(streams: t.List[dict]) -> t.List[FakeMessage]:
+    """Create the messages as they would be posted by the live watcher"""
+    return [
+        FakeMessage(i, create_live_embed(stream, stream["platform"]))
+        for i, stream in enumerate(streams)
+    ]
+
+
+def churn(streams: t.List[dict], ratio: float = 0.1, seed: int = 4649) -> t.List[dict]:
+    """Drop ``ratio`` of the streams and add the same amount of new one"""
+    rng = random.Random(seed)
+    amount = int(len(streams) * ratio)
+    kept = rng.sample(streams, len(streams) - amount)
+    new_streams = generate_streams(amount, seed=seed + 1)
+    for stream in new_streams:
+        stream["id"] = "new" + stream["id"]
+    return kept + new_streams
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Measure the payload size and round-trip time of the ihateani.me API
+for different page size and field projection.
+
+Usage: python -m benchmarks.page_size [--type live] [--limits 25,50,100,200] [--rounds 3]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import typing as t
+
+import aiohttp
+
+from vtutils.ihateanime import LIVE_FIELDS, UPCOMING_FIELDS, ihateanimeAPIV2, build_vtuber_query
+from vtutils.render import LIVE_EMBED_FIELDS, SCHEDULE_FIELDS
+from vtutils.webclient import SharedHTTPClient
+
+FIELD_SETS = {
+    "live": {"full": LIVE_FIELDS, "projected": LIVE_EMBED_FIELDS},
+    "upcoming": {"full": UPCOMING_FIELDS, "projected": SCHEDULE_FIELDS},
+}
+
+
+async def paginate_raw(session: aiohttp.ClientSession, query: str, query_type: str) -> t.Tuple[int, int, float]:
+    """Fetch every page and return (pages, total bytes, decode seconds)"""
+    url = ihateanimeAPIV2.BASE_PATH + "graphql"
+    cursor = ""
+    pages = total_bytes = 0
+    decode_time = 0.0
+    while True:
+        async with session.post(url, json={"query": query, "variables": {"cursor": cursor}}) as resp:
+            raw_data = await resp.read()
+        pages += 1
+        total_bytes += len(raw_data)
+        decode_start = time.perf_counter()
+        page_info = json.loads(raw_data)["data"]["vtuber"][query_type]["pageInfo"]
+        decode_time += time.perf_counter() - decode_start
+        if not page_info["hasNextPage"] or not page_info["nextCursor"]:
+            break
+        cursor = page_info["nextCursor"]
+    return pages, total_bytes, decode_time
+
+
+async def run_benchmark(query_type: str, limits: t.List[int], rounds: int):
+    print(f"{'fields':<10} {'limit':>5} {'pages':>5} {'bytes':>10} {'rtt p50 ms':>10} {'decode ms':>9}")
+    http_client = SharedHTTPClient()
+    session = http_client.session
+    try:
+        for field_name, fields in FIELD_SETS[query_type].items():
+            for limit in limits:
+                query = build_vtuber_query(query_type, fields, limit)
+                round_trips = []
+                for _ in range(rounds):
+                    start_time = time.perf_counter()
+                    pages, total_bytes, decode_time = await paginate_raw(session, query, query_type)
+                    round_trips.append(time.perf_counter() - start_time)
+                print(
+                    f"{field_name:<10} {limit:>5} {pages:>5} {total_bytes:>10} "
+                    f"{statistics.median(round_trips) * 1000:>10.1f} {decode_time * 1000:>9.2f}"
+                )
+    finally:
+        await http_client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ihateani.me API page size benchmark")
+    parser.add_argument("--type", dest="query_type", default="live", choices=list(FIELD_SETS.keys()))
+    parser.add_argument("--limits", default="25,50,100,200")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    limits = [int(limit) for limit in args.limits.split(",")]
+    asyncio.get_event_loop().run_until_complete(run_benchmark(args.query_type, limits, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmarks for the code that run on every watcher cycle.
+
+Usage:
+    python -m benchmarks.watchers [--sizes 100,1000,10000,50000] [--save report.json] [--compare old.json]
+
+Every benchmark is run until it take at least ``--min-time`` seconds and
+the best run is reported. A size is skipped (and reported as such) when a
+single run exceed ``--max-time`` seconds.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+import typing as t
+from types import SimpleNamespace
+
+from benchmarks.generators import (
+    FakeChannel,
+    churn,
+    generate_posted_messages,
+    generate_streams,
+)
+from cogs.lives import LiveWatcher
+from cogs.upcoming import UpcomingWatcher
+from vtutils.budget import RestBudgetPlanner
+from vtutils.grace import DEFAULT_GRACE, EndedStreamGrace
+from vtutils.ihateanime import ihateanimeAPIV2
+from vtutils.render import LATE_THRESHOLD, LATE_TOLERANCE
+
+DEFAULT_SIZES = [100, 1000, 10000, 50000]
+
+# A benchmark setup return the timed callable, or ``(prepare, timed)`` where
+# ``prepare`` is run before every run outside of the timer and its result is
+# passed to ``timed``, for the benchmarks that change their state.
+Bench = t.Union[t.Callable[[], t.Any], t.Tuple[t.Callable[[], t.Any], t.Callable[[t.Any], t.Any]]]
+BenchSetup = t.Callable[[int], Bench]
+
+
+def _fake_bot() -> SimpleNamespace:
+    return SimpleNamespace(
+        ignore_lists=["vapart"],
+        notifier=None,
+        user=SimpleNamespace(id=0),
+        # Not started, the actions are run right away
+        rest_planner=RestBudgetPlanner(),
+        record_first_post=lambda watcher: None,
+    )
+
+
+def _live_watcher() -> LiveWatcher:
+    """A LiveWatcher without the Discord connection and the tasks"""
+    cog = LiveWatcher.__new__(LiveWatcher)
+    cog.bot = _fake_bot()
+    cog.logger = logging.getLogger("benchmarks.lives")
+    cog.total_streams_map = {"hololive": -1, "nijisanji": -1, "other": -1}
+    cog._gone_messages = {"hololive": set(), "nijisanji": set(), "other": set()}
+    cog._avatar_pending = None
+    cog._rename_pending = {}
+    cog.max_edits_per_cycle = 5
+    cog.ended_grace = EndedStreamGrace()
+    cog.webhooks = None
+    cog.digest_mode = False
+    cog.channels_set = {"hololive": FakeChannel(), "nijisanji": FakeChannel(), "other": FakeChannel()}
+    return cog
+
+
+def _upcoming_watcher() -> UpcomingWatcher:
+    """An UpcomingWatcher without the Discord connection and the tasks"""
+    cog = UpcomingWatcher.__new__(UpcomingWatcher)
+    cog.bot = _fake_bot()
+    cog.logger = logging.getLogger("benchmarks.upcoming")
+    cog.LATE = LATE_THRESHOLD
+    cog.LATE_TOLERANCE = LATE_TOLERANCE
+    return cog
+
+
+def _run(coro):
+    return asyncio.get_event_loop().run_until_complete(coro)
+
+
+def bench_design_scheduled(size: int):
+    cog = _upcoming_watcher()
+    dataset = generate_streams(size, upcoming=True)
+    return lambda: _run(cog.design_scheduled(dataset))
+
+
+def bench_live_split_results(size: int):
+    cog = _live_watcher()
+    dataset = generate_streams(size)
+    return lambda: _run(cog._split_results_into_group(dataset))
+
+
+def bench_upcoming_split_results(size: int):
+    cog = _upcoming_watcher()
+    dataset = generate_streams(size, upcoming=True)
+    return lambda: _run(cog._split_results_into_group(dataset))
+
+
+def bench_create_embed(size: int):
+    cog = _live_watcher()
+    dataset = generate_streams(size)
+
+    async def _create_all():
+        for data in dataset:
+            await cog.create_embed(data, data["platform"])
+
+    return lambda: _run(_create_all())
+
+
+def bench_live_diff(size: int):
+    posted = generate_streams(size)
+    messages = generate_posted_messages(posted)
+    current = churn(posted)
+
+    def prepare() -> LiveWatcher:
+        # A fresh cog every run, the grace and the deleted messages would change the work done.
+        cog = _live_watcher()
+        # Delete on the first missing snapshot, so every run delete the ended streams
+        cog.ended_grace = EndedStreamGrace({platform: {"snapshots": 1} for platform in DEFAULT_GRACE})
+        return cog
+
+    return prepare, lambda cog: _run(cog.do_and_post_live_data(messages, current, "other"))
+
+
+def bench_sort_by_time(size: int):
+    api = ihateanimeAPIV2.__new__(ihateanimeAPIV2)
+    dataset = generate_streams(size)
+    # Sorting is in place, always start from the same order
+    return lambda: api._sort_by_time(list(dataset))
+
+
+def bench_is_freechat(size: int):
+    titles = [data["title"] for data in generate_streams(size, upcoming=True)]
+    return lambda: [UpcomingWatcher.is_freechat(title) for title in titles]
+
+
+BENCHMARKS: t.Dict[str, BenchSetup] = {
+    "upcoming.design_scheduled": bench_design_scheduled,
+    "lives._split_results_into_group": bench_live_split_results,
+    "upcoming._split_results_into_group": bench_upcoming_split_results,
+    "lives.create_embed": bench_create_embed,
+    "lives.do_and_post_live_data": bench_live_diff,
+    "ihateanime._sort_by_time": bench_sort_by_time,
+    "upcoming.is_freechat": bench_is_freechat,
+}
+
+
+def measure(bench: Bench, min_time: float, max_time: float) -> t.Optional[dict]:
+    """Run the benchmark until ``min_time`` is reached, None if a run is slower than ``max_time``"""
+    if isinstance(bench, tuple):
+        prepare, timed = bench
+    else:
+        prepare, timed = None, bench
+    timings = []
+    total_time = 0.0
+    while total_time < min_time or len(timings) < 3:
+        if prepare is not None:
+            state = prepare()
+            start_time = time.perf_counter()
+            timed(state)
+        else:
+            start_time = time.perf_counter()
+            timed()
+        elapsed = time.perf_counter() - start_time
+        if elapsed > max_time:
+            return None
+        timings.append(elapsed)
+        total_time += elapsed
+    timings.sort()
+    return {"best": timings[0], "median": timings[len(timings) // 2], "runs": len(timings)}
+
+
+def _git_revision() -> t.Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _format_time(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds:.2f}s"
+
+
+def run_benchmarks(names: t.List[str], sizes: t.List[int], min_time: float, max_time: float) -> dict:
+    report = {
+        "created_at": int(time.time()),
+        "revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": {},
+    }
+    for name in names:
+        results = report["results"][name] = {}
+        skip_rest = False
+        for size in sizes:
+            if skip_rest:
+                results[str(size)] = None
+                continue
+            result = measure(BENCHMARKS[name](size), min_time, max_time)
+            results[str(size)] = result
+            if result is None:
+                # Bigger sizes will only be slower
+                skip_rest = True
+    return report
+
+
+def print_report(report: dict, previous: t.Optional[dict] = None):
+    print(f"revision: {report['revision']} | python {report['python']} | {report['platform']}")
+    if previous is not None:
+        print(f"compared with: {previous['revision']} ({time.ctime(previous['created_at'])})")
+    for name, results in report["results"].items():
+        print(f"\n{name}")
+        for size, result in results.items():
+            if result is None:
+                print(f"  {size:>6}: skipped (too slow)")
+                continue
+            line = f"  {size:>6}: {_format_time(result['best']):>10} best, {_format_time(result['median']):>10} median"
+            old_result = (previous or {}).get("results", {}).get(name, {}).get(size)
+            if old_result:
+                line += f"  ({result['best'] / old_result['best']:.2f}x)"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watcher hot path micro-benchmarks")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES))
+    parser.add_argument("--only", default="", help="comma separated benchmark names")
+    parser.add_argument("--min-time", type=float, default=0.5)
+    parser.add_argument("--max-time", type=float, default=10.0)
+    parser.add_argument("--save", default=None, help="save the report as JSON")
+    parser.add_argument("--compare", default=None, help="a previously saved JSON report")
+    args = parser.parse_args()
+
+    # The watchers log every post, that's not what we are measuring.
+    logging.disable(logging.CRITICAL)
+    names = [name for name in args.only.split(",") if name] or list(BENCHMARKS.keys())
+    sizes = [int(size) for size in args.sizes.split(",")]
+    report = run_benchmarks(names, sizes, args.min_time, args.max_time)
+
+    previous = None
+    if args.compare is not None:
+        with open(args.compare, "r") as fp:
+            previous = json.load(fp)
+    print_report(report, previous)
+    if args.save is not None:
+        with open(args.save, "w") as fp:
+            json.dump(report, fp, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,8 +12,26 @@ from datetime import datetime, timedelta, timezone
 import aiohttp
 import discord
 from discord.ext import commands
+from discord.http import Route
+
+from vtutils import (
+    CircuitBreaker,
+    ihateanimeAPIV2,
+    LatencyProbe,
+    LoopSupervisor,
+    RestBudgetPlanner,
+    PlanSubscriber,
+    SharedHTTPClient,
+    StreamHistoryStore,
+    SubscriberNotifier,
+    SubscriptionStore,
+    VTuberBot,
+)
+from vtutils.platforms import PLATFORMS
+from vtutils.runner import close_event_loop, install_signal_handlers, new_event_loop
 
-from vtutils import ihateanimeAPIV2, VTuberBot
+# The time to ready and to the first post are measured from here
+BOOT_TIME = time.perf_counter()
 
 # Silent some imported module
 logging.getLogger("websockets").setLevel(logging.WARNING)
@@ -51,7 +69,7 @@ def prefixes(bot, message):
     return pre_data
 
 
-async def init_bot():
+def init_bot(loop: asyncio.AbstractEventLoop):
     """
     Start loading all the bot process
     Will start:
@@ -63,6 +81,9 @@ async def init_bot():
     logger.info("Looking up config")
     with open("config.json", "r") as fp:
         config = json.load(fp)
+    live_config = config.get("live", {})
+    if live_config.get("digest", False) and not live_config.get("webhook", {}).get("enabled", False):
+        raise ValueError("live.digest need live.webhook to be enabled, the bot user only send one embed per message.")
 
     logger.info("Loading korone/bot image...")
     with open("_korone_idle.png", "rb") as fp:
@@ -75,7 +96,18 @@ async def init_bot():
         description = (
             """A simple VTuber Bot\nversion 1.0.0 || Created by: N4O#8868"""
         )
-        bot = VTuberBot(command_prefix=prefixes, description=description, intents=discord.Intents.all())
+        shard_kwargs = {}
+        if config.get("shard_count") is not None:
+            shard_kwargs["shard_count"] = config["shard_count"]
+        if config.get("shard_ids") is not None:
+            shard_kwargs["shard_ids"] = config["shard_ids"]
+        bot = VTuberBot(
+            command_prefix=prefixes,
+            description=description,
+            intents=discord.Intents.all(),
+            loop=loop,
+            **shard_kwargs
+        )
         bot.remove_command("help")
         bot.korone_img = {"idle": korone_idle, "live": korone_live}
         logger.info("Success Loading Discord.py")
@@ -90,19 +122,59 @@ async def init_bot():
 
 # Initiate everything
 logger.info("Setting up loop")
-async_loop = asyncio.get_event_loop()
-init_results = async_loop.run_until_complete(
-    init_bot()
-)
+async_loop = new_event_loop()
+init_results = init_bot(async_loop)
 bot: VTuberBot = init_results[0]
 bot_config: dict = init_results[1]
 logger.info("Initiating API class...")
+if not hasattr(bot, "web_client"):
+    bot.web_client = SharedHTTPClient()
 if not hasattr(bot, "ihaapiv2"):
-    bot.ihaapiv2 = ihateanimeAPIV2(async_loop)
+    bot.ihaapiv2 = ihateanimeAPIV2(
+        bot.web_client,
+        bot_config.get("api", {}).get("page_size", 100),
+        bot_config.get("api", {}).get("upcoming_max_stale", 15 * 60),
+        CircuitBreaker.from_config("api.ihateani.me", bot_config.get("api", {}).get("breaker", {})),
+    )
 if not hasattr(bot, "jst_tz"):
     bot.jst_tz = timezone(timedelta(hours=9))
 if not hasattr(bot, "botconf"):
     bot.botconf = bot_config
+analytics_config: dict = bot_config.get("analytics", {})
+if analytics_config.get("enabled", False) and bot.stream_history is None:
+    logger.info("Opening stream history database...")
+    bot.stream_history = StreamHistoryStore(analytics_config.get("path", "vtuber_history.db"))
+subscriptions_config: dict = bot_config.get("subscriptions", {})
+if not hasattr(bot, "subscriptions"):
+    bot.subscriptions = SubscriptionStore(subscriptions_config.get("path", "subscriptions.json"))
+if bot.notifier is None:
+    bot.notifier = SubscriberNotifier(bot, bot.subscriptions, subscriptions_config.get("dm_per_second", 1.0))
+supervisor_config: dict = bot_config.get("supervisor", {})
+bot.supervisor = LoopSupervisor(
+    supervisor_config.get("lag_interval", 0.5),
+    supervisor_config.get("lag_threshold", 0.25),
+    supervisor_config.get("stall_factor", 3.0),
+    supervisor_config.get("check_interval", 15.0),
+)
+if "message" in bot_config:
+    bot.upcoming_message = bot_config["message"]
+else:
+    bot.upcoming_message = {"hololive": None, "nijisanji": None, "other": None}
+bot.ignore_lists = bot_config["ignore"]["groups"]
+PLATFORMS.configure(bot_config.get("platforms", {}))
+bot.boot_time = BOOT_TIME
+rest_budget_config: dict = bot_config.get("rest_budget", {})
+bot.rest_planner = RestBudgetPlanner(
+    rest_budget_config.get("global_per_second", 50),
+    rest_budget_config.get("concurrency", 4),
+)
+worker_config: dict = bot_config.get("worker", {})
+if worker_config.get("enabled", False) and bot.plan_feed is None:
+    logger.info("Using the fetcher worker process...")
+    bot.plan_feed = PlanSubscriber(
+        worker_config.get("socket", "vtuber_worker.sock"),
+        worker_config.get("max_plan_age", 300),
+    )
 
 
 @bot.event
@@ -129,28 +201,73 @@ async def on_ready():
     logger.info(
         "---------------------------------------------------------------"
     )
-    if "message" in bot_config:
-        bot.upcoming_message = bot_config["message"]
+    if bot.warmup.done:
+        logger.info("[$] Reconnected, the startup phase is already done.")
+        return
+    if bot.warmup.running:
+        logger.info("[$] Reconnected, the warm-up is still running.")
+        return
+    if not bot.warmup.started:
+        await start_bot()
     else:
-        bot.upcoming_message = {"hololive": None, "nijisanji": None, "other": None}
-    bot.ignore_lists = bot_config["ignore"]["groups"]
-    if not hasattr(bot, "uptime"):
-        bot.owner = (await bot.application_info()).owner
-        bot.uptime = time.time()
-        logger.info("[#][@][!] Start loading cogs...")
-        for load in cogs_list:
-            try:
-                logger.info("[#] Loading " + load + " module.")
-                bot.load_extension(load)
-                logger.info("[#] Loaded " + load + " module.")
-            except Exception as e:
-                tb = traceback.format_exception(type(e), e, e.__traceback__)
-                logger.error("[!!] Failed Loading " + load + " module.")
-                logger.error("".join(tb))
-        logger.info("[#][@][!] All cogs/extensions loaded.")
-        logger.info(
-            "---------------------------------------------------------------"
+        logger.info("[$] Reconnected, retrying the warm-up...")
+    await warm_up()
+
+
+async def start_bot():
+    """Start the services and load the cogs, only once"""
+    bot.warmup.started = True
+    bot.uptime = time.time()
+    bot.time_to_ready = time.perf_counter() - bot.boot_time
+    logger.info(f"[$] Ready in {bot.time_to_ready:.2f}s")
+    bot.supervisor.start()
+    bot.rest_planner.start()
+    bot.latency_probe.start()
+    if bot.plan_feed is not None:
+        bot.plan_feed.start()
+    bot.notifier.start()
+    # Published by the watchers, before their first cycle
+    bot.ihaapiv2.changes.follow(bot.live_index.apply, "live")
+    bot.ihaapiv2.changes.follow(bot.upcoming_index.apply, "upcoming")
+    logger.info("[#][@][!] Start loading cogs...")
+    for load in cogs_list:
+        try:
+            logger.info("[#] Loading " + load + " module.")
+            bot.load_extension(load)
+            logger.info("[#] Loaded " + load + " module.")
+        except Exception as e:
+            tb = traceback.format_exception(type(e), e, e.__traceback__)
+            logger.error("[!!] Failed Loading " + load + " module.")
+            logger.error("".join(tb))
+    logger.info("[#][@][!] All cogs/extensions loaded.")
+    logger.info(
+        "---------------------------------------------------------------"
+    )
+
+
+async def warm_up():
+    """Warm up and start the watchers, retried on the next on_ready if it failed"""
+    logger.info("[#][@][!] Warming up channels, messages and API snapshots...")
+    # The cogs registered their fields, the first snapshots can be fetched now
+    snapshot_fetchers = {}
+    if bot.plan_feed is None:
+        snapshot_fetchers = {"live": bot.ihaapiv2.fetch_lives, "upcoming": bot.ihaapiv2.fetch_upcoming}
+    bot.warmup.running = True
+    try:
+        app_info, _ = await asyncio.gather(
+            bot.application_info(),
+            bot.warmup.run(bot, bot_config["channels"], bot.upcoming_message, snapshot_fetchers),
         )
+    except Exception as e:
+        bot.warmup.done = False
+        tb = traceback.format_exception(type(e), e, e.__traceback__)
+        logger.error("[!!] Warm-up failed, will retry on the next reconnection.")
+        logger.error("".join(tb))
+        return
+    finally:
+        bot.warmup.running = False
+    bot.owner = app_info.owner
+    bot.dispatch("warmup_done")
     logger.info("All bots module loaded, bot it's now very much ready!")
 
 
@@ -263,69 +380,114 @@ def ping_emote(t_t):
     return emote
 
 
-async def check_web_speed(url, session: aiohttp.ClientSession):
-    logger.info(f"ping: checking {url}")
+async def check_web_speed(url, session: aiohttp.ClientSession, timeout: float = 10.0) -> float:
+    """Time a GET request, a timeout raise ``asyncio.TimeoutError``"""
     t1_start = time.perf_counter()
-    error = False
-    try:
-        async with session.get(url) as resp:
-            await resp.text()
-            t2_end = time.perf_counter()
-    except aiohttp.ClientTimeout:
-        logger.warn("Timeout!")
-        t2_end = time.perf_counter()
-        error = True
-    return t2_end - t1_start, error
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+        await resp.text()
+    return time.perf_counter() - t1_start
+
+
+async def sample_gateway_latency():
+    return bot.latency
+
+
+async def sample_discord_rest_latency():
+    t1_start = time.perf_counter()
+    await bot.http.request(Route("GET", "/gateway"))
+    return time.perf_counter() - t1_start
+
+
+async def sample_ihateani_latency():
+    return await check_web_speed(bot.ihaapiv2.ECHO_URL, bot.web_client.session)
+
+
+latency_probe_config: dict = bot_config.get("latency_probe", {})
+bot.latency_probe = LatencyProbe(
+    {
+        "Discord": sample_discord_rest_latency,
+        "Websocket": sample_gateway_latency,
+        "api.ihateani.me": sample_ihateani_latency,
+    },
+    latency_probe_config.get("interval", 30.0),
+    latency_probe_config.get("window", 3600.0),
+)
 
 
 @bot.command()
 async def ping(ctx):
-    channel = ctx.message.channel
     irnd = lambda t: int(round(t * 1000))  # noqa: E731
-    logger.info("ping: checking websocket...")
-    ws_ping = bot.latency
+    text_res = ":satellite: Ping Results :satellite:"
+    for name, stats in bot.latency_probe.stats().items():
+        if stats["samples"] == 0:
+            text_res += f"\n:x: {name}: `no sample yet`"
+            continue
+        if stats["current"] is not None:
+            text_res += f"\n{ping_emote(irnd(stats['current']))} {name}: `{irnd(stats['current'])}ms`"
+        else:
+            text_res += f"\n:x: {name}: `failed`"
+        details = []
+        if stats["p50"] is not None:
+            details.append(f"p50 `{irnd(stats['p50'])}ms`, p95 `{irnd(stats['p95'])}ms`, p99 `{irnd(stats['p99'])}ms`")
+        if stats["failures"] > 0:
+            details.append(f"`{stats['failures']}` failed")
+        if details:
+            text_res += f" ({', '.join(details)})"
+    window_minutes = int(bot.latency_probe.window // 60)
+    text_res += f"\n*Over the last {window_minutes} minutes, sampled every {bot.latency_probe.interval:.0f}s*"
+    await ctx.send(content=text_res)
 
-    session = aiohttp.ClientSession(
-        headers={
-            "User-Agent": "Listeners/1.0 ListenersPingTools/0.1"
-        }
-    )
-    try:
-        iha_url = "https://api.ihateani.me/echo"
-        iha_ping, iha_err = await check_web_speed(iha_url, session)
-        await session.close()
-    except Exception:
-        await session.close()
-        iha_ping = 9999
-        iha_err = True
 
-    iha_ping = irnd(iha_ping)
+@bot.command()
+@commands.is_owner()
+async def shards(ctx):
+    irnd = lambda t: int(round(t * 1000))  # noqa: E731
+    text_res = ":satellite: Shards Status :satellite:"
+    for shard_id, latency in sorted(bot.latencies):
+        text_res += f"\n**Shard {shard_id}**: `{irnd(latency)}ms`"
+        cycle_stats = bot.shard_cycle_stats.get(shard_id, {})
+        for watcher, stats in cycle_stats.items():
+            avg_time = stats["total"] / stats["runs"] if stats["runs"] > 0 else 0.0
+            text_res += f"\n  {watcher}: last `{irnd(stats['last'])}ms`, avg `{irnd(avg_time)}ms`"
+            text_res += f" ({stats['runs']} runs)"
+    for watcher, group_stats in bot.group_cycle_stats.items():
+        text_res += f"\n**{watcher} pipelines**"
+        for group, stats in group_stats.items():
+            avg_time = stats["total"] / stats["runs"] if stats["runs"] > 0 else 0.0
+            text_res += f"\n  {group}: last `{irnd(stats['last'])}ms`, avg `{irnd(avg_time)}ms`"
+            text_res += f" ({stats['runs']} runs, {stats['failures']} failed)"
+    await ctx.send(content=text_res)
 
-    t1_ping = time.perf_counter()
-    async with channel.typing():
-        t2_ping = time.perf_counter()
 
-        dis_ping = irnd(t2_ping - t1_ping)
+@bot.command()
+@commands.is_owner()
+async def httpstats(ctx):
+    stats = bot.web_client.stats()
+    text_res = ":globe_with_meridians: HTTP Pool Stats :globe_with_meridians:"
+    text_res += f"\nRequests: `{stats['requests']}` (`{stats['errors']}` errors)"
+    text_res += f"\nConnections: `{stats['connections_created']}` created, `{stats['connections_reused']}` reused"
+    text_res += f" (`{stats['reuse_ratio'] * 100:.1f}%` reuse)"
+    text_res += f"\nDNS Cache: `{stats['dns_cache_hit']}` hit, `{stats['dns_cache_miss']}` miss"
+    await ctx.send(content=text_res)
 
-        text_res = ":satellite: Ping Results :satellite:"
-        text_res += f"\n{ping_emote(dis_ping)} Discord: `{dis_ping}ms`"
 
-        if ws_ping != float("nan"):
-            ws_time = irnd(ws_ping)
-            ws_res = f"{ping_emote(ws_time)} Websocket `{ws_time}ms`"
-        else:
-            ws_res = ":x: Websocket: `nan`"
+@bot.command()
+@commands.is_owner()
+async def health(ctx):
+    text_res = bot.supervisor.report()
+    text_res += "\n:electric_plug: Upstream :electric_plug:\n" + bot.ihaapiv2.breaker.report()
+    await ctx.send(content=text_res)
 
-        text_res += "\n"
-        text_res += ws_res
 
-        if not iha_err:
-            text_res += f"\n{ping_emote(iha_ping)} "
-        else:
-            text_res += "\n:x: "
-        text_res += f"api.ihateani.me: `{iha_ping}ms`"
-
-        await channel.send(content=text_res)
+@bot.command()
+@commands.is_owner()
+async def budget(ctx):
+    text_res = ":vertical_traffic_light: REST Budget :vertical_traffic_light:"
+    for name, stats in bot.rest_planner.stats().items():
+        text_res += f"\n**{name}**: `{stats['queued']}` queued (oldest `{stats['oldest_wait']:.1f}s`)"
+        text_res += f", `{stats['executed']}` done, `{stats['failed']}` failed, `{stats['shed']}` shed"
+        text_res += f", wait avg `{stats['avg_wait']:.2f}s` max `{stats['max_wait']:.2f}s`"
+    await ctx.send(content=text_res)
 
 
 @bot.command()
@@ -334,74 +496,36 @@ async def uptime(ctx):
     await ctx.send(f":alarm_clock: {uptime}")
 
 
-# All of the code from here are mainly a copy of discord.Client.run()
-# function, which have been readjusted to fit my needs.
-async def run_bot(*args, **kwargs):
+async def run_bot(shutdown_event: asyncio.Event):
+    start_task = asyncio.ensure_future(bot.start(bot.botconf["bot_token"], bot=True, reconnect=True))
+    stop_task = asyncio.ensure_future(shutdown_event.wait())
     try:
-        await bot.start(*args, **kwargs)
+        await asyncio.wait([start_task, stop_task], return_when=asyncio.FIRST_COMPLETED)
     finally:
+        stop_task.cancel()
+        if not start_task.done():
+            logger.info("Received signal to terminate bot.")
+        # Finish the running cycles, flush the DMs and close the HTTP sessions
         await bot.close()
+        if start_task.done() and not start_task.cancelled():
+            start_task.result()
+        elif not start_task.done():
+            start_task.cancel()
 
 
-def stop_stuff_on_completion(_):
-    async_loop.stop()
-
-
-def cancel_all_tasks(loop):
-    """A copy of discord.Client _cancel_tasks function
-
-    :param loop: [description]
-    :type loop: [type]
-    """
+def main():
+    shutdown_event = asyncio.Event()
+    install_signal_handlers(async_loop, shutdown_event.set)
     try:
-        try:
-            task_retriever = asyncio.Task.all_tasks
-        except AttributeError:
-            # future proofing for 3.9 I guess
-            task_retriever = asyncio.all_tasks
-
-        tasks = {t for t in task_retriever(loop=loop) if not t.done()}
-
-        if not tasks:
-            return
-
-        bot.logger.info("Cleaning up after %d tasks.", len(tasks))
-        for task in tasks:
-            task.cancel()
-
-        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
-        bot.logger.info("All tasks finished cancelling.")
-
-        for task in tasks:
-            if task.cancelled():
-                continue
-            if task.exception() is not None:
-                loop.call_exception_handler(
-                    {
-                        "message": "Unhandled exception during Client.run shutdown.",
-                        "exception": task.exception(),
-                        "task": task,
-                    }
-                )
-        if sys.version_info >= (3, 6):
-            loop.run_until_complete(loop.shutdown_asyncgens())
+        async_loop.run_until_complete(run_bot(shutdown_event))
+    except KeyboardInterrupt:
+        logger.info("Received signal to terminate bot.")
+        async_loop.run_until_complete(bot.close())
     finally:
-        bot.logger.info("Closing the event loop.")
+        logger.info("Cleaning up tasks.")
+        close_event_loop(async_loop)
+        logging.shutdown()
 
 
-future = asyncio.ensure_future(run_bot(bot.botconf["bot_token"], bot=True, reconnect=True))
-future.add_done_callback(stop_stuff_on_completion)
-try:
-    async_loop.run_forever()
-except (KeyboardInterrupt, SystemExit, SystemError):
-    bot.logger.info("Received signal to terminate bot.")
-finally:
-    future.remove_done_callback(stop_stuff_on_completion)
-    bot.logger.info("Cleaning up tasks.")
-    cancel_all_tasks(async_loop)
-
-if not future.cancelled():
-    try:
-        future.result()
-    except KeyboardInterrupt:
-        pass
+if __name__ == "__main__":
+    main()
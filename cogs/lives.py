@@ -1,14 +1,34 @@
 import asyncio
 import logging
+import time
 import traceback
 import typing as t
-from datetime import datetime, timezone
+from datetime import datetime, timedelta
+from functools import partial
 
 import discord
 from discord.channel import TextChannel
 from discord.ext import commands, tasks
 
+from vtutils.analytics import HISTORY_FIELDS
 from vtutils.bot import VTuberBot
+from vtutils.breaker import CircuitOpen
+from vtutils.budget import (
+    PRIORITY_AVATAR,
+    PRIORITY_DELETE,
+    PRIORITY_EDIT,
+    PRIORITY_POST,
+    PRIORITY_RENAME,
+    ActionShed,
+)
+from vtutils.digest import LiveDigestIndex, pack_embeds
+from vtutils.grace import EndedStreamGrace
+from vtutils.groups import split_into_groups
+from vtutils.pipelines import GroupPipelines
+from vtutils.platforms import PLATFORMS
+from vtutils.render import LIVE_EMBED_FIELDS, create_live_embed, detect_embed_changes
+from vtutils.search import SEARCH_FIELDS
+from vtutils.webhooks import LiveWebhookPool
 
 
 def setup(bot: VTuberBot):
@@ -20,13 +40,8 @@ class LiveWatcher(commands.Cog):
         self.bot = bot
         self.conf = bot.botconf
         self.ihaapi = bot.ihaapiv2
-        channels_data: t.Dict[str, t.Union[str,
-                                           int, None]] = self.conf["channels"]
-        self.channels_set: t.Dict[str, TextChannel] = {
-            "hololive": self.bot.get_channel(channels_data["holo"]) if channels_data["holo"] is not None else None,  # noqa: E501
-            "nijisanji": self.bot.get_channel(channels_data["niji"]) if channels_data["niji"] is not None else None,  # noqa: E501
-            "other": self.bot.get_channel(channels_data["other"]) if channels_data["other"] is not None else None  # noqa: E501
-        }
+        # Resolved (or fetched) by the startup warm-up
+        self.channels_set: t.Dict[str, t.Optional[TextChannel]] = self.bot.warmup.channels
         self.upcoming_message_set = {
             "hololive": -1 if bot.upcoming_message["hololive"] is None else bot.upcoming_message["hololive"],
             "nijisanji": -1 if bot.upcoming_message["nijisanji"] is None else bot.upcoming_message["nijisanji"],  # noqa: E501
@@ -36,168 +51,76 @@ class LiveWatcher(commands.Cog):
 
         self._korone_img = "idle"
         self._korone_data = bot.korone_img
-        self.enable_twitch = True
-        self.enable_twitcasting = True
         self.total_streams_map = {
             "hololive": -1,
             "nijisanji": -1,
             "other": -1
         }
-
-        # Tasks
+        self._gone_messages: t.Dict[str, t.Set[int]] = {
+            "hololive": set(),
+            "nijisanji": set(),
+            "other": set()
+        }
+        # The avatar change and the renames are not awaited, so they never hold up the posts.
+        self._avatar_pending: t.Optional[asyncio.Future] = None
+        # group -> (live count, rename future)
+        self._rename_pending: t.Dict[str, t.Tuple[int, asyncio.Future]] = {}
+        self.pipelines = GroupPipelines("live", bot, self.conf.get("live", {}).get("pipeline_timeout", 5 * 60))
+        self.max_edits_per_cycle: int = self.conf.get("live", {}).get("max_edits_per_cycle", 5)
+        # The role mentions and the reminders are deleted by the live cycle once they're this old
+        self.notification_ttl: float = self.conf.get("live", {}).get("notification_ttl", 30 * 60)
+        self.ended_grace = EndedStreamGrace(self.conf.get("live", {}).get("grace"))
+        webhook_conf: dict = self.conf.get("live", {}).get("webhook", {})
+        self.webhooks: t.Optional[LiveWebhookPool] = None
+        if webhook_conf.get("enabled", False):
+            self.webhooks = LiveWebhookPool(bot, bot.web_client, webhook_conf.get("name", "VTuber Live"))
+        self.digest_mode: bool = self.conf.get("live", {}).get("digest", False)
+        if self.digest_mode and self.webhooks is None:
+            raise ValueError("live.digest need live.webhook, the bot user can only send one embed per message.")
+
+        self.ihaapi.register_fields("live", "cogs.lives", LIVE_EMBED_FIELDS)
+        self.ihaapi.register_fields("live", "search", SEARCH_FIELDS)
+        if self.bot.stream_history is not None:
+            self.ihaapi.register_fields("live", "analytics", HISTORY_FIELDS)
+
+        # Tasks, started once the channels and the first snapshot are warm
+        if self.bot.warmup.done:
+            self.start_watcher()
+
+    @commands.Cog.listener()
+    async def on_warmup_done(self):
+        self.start_watcher()
+
+    def start_watcher(self):
+        if self.improved_live_watcher.is_running():
+            return
         self.improved_live_watcher.start()
+        self.bot.supervisor.register("live", self.improved_live_watcher)
 
     def cog_unload(self):
+        self.bot.supervisor.unregister("live")
         self.improved_live_watcher.cancel()
-
-    async def create_embed(self, live_data: dict, web_type="youtube"):
-        color_web = {
-            "youtube": {
-                "c": 0xFF0000,
-                "b": "https://youtube.com/watch?v=",
-                "cb": "https://youtube.com/channel/",
-                "fi": "https://s.ytimg.com/yts/img/favicon_144-vfliLAfaB.png",
-            },
-            "bilibili": {
-                "c": 0x23ADE5,
-                "b": "https://live.bilibili.com/",
-                "cb": "https://space.bilibili.com/",
-                "fi": "https://logodix.com/logo/1224389.png",
-            },
-            "twitch": {
-                "c": 0x9147ff,
-                "b": "https://www.twitch.tv/",
-                "cb": "https://twitch.tv/",
-                "fi": "https://p.n4o.xyz/i/twitchlogo.png"
-            },
-            "twitcasting": {
-                "c": 0x280fc,
-                "b": "https://twitcasting.tv/",
-                "cb": "https://twitcasting.tv/",
-                "fi": "https://twitcasting.tv/img/icon192.png"
-            },
-            "mildom": {
-                "c": discord.Color.from_rgb(56, 204, 227),
-                "b": "https://mildom.com/",
-                "cb": "https://mildom.com/profile/",
-                "fi": "https://mildom.com/assets/logo.png"
-            }
-        }
-
-        web_data = color_web.get(web_type)
-        web_col, web_base, channel_base, web_logo = (
-            web_data["c"],
-            web_data["b"],
-            web_data["cb"],
-            web_data["fi"],
-        )
-        channeru = live_data["channel"]
-        if web_type == "youtube":
-            stream_url = f"{web_base}{live_data['id']}"
-        elif web_type == "bilibili":
-            print(live_data)
-            stream_url = f"{web_base}{live_data['room_id']}"
-        elif web_type == "twitcasting" or web_type == "mildom":
-            stream_url = f"{web_base}{live_data['channel']['id']}"
-        elif web_type == "twitch":
-            stream_url = f"{web_base}{live_data['channel']['id']}"
-        channel_url = f"{channel_base}{channeru['id']}"
-        start_time = datetime.fromtimestamp(
-            live_data["timeData"]["startTime"], tz=timezone.utc
-        )
-        is_member = live_data.get("is_member", False)
-        is_premiere = live_data.get("is_premiere", False)
-
-        embed = discord.Embed(
-            title=live_data["title"],
-            colour=web_col,
-            url=stream_url,
-            description=f"[Watch Here!]({stream_url})",
-            timestamp=start_time
-        )
-
-        embed.description += f"\n{web_type.capitalize()} "
-        if is_premiere:
-            embed.description += "Premiere"
-            embed.description = "▶ " + embed.description
-        else:
-            embed.description += "Stream"
-        if is_member:
-            embed.description += " **(Member-Only)**"
-
-        embed.set_image(url=live_data["thumbnail"])
-        embed.set_thumbnail(url=channeru["image"])
-        embed.set_author(
-            name=channeru["name"],
-            icon_url=channeru["image"],
-            url=channel_url,
-        )
-        foot = live_data["id"]
-        if web_type == "twitch":
-            foot = "twitch" + foot
-        elif web_type == "twitcasting":
-            foot = "twcast" + foot
-        elif web_type == "mildom":
-            foot = "mildom" + foot
-        embed.set_footer(text=foot, icon_url=web_logo)
-        return embed
-
-    def is_nijisanji(self, group_name):
-        groups_set = [
-            "nijisanji",
-            "nijisanjijp",
-            "nijisanjikr",
-            "nijisanjiid",
-            "nijisanjien",
-            "nijisanjiin",
-            "virtuareal"
-        ]
-        if group_name in groups_set:
-            return True
-        return False
-
-    def is_holopro(self, group_name):
-        groups_set = ["hololive", "hololiveid", "hololivecn",
-                      "hololiveen", "hololivejp", "holostars"]
-        if group_name in groups_set:
-            return True
-        return False
+        self.pipelines.cancel()
+        self.ihaapi.unregister_fields("live", "cogs.lives")
+        self.ihaapi.unregister_fields("live", "search")
+        self.ihaapi.unregister_fields("live", "analytics")
+
+    @commands.command()
+    @commands.is_owner()
+    async def flaps(self, ctx: commands.Context):
+        text_res = ":arrows_counterclockwise: Ended Stream Flaps :arrows_counterclockwise:"
+        for platform, (max_snapshots, max_seconds) in self.ended_grace.policy.items():
+            counts = self.ended_grace.flaps.get(platform, {"recovered": 0, "reposted": 0, "deleted": 0})
+            text_res += f"\n**{platform}** (`{max_snapshots}` snapshots or `{max_seconds}s`): "
+            text_res += f"`{counts['recovered']}` recovered, `{counts['reposted']}` reposted"
+            text_res += f", `{counts['deleted']}` deleted"
+        await ctx.send(content=text_res)
+
+    async def create_embed(self, live_data: dict, web_type: t.Optional[str] = None):
+        return create_live_embed(live_data, web_type)
 
     async def _split_results_into_group(self, results_items):
-        streams_data = {
-            "hololive": [],
-            "nijisanji": [],
-            "other": []
-        }
-        for result in results_items:
-            if result["group"] in self.bot.ignore_lists:
-                continue
-            if result["platform"] == "bilibili":
-                if result["group"] not in ["hololive", "nijisanji", "hololivecn", "virtuareal"]:
-                    continue
-            if not self.enable_twitcasting and result["platform"] == "twitcasting":
-                continue
-            if not self.enable_twitch and result["platform"] == "twitch":
-                continue
-            if self.is_nijisanji(result["group"]):
-                streams_data["nijisanji"].append(result)
-            elif self.is_holopro(result["group"]):
-                streams_data["hololive"].append(result)
-            else:
-                streams_data["other"].append(result)
-        return streams_data
-
-    async def find_msg(
-        self, message_list: list, video_id: str
-    ) -> discord.Message:
-        for msg in message_list:
-            if video_id == msg["id"]:
-                return msg["msg_data"]
-
-    async def find_live_info(self, live_data: list, video_id: str) -> dict:
-        for live in live_data:
-            if live["id"] == video_id:
-                return live
+        return split_into_groups(results_items, self.bot.ignore_lists)
 
     async def filter_message(
         self, message_set: t.List[discord.Message], tipe: str
@@ -205,33 +128,50 @@ class LiveWatcher(commands.Cog):
         if message_set is None:
             return None
         # Filter out user message
-        message_set = [msg for msg in message_set if msg.author.bot]
+        message_set = [
+            msg for msg in message_set if msg.author.bot or (self.webhooks is not None and self.webhooks.owns(msg))
+        ]
         message_set = [
             msg for msg in message_set if msg.id != self.upcoming_message_set[tipe]
         ]  # Filter out upcoming message
+        message_set = [
+            msg for msg in message_set if msg.id not in self._gone_messages[tipe]
+        ]  # Filter out deleted message
         return message_set
 
-    async def collect_and_map_messages(self):
-        holomessages = nijimessages = othermessages = None
-        if self.channels_set["hololive"] is not None:
-            holomessages: t.List[discord.Message] = await self.channels_set["hololive"].history(
-                limit=None
-            ).flatten()
-        if self.channels_set["nijisanji"] is not None:
-            nijimessages: t.List[discord.Message] = await self.channels_set["nijisanji"].history(
-                limit=None
-            ).flatten()
-        if self.channels_set["other"] is not None:
-            othermessages: t.List[discord.Message] = await self.channels_set["other"].history(
-                limit=None
-            ).flatten()
-        return {
-            "hololive": await self.filter_message(holomessages, "hololive"),
-            "nijisanji": await self.filter_message(nijimessages, "nijisanji"),
-            "other": await self.filter_message(othermessages, "other")
-        }
-
-    async def update_korone_profile_image(self, channels_lives_yt):
+    async def collect_group_messages(self, group: str) -> t.Optional[t.List[discord.Message]]:
+        channel = self.channels_set[group]
+        if channel is None:
+            return None
+        if self.webhooks is not None:
+            # Make sure our webhook is known before filtering its messages.
+            await self.webhooks.get(channel)
+        messages: t.List[discord.Message] = await channel.history(limit=None).flatten()
+        # Only remember the deleted message that still appear on the history.
+        self._gone_messages[group].intersection_update(msg.id for msg in messages)
+        messages = await self.filter_message(messages, group)
+        return await self.sweep_notifications(channel, messages, group)
+
+    async def sweep_notifications(
+        self, channel: TextChannel, messages: t.List[discord.Message], group: str
+    ) -> t.List[discord.Message]:
+        """Delete our expired plain text messages (role mentions and reminders).
+
+        They're found from the channel history, so they are still cleaned up
+        after a restart.
+
+        :return: the messages without the notifications
+        """
+        expire_before = datetime.utcnow() - timedelta(seconds=self.notification_ttl)
+        notifications = [msg for msg in messages if not msg.embeds and msg.author.id == self.bot.user.id]
+        expired = [msg for msg in notifications if msg.created_at < expire_before]
+        if expired:
+            self.logger.info(f"[Live:{group}] Deleting {len(expired)} expired notifications...")
+            gone_ids = await self.bulk_delete_messages(channel, expired, group)
+            self._gone_messages[group].update(gone_ids)
+        return [msg for msg in messages if msg.embeds or msg.author.id != self.bot.user.id]
+
+    def update_korone_profile_image(self, channels_lives_yt):
         if (
             "UChAnqc_AY5_I3Px5dig3X1Q" in channels_lives_yt
             and self._korone_img == "idle"  # noqa: W503
@@ -239,8 +179,7 @@ class LiveWatcher(commands.Cog):
             self.logger.info(
                 "[Live] Changing Profile Picture to Korone LIVE image..."
             )
-            self._korone_img = "live"
-            await self.bot.user.edit(avatar=self._korone_data["live"])
+            self._submit_profile_image("live")
         elif (
             "UChAnqc_AY5_I3Px5dig3X1Q" not in channels_lives_yt
             and self._korone_img == "live"  # noqa: W503
@@ -248,244 +187,514 @@ class LiveWatcher(commands.Cog):
             self.logger.info(
                 "[Live] Changing Profile Picture to Korone IDLE image..."
             )
-            self._korone_img = "idle"
-            await self.bot.user.edit(avatar=self._korone_data["idle"])
+            self._submit_profile_image("idle")
+
+    def _on_background_action(self, future: asyncio.Future, action: str, on_success: t.Callable[[], None]):
+        if future.cancelled():
+            return
+        e = future.exception()
+        if e is None:
+            on_success()
+        elif isinstance(e, ActionShed):
+            # Try again on the next cycle
+            self.logger.info(f"[Live] {action} was dropped, will retry on the next cycle.")
+        else:
+            tb = traceback.format_exception(type(e), e, e.__traceback__)
+            self.logger.error(f"[Live] {action} failed.")
+            self.logger.error("".join(tb))
+
+    def _submit_profile_image(self, mode: str):
+        if self._avatar_pending is not None and not self._avatar_pending.done():
+            return
+
+        def _set_mode():
+            self._korone_img = mode
+
+        self._avatar_pending = asyncio.ensure_future(
+            self.bot.rest_planner.submit(
+                PRIORITY_AVATAR,
+                "avatar:0",
+                lambda: self.bot.user.edit(avatar=self._korone_data[mode]),
+                coalesce_key="avatar",
+            )
+        )
+        self._avatar_pending.add_done_callback(
+            partial(self._on_background_action, action="Avatar change", on_success=_set_mode)
+        )
+
+    async def send_live(self, group: str, embeds: t.List[discord.Embed]) -> t.List[t.Optional[discord.Message]]:
+        """Post the live embeds, in one message through the webhook or one message per embed as the bot.
+
+        :return: the posted messages
+        """
+        channel = self.channels_set[group]
+        if self.webhooks is not None:
+            webhook = await self.webhooks.get(channel)
+            if webhook is not None:
+                try:
+                    message = await self.bot.rest_planner.submit(
+                        PRIORITY_POST,
+                        f"webhook:{webhook.id}",
+                        partial(
+                            webhook.send,
+                            content="Currently Live!",
+                            embeds=embeds,
+                            wait=True,
+                            **self.webhooks.webhook_kwargs(),
+                        ),
+                    )
+                    return [message]
+                except (discord.NotFound, discord.Forbidden):
+                    self.webhooks.invalidate(channel.id)
+        messages = []
+        for embed_info in embeds:
+            message = await self.bot.rest_planner.submit(
+                PRIORITY_POST,
+                f"send:{channel.id}",
+                partial(channel.send, content="Currently Live!", embed=embed_info),
+            )
+            messages.append(message)
+        return messages
+
+    async def edit_live(self, message: discord.Message, embeds: t.List[discord.Embed]):
+        webhook = self.webhooks.cached_for(message) if self.webhooks is not None else None
+        if webhook is not None:
+            return await self.bot.rest_planner.submit(
+                PRIORITY_EDIT, f"webhook:{webhook.id}", partial(webhook.edit_message, message.id, embeds=embeds)
+            )
+        # The bot user message only hold one embed.
+        return await self.bot.rest_planner.submit(
+            PRIORITY_EDIT, f"edit:{message.channel.id}", partial(message.edit, embed=embeds[0])
+        )
+
+    async def delete_live(self, message: discord.Message):
+        webhook = self.webhooks.cached_for(message) if self.webhooks is not None else None
+        if webhook is not None:
+            return await self.bot.rest_planner.submit(
+                PRIORITY_DELETE, f"webhook:{webhook.id}", partial(webhook.delete_message, message.id)
+            )
+        return await self.bot.rest_planner.submit(PRIORITY_DELETE, f"delete:{message.channel.id}", message.delete)
+
+    async def edit_changed_lives(
+        self,
+        collected_msgs_map: t.Dict[str, discord.Message],
+        current_lives_data: t.List[dict],
+        group: str,
+        rendered_embeds: t.Optional[t.Dict[str, dict]] = None,
+    ):
+        edit_count = 0
+        for live_data in current_lives_data:
+            stream_key = PLATFORMS.key_of(live_data)
+            msg_data = collected_msgs_map.get(stream_key)
+            if msg_data is None or not msg_data.embeds:
+                continue
+            changed_fields = detect_embed_changes(msg_data.embeds[0], live_data)
+            if not changed_fields:
+                continue
+            if edit_count >= self.max_edits_per_cycle:
+                self.logger.warn(
+                    f"[Live:{group}] Edit limit reached, the rest will be edited on the next cycle."
+                )
+                break
+            embed_info = await self.render_live(live_data, stream_key, rendered_embeds)
+            if embed_info is None:
+                continue
+            self.logger.info(f"[Live:{group}] Editing {stream_key} ({', '.join(changed_fields)})...")
+            try:
+                await self.edit_live(msg_data, [embed_info])
+                edit_count += 1
+            except ActionShed:
+                break
+            except discord.HTTPException:
+                self.logger.error(f"[Live:{group}] Failed to edit {stream_key}, possibly gone.")
+
+    async def bulk_delete_messages(
+        self, channel: TextChannel, messages: t.List[discord.Message], group: str
+    ) -> t.Set[int]:
+        """Delete the messages with as few requests as possible.
+
+        Messages younger than 14 days are deleted in bulk (100 per request),
+        the rest or a failed bulk request will fallback to single delete.
+
+        :return: the IDs of the messages that are now gone
+        """
+        gone_ids: t.Set[int] = set()
+        # Leave some margin from the 14 days bulk delete limit.
+        bulk_cutoff = datetime.utcnow() - timedelta(days=13, hours=23)
+        bulk_messages = [msg for msg in messages if msg.created_at > bulk_cutoff]
+        single_messages = [msg for msg in messages if msg.created_at <= bulk_cutoff]
+
+        for i in range(0, len(bulk_messages), 100):
+            chunk = bulk_messages[i:i + 100]
+            try:
+                await self.bot.rest_planner.submit(
+                    PRIORITY_DELETE, f"bulk_delete:{channel.id}", partial(channel.delete_messages, chunk)
+                )
+                gone_ids.update(msg.id for msg in chunk)
+            except (discord.HTTPException, ActionShed):
+                self.logger.warn(f"[Live:{group}] Bulk deletion failed, falling back to single delete...")
+                single_messages.extend(chunk)
+
+        for msg_data in single_messages:
+            try:
+                await self.delete_live(msg_data)
+                gone_ids.add(msg_data.id)
+            except discord.NotFound:
+                gone_ids.add(msg_data.id)
+            except (discord.HTTPException, ActionShed):
+                self.logger.error(f"[Live:{group}] Failed to delete message {msg_data.id}, will retry.")
+        self.logger.info(f"[Live:{group}] Deleted {len(gone_ids)} out of {len(messages)} messages.")
+        return gone_ids
 
     async def do_and_post_live_data(
-        self, collected_messages: t.List[discord.Message], current_lives_data: t.List[dict], group: str
+        self,
+        collected_messages: t.List[discord.Message],
+        current_lives_data: t.List[dict],
+        group: str,
+        rendered_embeds: t.Optional[t.Dict[str, dict]] = None,
     ):
         self.logger.info(f"[Live:{group}] Mapping everything...")
-        collected_msgs_yt = []
-        collected_msgs_b2 = []
-        collected_msgs_ttv = []
-        collected_msgs_twcast = []
-        collected_msgs_mildom = []
-        if collected_messages:
-            for msg in collected_messages:
-                embed_data = msg.embeds
-                if not embed_data:
-                    continue
-                embed_data: discord.Embed = embed_data[0]
-                embed_dict = embed_data.to_dict()
-                watch_id = embed_dict["footer"]["text"]
-
-                if watch_id.startswith("bili"):
-                    collected_msgs_b2.append(
-                        {"id": watch_id, "msg_data": msg}
-                    )
-                elif watch_id.startswith("twitch"):
-                    collected_msgs_ttv.append(
-                        {"id": watch_id, "msg_data": msg}
-                    )
-                elif watch_id.startswith("twcast"):
-                    collected_msgs_twcast.append(
-                        {"id": watch_id, "msg_data": msg}
-                    )
-                elif watch_id.startswith("mildom"):
-                    collected_msgs_mildom.append(
-                        {"id": watch_id, "msg_data": msg}
-                    )
-                else:
-                    collected_msgs_yt.append(
-                        {"id": watch_id, "msg_data": msg}
-                    )
+        # One pass over the posted messages and one over the snapshot, keyed by the footer key.
+        collected_by_key: t.Dict[str, discord.Message] = {}
+        collected_per_platform: t.Dict[str, int] = {}
+        for msg in collected_messages:
+            if not msg.embeds:
+                continue
+            stream_key = msg.embeds[0].footer.text
+            if not stream_key:
+                continue
+            collected_by_key[stream_key] = msg
+            platform_name = PLATFORMS.platform_of_key(stream_key).name
+            collected_per_platform[platform_name] = collected_per_platform.get(platform_name, 0) + 1
+        current_by_key = {PLATFORMS.key_of(live): live for live in current_lives_data}
 
         if self.total_streams_map[group] == -1:
             # Avoid renaming.
             self.total_streams_map[group] = len(collected_messages)
         self.logger.info("Information about message:")
-        self.logger.info(f"Youtube: {len(collected_msgs_yt)}")
-        self.logger.info(f"Bilibili: {len(collected_msgs_b2)}")
-        self.logger.info(f"Twitch: {len(collected_msgs_ttv)}")
-        self.logger.info(f"Twitcasting: {len(collected_msgs_twcast)}")
-        self.logger.info(f"Mildom: {len(collected_msgs_mildom)}")
-
-        current_lives_yt = [
-            c for c in current_lives_data if c["platform"] == "youtube"
-        ]
-        current_lives_bili = [
-            c for c in current_lives_data if c["platform"] == "bilibili"
-        ]
-        current_lives_ttv = [
-            c for c in current_lives_data if c["platform"] == "twitch"
-        ]
-        current_lives_twcast = [
-            c for c in current_lives_data if c["platform"] == "twitcasting"
-        ]
-        current_lives_mildom = [
-            c for c in current_lives_data if c["platform"] == "mildom"
-        ]
-
-        collected_ytmsg_ids = [c["id"] for c in collected_msgs_yt]
-        channels_lives_yt = [c["channel"]["id"] for c in current_lives_yt]
-        collected_lives_ytids = [c["id"] for c in current_lives_yt]
+        for platform in PLATFORMS:
+            self.logger.info(f"{platform.label}: {collected_per_platform.get(platform.name, 0)}")
 
         if group == "hololive":
-            await self.update_korone_profile_image(channels_lives_yt)
-
-        collected_bilimsg_ids = [c["id"] for c in collected_msgs_b2]
-        collected_lives_biliids = [c["id"] for c in current_lives_bili]
-
-        collected_ttvmsg_ids = [c["id"] for c in collected_msgs_ttv]
-        collected_lives_ttvids = [
-            "twitch" + c["id"] for c in current_lives_ttv
-        ]
-
-        collected_twcastmsg_ids = [c["id"] for c in collected_msgs_twcast]
-        collected_lives_twcastids = [
-            "twcast" + c["id"] for c in current_lives_twcast
-        ]
-
-        collected_mildommsg_ids = [c["id"] for c in collected_msgs_mildom]
-        collceted_lives_mildomids = [
-            "mildom" + c["id"] for c in current_lives_mildom
-        ]
+            self.update_korone_profile_image(
+                [live["channel"]["id"] for live in current_lives_data if live["platform"] == "youtube"]
+            )
 
         self.logger.info(f"[Live:{group}] Collecting everything...")
-        collective_msg_merge = []
-        collective_msg_merge.extend(collected_msgs_yt)
-        collective_msg_merge.extend(collected_msgs_b2)
-        collective_msg_merge.extend(collected_msgs_ttv)
-        collective_msg_merge.extend(collected_msgs_twcast)
-        collective_msg_merge.extend(collected_msgs_mildom)
-
-        need_to_be_posted = []
-        need_to_be_deleted = []
-        for live_id in current_lives_yt:
-            if live_id["id"] not in collected_ytmsg_ids:
-                need_to_be_posted.append(live_id["id"])
-        for live_id in collected_lives_biliids:
-            if live_id not in collected_bilimsg_ids:
-                need_to_be_posted.append(live_id)
-        for live_id in collected_lives_ttvids:
-            if live_id not in collected_ttvmsg_ids:
-                need_to_be_posted.append(live_id)
-        for live_id in collected_lives_twcastids:
-            if live_id not in collected_twcastmsg_ids:
-                need_to_be_posted.append(live_id)
-        for live_id in collceted_lives_mildomids:
-            if live_id not in collected_mildommsg_ids:
-                need_to_be_posted.append(live_id)
-
-        for msg_id in collected_ytmsg_ids:
-            if msg_id not in collected_lives_ytids:
-                need_to_be_deleted.append(msg_id)
-        for msg_id in collected_bilimsg_ids:
-            if msg_id not in collected_lives_biliids:
-                need_to_be_deleted.append(msg_id)
-        for msg_id in collected_ttvmsg_ids:
-            if msg_id not in collected_lives_ttvids:
-                need_to_be_deleted.append(msg_id)
-        for msg_id in collected_twcastmsg_ids:
-            if msg_id not in collected_lives_twcastids:
-                need_to_be_deleted.append(msg_id)
-        for msg_id in collected_mildommsg_ids:
-            if live_id not in collceted_lives_mildomids:
-                need_to_be_deleted.append(msg_id)
+        need_to_be_posted = [stream_key for stream_key in current_by_key if stream_key not in collected_by_key]
+        need_to_be_deleted = [stream_key for stream_key in collected_by_key if stream_key not in current_by_key]
+
+        # Only delete the streams that stay missing past their grace
+        need_to_be_deleted = self.ended_grace.filter_ended(group, current_by_key.keys(), need_to_be_deleted)
+        if self.ended_grace.in_grace(group) > 0:
+            self.logger.info(f"[Live:{group}] {self.ended_grace.in_grace(group)} ended streams are in grace.")
 
         # Let's delete everything first!
         self.logger.info(f"[Live:{group}] Starting deletion process...")
-        for stream in need_to_be_deleted:
+        messages_to_delete: t.List[discord.Message] = []
+        deleting_keys: t.Dict[int, str] = {}
+        for stream_key in need_to_be_deleted:
             self.logger.warn(
-                f"[Live:{group}]: Deleting {stream} from channel..."
+                f"[Live:{group}]: Deleting {stream_key} from channel..."
             )
-            msg_data: discord.Message = await self.find_msg(collective_msg_merge, stream)
-            try:
-                await msg_data.delete()
-            except Exception:
-                self.logger.error(
-                    f"[Live:{group}] Failed to delete {stream}, possibly gone.")
+            msg_data = collected_by_key[stream_key]
+            messages_to_delete.append(msg_data)
+            deleting_keys[msg_data.id] = stream_key
+        if messages_to_delete:
+            gone_ids = await self.bulk_delete_messages(self.channels_set[group], messages_to_delete, group)
+            self._gone_messages[group].update(gone_ids)
+            self.ended_grace.record_deleted(group, [deleting_keys[msg_id] for msg_id in gone_ids])
+            for msg_id in gone_ids:
+                collected_by_key.pop(deleting_keys[msg_id], None)
 
         self.logger.info(f"[Live:{group}] Starting posting process...")
-        for new_live in need_to_be_posted:
-            self.logger.warn(f"[Live:{group}] Posting {new_live}...")
-            if (
-                new_live.startswith("twitch")
-                or new_live.startswith("twcast")
-                or new_live.startswith("mildom")
-            ):
-                new_live = new_live[6:]
-            live_data = await self.find_live_info(current_lives_data, new_live)
-            embed_info = await self.create_embed(live_data, live_data["platform"])
-            if not isinstance(embed_info, discord.Embed):
+        posted_lives: t.List[dict] = []
+        for stream_key in need_to_be_posted:
+            self.logger.warn(f"[Live:{group}] Posting {stream_key}...")
+            live_data = current_by_key[stream_key]
+            embed_info = await self.render_live(live_data, stream_key, rendered_embeds)
+            if embed_info is None:
                 self.logger.warn(
-                    f"[Live:{group}] Skipping {new_live} since it's YouTube rebroadcast."
+                    f"[Live:{group}] Skipping {stream_key} since it's YouTube rebroadcast."
                 )
                 continue
-            await self.channels_set[group].send(content="Currently Live!", embed=embed_info)
+            await self.send_live(group, [embed_info])
+            self.bot.record_first_post("Live")
+            self.ended_grace.record_posted(group, stream_key)
+            posted_lives.append(live_data)
+
+        if posted_lives and self.bot.notifier is not None:
+            self.logger.info(f"[Live:{group}] Notifying subscribers...")
+            await self.bot.notifier.notify_new_lives(self.channels_set[group], posted_lives)
+
+        self.logger.info(f"[Live:{group}] Starting editing process...")
+        await self.edit_changed_lives(collected_by_key, current_lives_data, group, rendered_embeds)
+
+    async def render_live(
+        self, live_data: dict, stream_key: str, rendered_embeds: t.Optional[t.Dict[str, dict]] = None
+    ) -> t.Optional[discord.Embed]:
+        if rendered_embeds is not None and stream_key in rendered_embeds:
+            return discord.Embed.from_dict(rendered_embeds[stream_key])
+        embed_info = await self.create_embed(live_data, live_data["platform"])
+        if not isinstance(embed_info, discord.Embed):
+            # YouTube rebroadcast
+            return None
+        return embed_info
+
+    async def do_and_post_digest(
+        self,
+        collected_messages: t.List[discord.Message],
+        current_lives_data: t.List[dict],
+        group: str,
+        rendered_embeds: t.Optional[t.Dict[str, dict]] = None,
+    ):
+        """Digest mode, the live embeds are packed up to 10 per message.
 
-    async def try_to_rename_channel(self, dataset: list, group: str):
+        An ended stream is dropped from its host message with an edit, the
+        host message is only deleted when it has no stream left.
+        """
+        self.logger.info(f"[Live:{group}] Indexing digest messages...")
+        index = LiveDigestIndex.from_messages(collected_messages)
+        if self.total_streams_map[group] == -1:
+            # Avoid renaming.
+            self.total_streams_map[group] = len(index)
+        if group == "hololive":
+            self.update_korone_profile_image(
+                [live["channel"]["id"] for live in current_lives_data if live["platform"] == "youtube"]
+            )
+
+        current_by_key = {PLATFORMS.key_of(live): live for live in current_lives_data}
+        missing_keys = [stream_key for stream_key in index.keys() if stream_key not in current_by_key]
+        ended_keys = self.ended_grace.filter_ended(group, current_by_key.keys(), missing_keys)
+        dirty_hosts = index.remove(ended_keys)
+        for stream_key in ended_keys:
+            self.logger.warn(f"[Live:{group}]: Removing {stream_key} from the digest...")
+
+        changed_hosts: t.Set[int] = set()
+        for stream_key in index.keys():
+            live_data = current_by_key.get(stream_key)
+            if live_data is None:
+                # Still in grace
+                continue
+            host_id = index.host_of(stream_key)
+            edit_is_free = host_id in dirty_hosts or host_id in changed_hosts
+            if not edit_is_free and len(changed_hosts) >= self.max_edits_per_cycle:
+                continue
+            changed_fields = detect_embed_changes(index.embed_of(stream_key), live_data)
+            if not changed_fields:
+                continue
+            embed_info = await self.render_live(live_data, stream_key, rendered_embeds)
+            if embed_info is None:
+                continue
+            self.logger.info(f"[Live:{group}] Editing {stream_key} ({', '.join(changed_fields)})...")
+            host_id = index.replace(stream_key, embed_info)
+            if host_id not in dirty_hosts:
+                changed_hosts.add(host_id)
+
+        empty_hosts: t.List[discord.Message] = []
+        for host_id in dirty_hosts | changed_hosts:
+            embeds = index.embeds_of(host_id)
+            if not embeds:
+                empty_hosts.append(index.hosts[host_id])
+                continue
+            try:
+                await self.edit_live(index.hosts[host_id], embeds)
+            except (discord.HTTPException, ActionShed):
+                self.logger.error(f"[Live:{group}] Failed to edit digest message {host_id}, will retry.")
+        if empty_hosts:
+            gone_ids = await self.bulk_delete_messages(self.channels_set[group], empty_hosts, group)
+            self._gone_messages[group].update(gone_ids)
+        self.ended_grace.record_deleted(group, ended_keys)
+
+        self.logger.info(f"[Live:{group}] Starting posting process...")
+        new_keys: t.List[str] = []
+        new_embeds: t.List[discord.Embed] = []
+        for stream_key, live_data in current_by_key.items():
+            if stream_key in index:
+                continue
+            embed_info = await self.render_live(live_data, stream_key, rendered_embeds)
+            if embed_info is None:
+                self.logger.warn(f"[Live:{group}] Skipping {stream_key} since it's YouTube rebroadcast.")
+                continue
+            new_keys.append(stream_key)
+            new_embeds.append(embed_info)
+
+        posted_lives: t.List[dict] = []
+        for embeds in pack_embeds(new_embeds):
+            pack_keys, new_keys = new_keys[:len(embeds)], new_keys[len(embeds):]
+            self.logger.warn(f"[Live:{group}] Posting {', '.join(pack_keys)}...")
+            await self.send_live(group, embeds)
+            self.bot.record_first_post("Live")
+            for stream_key in pack_keys:
+                self.ended_grace.record_posted(group, stream_key)
+                posted_lives.append(current_by_key[stream_key])
+
+        if posted_lives and self.bot.notifier is not None:
+            self.logger.info(f"[Live:{group}] Notifying subscribers...")
+            await self.bot.notifier.notify_new_lives(self.channels_set[group], posted_lives)
+
+    def try_to_rename_channel(self, dataset: list, group: str):
         channel_prefix = {
             "hololive": "holo-",
             "nijisanji": "nijisanji-",
             "other": "others-"
         }
-        if len(dataset) != self.total_streams_map[group]:
-            self.total_streams_map[group] = len(dataset)
+        live_count = len(dataset)
+        pending = self._rename_pending.get(group)
+        if pending is not None and not pending[1].done() and pending[0] == live_count:
+            return
+        if live_count != self.total_streams_map[group]:
             self.logger.info(f"[Live:{group}] Renaming channel...")
 
             BASE_TEXT = channel_prefix.get(group, "unknown-")
-            if len(dataset) > 0:
-                BASE_TEXT += f"{len(dataset)}-live-now"
+            if live_count > 0:
+                BASE_TEXT += f"{live_count}-live-now"
                 BASE_TEXT = "🔴-" + BASE_TEXT
             else:
                 BASE_TEXT += "live"
-            await self.channels_set[group].edit(
-                name=BASE_TEXT, reason="Change to amount of channels live."
+            channel = self.channels_set[group]
+
+            def _set_count():
+                self.total_streams_map[group] = live_count
+
+            # A newer rename replace the queued one, the old count is kept if it's dropped.
+            future = asyncio.ensure_future(
+                self.bot.rest_planner.submit(
+                    PRIORITY_RENAME,
+                    f"rename:{channel.id}",
+                    partial(channel.edit, name=BASE_TEXT, reason="Change to amount of channels live."),
+                    coalesce_key=f"rename:{channel.id}",
+                )
+            )
+            future.add_done_callback(
+                partial(self._on_background_action, action=f"Renaming #{channel}", on_success=_set_count)
             )
+            self._rename_pending[group] = (live_count, future)
+
+    async def run_group_pipeline(
+        self,
+        group: str,
+        mapped_lives_data: dict,
+        rendered_embeds: t.Optional[t.Dict[str, t.Dict[str, dict]]] = None,
+    ):
+        """Collect, post and rename a single group, a failure stay inside the group."""
+        start_time = time.perf_counter()
+        failed = False
+        try:
+            self.logger.info(f"[Live:{group}] Collecting messages...")
+            collected_messages = await self.collect_group_messages(group)
+            if collected_messages is None:
+                return
+            post_live_data = self.do_and_post_digest if self.digest_mode else self.do_and_post_live_data
+            await post_live_data(
+                collected_messages,
+                mapped_lives_data[group],
+                group,
+                rendered_embeds[group] if rendered_embeds is not None else None,
+            )
+            self.logger.info(f"[Live:{group}] Finalizing...")
+            self.try_to_rename_channel(mapped_lives_data[group], group)
+        except asyncio.CancelledError:
+            # Timed out (or unloaded), counted as failed on vt!shards
+            failed = True
+            raise
+        except Exception as e:
+            failed = True
+            tb = traceback.format_exception(type(e), e, e.__traceback__)
+            self.logger.error(f"[Live:{group}] Error occured.")
+            self.logger.error("".join(tb))
+        finally:
+            self.bot.record_group_cycle("live", group, time.perf_counter() - start_time, failed)
+
+    async def run_shard_cycle(
+        self,
+        shard_id: int,
+        groups: t.List[str],
+        mapped_lives_data: dict,
+        rendered_embeds: t.Optional[t.Dict[str, t.Dict[str, dict]]] = None,
+    ):
+        start_time = time.perf_counter()
+        try:
+            self.logger.info(f"[Live:shard-{shard_id}] Starting live update processing...")
+            # Every group run on its own task, a slow channel will not hold the others or the next tick.
+            launched = [
+                self.pipelines.launch(
+                    group, partial(self.run_group_pipeline, group, mapped_lives_data, rendered_embeds)
+                )
+                for group in groups
+            ]
+            launched = [task for task in launched if task is not None]
+            if launched:
+                await asyncio.wait(launched)
+        finally:
+            self.bot.record_shard_cycle(shard_id, "live", time.perf_counter() - start_time)
 
     @tasks.loop(minutes=1.0)
     async def improved_live_watcher(self):
+        async with self.bot.supervisor.cycle("live"):
+            await self.bot.profiler.run("live", self.live_watcher_cycle)
+
+    async def live_watcher_cycle(self):
         try:
-            if (
-                self.channels_set["hololive"] is None
-                and self.channels_set["nijisanji"] is None
-                and self.channels_set["other"] is None
-            ):
+            shard_groups = self.bot.group_channels_by_shard(self.channels_set)
+            if not shard_groups:
                 self.logger.warn(
                     "[Live] There's no channel, ignoring"
                 )
                 return
-            self.logger.info("[Live] Collecting messages...")
-            collected_messages = await self.collect_and_map_messages()
-
-            current_lives_all = []
-            self.logger.info("[Live] Fetching ihateani.me API streams...")
-            try:
-                current_lives_ihaapi = await self.ihaapi.fetch_lives()
-                current_lives_all.extend(current_lives_ihaapi)
-            except ValueError:
-                self.logger.error(
-                    "[Live] Received ihaapi data are incomplete, cancelling...")
-                return
-            except asyncio.TimeoutError:
-                self.logger.error(
-                    "[Live] Timeout error while fetching ihaapi data, cancelling...")
-                return
 
-            self.logger.info("[Live] Mapping results...")
-            mapped_lives_data = await self._split_results_into_group(current_lives_all)
-            self.logger.info("[Live] Starting live update processing...")
-            if collected_messages["hololive"] is not None:
-                await self.do_and_post_live_data(
-                    collected_messages["hololive"], mapped_lives_data["hololive"], "hololive"
-                )
-            if collected_messages["nijisanji"] is not None:
-                await self.do_and_post_live_data(
-                    collected_messages["nijisanji"], mapped_lives_data["nijisanji"], "nijisanji"
-                )
-            if collected_messages["other"] is not None:
-                await self.do_and_post_live_data(
-                    collected_messages["other"], mapped_lives_data["other"], "other"
-                )
-
-            self.logger.info("[Live] Finalizing...")
-            if self.channels_set["hololive"] is not None:
-                await self.try_to_rename_channel(mapped_lives_data["hololive"], "hololive")
-            if self.channels_set["nijisanji"] is not None:
-                await self.try_to_rename_channel(mapped_lives_data["nijisanji"], "nijisanji")
-            if self.channels_set["other"] is not None:
-                await self.try_to_rename_channel(mapped_lives_data["other"], "other")
+            rendered_embeds = None
+            if self.bot.plan_feed is not None:
+                self.logger.info("[Live] Using the worker plan...")
+                live_plan = self.bot.plan_feed.latest("live")
+                if live_plan is None:
+                    self.logger.error("[Live] There's no fresh plan from the worker, cancelling...")
+                    return
+                mapped_lives_data = {
+                    group: [stream["item"] for stream in plan_data["streams"]]
+                    for group, plan_data in live_plan["groups"].items()
+                }
+                rendered_embeds = {
+                    group: {stream["key"]: stream["embed"] for stream in plan_data["streams"]}
+                    for group, plan_data in live_plan["groups"].items()
+                }
+            else:
+                current_lives_all = []
+                self.logger.info("[Live] Fetching ihateani.me API streams...")
+                try:
+                    current_lives_ihaapi = self.bot.warmup.take_snapshot("live")
+                    if current_lives_ihaapi is None:
+                        current_lives_ihaapi = await self.ihaapi.fetch_lives()
+                    current_lives_all.extend(current_lives_ihaapi)
+                except ValueError:
+                    self.logger.error(
+                        "[Live] Received ihaapi data are incomplete, cancelling...")
+                    return
+                except asyncio.TimeoutError:
+                    self.logger.error(
+                        "[Live] Timeout error while fetching ihaapi data, cancelling...")
+                    return
+                except CircuitOpen as e:
+                    self.logger.warn(f"[Live] {e}, keeping the current embeds.")
+                    return
+
+                self.logger.info("[Live] Mapping results...")
+                mapped_lives_data = await self._split_results_into_group(current_lives_all)
+            current_lives_mapped = [live for lives in mapped_lives_data.values() for live in lives]
+            # The search index follow the deltas
+            self.ihaapi.changes.publish("live", current_lives_mapped)
+            if self.bot.stream_history is not None:
+                self.bot.stream_history.record_snapshot(current_lives_mapped)
+            # One fetch per tick, every shard only work on the channels in its guilds.
+            # The tick doesn't wait for the pipelines, unless they're being profiled.
+            shard_cycles = [
+                asyncio.ensure_future(self.run_shard_cycle(shard_id, groups, mapped_lives_data, rendered_embeds))
+                for shard_id, groups in shard_groups.items()
+            ]
+            for shard_cycle in shard_cycles:
+                self.bot.supervisor.track(shard_cycle)
+            if self.bot.profiler.is_armed("live"):
+                await asyncio.wait(shard_cycles)
             self.logger.info("[Live] Sleeping...")
         except Exception as e:
             tb = traceback.format_exception(type(e), e, e.__traceback__)
@@ -0,0 +1,52 @@
+import asyncio
+import io
+import logging
+
+import discord
+from discord.ext import commands
+
+from vtutils.bot import VTuberBot
+
+
+class CycleProfiling(commands.Cog):
+    def __init__(self, bot: VTuberBot):
+        self.bot = bot
+        self.logger: logging.Logger = logging.getLogger("cogs.profiler")
+        # watcher name -> (cog name, loop attribute)
+        self.watchers = {
+            "live": ("LiveWatcher", "improved_live_watcher"),
+            "upcoming": ("UpcomingWatcher", "improved_upcoming_watcher"),
+        }
+
+    @commands.command(name="profile")
+    @commands.is_owner()
+    async def profile_cycles(self, ctx: commands.Context, watcher: str, cycles: int = 1):
+        if watcher not in self.watchers:
+            return await ctx.send(f"Unknown watcher, available: {', '.join(self.watchers.keys())}")
+        cog_name, loop_name = self.watchers[watcher]
+        cog = self.bot.get_cog(cog_name)
+        if cog is None:
+            return await ctx.send(f"`{cog_name}` is not loaded.")
+        cycles = min(max(cycles, 1), 10)
+        watcher_loop = getattr(cog, loop_name)
+        interval = watcher_loop.seconds + watcher_loop.minutes * 60 + watcher_loop.hours * 3600
+
+        try:
+            report_future = self.bot.profiler.arm(watcher, cycles)
+        except ValueError as e:
+            return await ctx.send(str(e))
+        self.logger.info(f"Profiling the next {cycles} {watcher} cycle(s)")
+        await ctx.send(f"Profiling the next {cycles} `{watcher}` cycle(s)...")
+        try:
+            report = await asyncio.wait_for(report_future, cycles * interval + 5 * 60)
+        except asyncio.TimeoutError:
+            self.bot.profiler.disarm(watcher)
+            return await ctx.send(f"Timed out waiting for the `{watcher}` cycles, is the watcher running?")
+
+        summary = "\n".join(report.splitlines()[:8])
+        report_file = discord.File(io.BytesIO(report.encode("utf-8")), filename=f"profile_{watcher}.txt")
+        await ctx.send(content=f"```\n{summary}\n```", file=report_file)
+
+
+def setup(bot: VTuberBot):
+    bot.add_cog(CycleProfiling(bot))
@@ -0,0 +1,51 @@
+import logging
+import time
+import typing as t
+
+from discord.ext import commands
+
+from vtutils.bot import VTuberBot
+from vtutils.render import stream_url
+
+
+class StreamSearch(commands.Cog):
+    def __init__(self, bot: VTuberBot):
+        self.bot = bot
+        self.logger: logging.Logger = logging.getLogger("cogs.search")
+
+    @staticmethod
+    def _format_results(results: t.List[dict], upcoming: bool) -> str:
+        text_res = ""
+        for data in results:
+            channel_data = data["channel"]
+            channel_name = channel_data.get("en_name") or channel_data.get("name", "Unknown")
+            text_res += "\n📅 " if upcoming else "\n🔴 "
+            text_res += f"**{channel_name}** - [{data['title']}](<{stream_url(data)}>)"
+            if upcoming:
+                text_res += f" <t:{int(round(data['timeData']['startTime']))}:R>"
+            text_res += f" ({data['group']}, {data['platform']})"
+        return text_res
+
+    @commands.command(name="live")
+    async def live_search(self, ctx: commands.Context, *, query: str):
+        start_time = time.perf_counter()
+        results = self.bot.live_index.search(query)
+        search_time = (time.perf_counter() - start_time) * 1000
+        self.logger.info(f"live: searched {query!r} in {search_time:.3f}ms")
+        if not results:
+            return await ctx.send(f"Nobody matching `{query}` is live right now.")
+        await ctx.send(content=f"Live now:{self._format_results(results, False)}"[:2000])
+
+    @commands.command(name="next")
+    async def next_search(self, ctx: commands.Context, *, query: str):
+        start_time = time.perf_counter()
+        results = self.bot.upcoming_index.search(query)
+        search_time = (time.perf_counter() - start_time) * 1000
+        self.logger.info(f"next: searched {query!r} in {search_time:.3f}ms")
+        if not results:
+            return await ctx.send(f"There's no upcoming stream matching `{query}`.")
+        await ctx.send(content=f"Upcoming:{self._format_results(results, True)}"[:2000])
+
+
+def setup(bot: VTuberBot):
+    bot.add_cog(StreamSearch(bot))
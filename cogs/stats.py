@@ -0,0 +1,59 @@
+import logging
+import time
+
+from discord.ext import commands
+
+from vtutils.bot import VTuberBot
+
+
+class StreamStats(commands.Cog):
+    def __init__(self, bot: VTuberBot):
+        self.bot = bot
+        self.logger: logging.Logger = logging.getLogger("cogs.stats")
+
+    @commands.group(name="stats", invoke_without_command=True)
+    @commands.is_owner()
+    async def stats_main(self, ctx: commands.Context):
+        await ctx.send(
+            "Available commands:\n"
+            "`vt!stats groups [days=7]`: hours streamed per group\n"
+            "`vt!stats channels [days=30] [limit=10]`: top channels by hours streamed"
+        )
+
+    @stats_main.command(name="groups")
+    @commands.is_owner()
+    async def stats_groups(self, ctx: commands.Context, days: int = 7):
+        if self.bot.stream_history is None:
+            return await ctx.send("Stream analytics is not enabled.")
+        start_time = time.perf_counter()
+        results = await self.bot.stream_history.hours_per_group(int(time.time()) - days * 86400)
+        query_time = (time.perf_counter() - start_time) * 1000
+        if not results:
+            return await ctx.send(f"No streams recorded in the last {days} days.")
+        text_res = f":bar_chart: Hours streamed per group (last {days} days) :bar_chart:"
+        for group, hours in results:
+            text_res += f"\n**{group}**: `{hours:.1f}` hours"
+        text_res += f"\n*Queried in {query_time:.2f}ms*"
+        await ctx.send(content=text_res[:2000])
+
+    @stats_main.command(name="channels")
+    @commands.is_owner()
+    async def stats_channels(self, ctx: commands.Context, days: int = 30, limit: int = 10):
+        if self.bot.stream_history is None:
+            return await ctx.send("Stream analytics is not enabled.")
+        start_time = time.perf_counter()
+        results = await self.bot.stream_history.top_channels(
+            int(time.time()) - days * 86400, limit=min(max(limit, 1), 25)
+        )
+        query_time = (time.perf_counter() - start_time) * 1000
+        if not results:
+            return await ctx.send(f"No streams recorded in the last {days} days.")
+        text_res = f":trophy: Top channels (last {days} days) :trophy:"
+        for rank, (channel_id, channel_name, hours, total_streams) in enumerate(results, 1):
+            text_res += f"\n{rank}. **{channel_name or channel_id}**: `{hours:.1f}` hours ({total_streams} streams)"
+        text_res += f"\n*Queried in {query_time:.2f}ms*"
+        await ctx.send(content=text_res[:2000])
+
+
+def setup(bot: VTuberBot):
+    bot.add_cog(StreamStats(bot))
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+
+import aiohttp
+import discord
+from discord.ext import commands
+
+from vtutils.bot import VTuberBot
+from vtutils.breaker import CircuitOpen
+
+
+class Subscriptions(commands.Cog):
+    def __init__(self, bot: VTuberBot):
+        self.bot = bot
+        self.logger: logging.Logger = logging.getLogger("cogs.subscribe")
+
+    async def check_channel(self, ctx: commands.Context, channel_id: str) -> bool:
+        """Check the VTuber channel ID against the API channel list, tell the user when it's not valid"""
+        try:
+            channel_ids = await self.bot.ihaapiv2.fetch_channel_ids()
+        except (ValueError, asyncio.TimeoutError, aiohttp.ClientError, CircuitOpen) as e:
+            self.logger.error(f"Failed to fetch the channel list: {e}")
+            await ctx.send("The VTuber list can't be fetched right now, please try again later.")
+            return False
+        if channel_id not in channel_ids:
+            await ctx.send(f"`{channel_id}` is not a known VTuber channel ID.")
+            return False
+        return True
+
+    def is_destination_guild(self, guild: discord.Guild) -> bool:
+        """Only the guilds with a live channel may subscribe a role"""
+        return any(
+            channel is not None and channel.guild.id == guild.id for channel in self.bot.warmup.channels.values()
+        )
+
+    @commands.command(name="subscribe")
+    async def subscribe_user(self, ctx: commands.Context, channel_id: str):
+        """Get a DM when the VTuber channel ID go live"""
+        if not await self.check_channel(ctx, channel_id):
+            return
+        if self.bot.subscriptions.subscribe_user(channel_id, ctx.author.id):
+            await ctx.send(f"You will get a DM when `{channel_id}` go live.")
+        else:
+            await ctx.send(f"You're already subscribed to `{channel_id}`.")
+
+    @commands.command(name="unsubscribe")
+    async def unsubscribe_user(self, ctx: commands.Context, channel_id: str):
+        if self.bot.subscriptions.unsubscribe_user(channel_id, ctx.author.id):
+            await ctx.send(f"Unsubscribed from `{channel_id}`.")
+        else:
+            await ctx.send(f"You're not subscribed to `{channel_id}`.")
+
+    @commands.command(name="subscriptions")
+    async def list_subscriptions(self, ctx: commands.Context):
+        channel_ids = self.bot.subscriptions.user_subscriptions(ctx.author.id)
+        if not channel_ids:
+            return await ctx.send("You don't have any subscription.")
+        text_res = "Your subscriptions:\n" + "\n".join(f"- `{channel_id}`" for channel_id in channel_ids)
+        await ctx.send(content=text_res[:2000])
+
+    @commands.command(name="subrole")
+    @commands.guild_only()
+    @commands.has_permissions(manage_roles=True)
+    async def subscribe_role(self, ctx: commands.Context, channel_id: str, role: discord.Role):
+        """Ping a role on the live channel when the VTuber channel ID go live"""
+        if not self.is_destination_guild(ctx.guild):
+            return await ctx.send("This server doesn't have any live channel, the role can't be pinged here.")
+        if not await self.check_channel(ctx, channel_id):
+            return
+        if self.bot.subscriptions.subscribe_role(channel_id, role.id, ctx.guild.id):
+            await ctx.send(f"`{role.name}` will be pinged when `{channel_id}` go live.")
+        else:
+            await ctx.send(f"`{role.name}` is already subscribed to `{channel_id}`.")
+
+    @commands.command(name="unsubrole")
+    @commands.guild_only()
+    @commands.has_permissions(manage_roles=True)
+    async def unsubscribe_role(self, ctx: commands.Context, channel_id: str, role: discord.Role):
+        if self.bot.subscriptions.unsubscribe_role(channel_id, role.id):
+            await ctx.send(f"`{role.name}` unsubscribed from `{channel_id}`.")
+        else:
+            await ctx.send(f"`{role.name}` is not subscribed to `{channel_id}`.")
+
+
+def setup(bot: VTuberBot):
+    bot.add_cog(Subscriptions(bot))
@@ -1,8 +1,9 @@
 import asyncio
-import re
 import logging
+import time
 import traceback
 from datetime import datetime, timezone
+from functools import partial
 import typing as t
 
 import discord
@@ -10,6 +11,22 @@ from discord import TextChannel
 from discord.ext import commands, tasks
 
 from vtutils.bot import VTuberBot
+from vtutils.breaker import CircuitOpen
+from vtutils.budget import PRIORITY_EDIT, PRIORITY_POST, ActionShed
+from vtutils.changefeed import ChangeSubscription
+from vtutils.groups import split_into_groups
+from vtutils.pipelines import GroupPipelines
+from vtutils.render import (
+    DEPLOYED_BOT_ID,
+    LATE_THRESHOLD,
+    LATE_TOLERANCE,
+    SCHEDULE_FIELDS,
+    design_schedule,
+    is_freechat,
+    stream_url,
+)
+from vtutils.reminders import ReminderScheduler
+from vtutils.search import SEARCH_FIELDS
 
 
 def setup(bot: VTuberBot):
@@ -23,14 +40,11 @@ class UpcomingWatcher(commands.Cog):
         self.conf = bot.botconf
         self.ihaapi = bot.ihaapiv2
         self.jst: timezone = bot.jst_tz
-        self.LATE = (5 * 60)
-        self.LATE_TOLERANCE = (12 * 60)
+        self.LATE = LATE_THRESHOLD
+        self.LATE_TOLERANCE = LATE_TOLERANCE
 
-        self.channels_set: t.Dict[str, TextChannel] = {
-            "hololive": self.bot.get_channel(self.conf["channels"]["holo"]),
-            "nijisanji": self.bot.get_channel(self.conf["channels"]["niji"]),
-            "other": self.bot.get_channel(self.conf["channels"]["other"])
-        }
+        # Resolved (or fetched) by the startup warm-up
+        self.channels_set: t.Dict[str, t.Optional[TextChannel]] = self.bot.warmup.channels
         self.upcoming_message_set = bot.upcoming_message
 
         self.messages_logo = {
@@ -39,12 +53,45 @@ class UpcomingWatcher(commands.Cog):
             "other": "https://s.ytimg.com/yts/img/favicon_144-vfliLAfaB.png"  # noqa: E501
         }
         self.logger: logging.Logger = logging.getLogger("cogs.upcoming")
+        self.pipelines = GroupPipelines("upcoming", bot, self.conf.get("upcoming", {}).get("pipeline_timeout", 10 * 60))
+
+        reminders_conf: dict = self.conf.get("reminders", {})
+        self.reminders: t.Optional[ReminderScheduler] = None
+        self._reminders_feed: t.Optional[ChangeSubscription] = None
+        if reminders_conf.get("enabled", False):
+            self.reminders = ReminderScheduler(
+                self.send_reminder,
+                [minutes * 60 for minutes in reminders_conf.get("offsets", [10, 0])],
+            )
+            self.reminders.start()
+            self._reminders_feed = self.ihaapi.changes.follow(self.reminders.apply, "upcoming")
+
+        self.ihaapi.register_fields("upcoming", "cogs.upcoming", SCHEDULE_FIELDS)
+        self.ihaapi.register_fields("upcoming", "search", SEARCH_FIELDS)
+
+        # Tasks, started once the channels and the first snapshot are warm
+        if self.bot.warmup.done:
+            self.start_watcher()
+
+    @commands.Cog.listener()
+    async def on_warmup_done(self):
+        self.start_watcher()
 
-        # Tasks
+    def start_watcher(self):
+        if self.improved_upcoming_watcher.is_running():
+            return
         self.improved_upcoming_watcher.start()
+        self.bot.supervisor.register("upcoming", self.improved_upcoming_watcher)
 
     def cog_unload(self):
+        self.bot.supervisor.unregister("upcoming")
         self.improved_upcoming_watcher.cancel()
+        self.pipelines.cancel()
+        if self.reminders is not None:
+            self._reminders_feed.close()
+            self.reminders.close()
+        self.ihaapi.unregister_fields("upcoming", "cogs.upcoming")
+        self.ihaapi.unregister_fields("upcoming", "search")
 
     def _truncate_fields(self, dataset: list, limit: int = 1024):
         final_text = ""
@@ -58,171 +105,51 @@ class UpcomingWatcher(commands.Cog):
 
     @staticmethod
     def is_freechat(title: str) -> bool:
-        all_match = re.findall(r"(fr[e]{2}).*(chat)", title, re.I)
-        if len(all_match) > 0:
-            return True
-        return False
+        return is_freechat(title)
 
     async def design_scheduled(self, dataset: list):
-        grouped_time = {}
-        current_time = datetime.now(timezone.utc).timestamp()
-
-        for data in dataset:
-            start_time = data["timeData"].get(
-                "scheduledStartTime", data["timeData"].get("startTime")
-            )
-            if start_time is None:
-                continue
-            start_time = int(round(start_time))
-            if self.is_freechat(data["title"]):
-                # Skip free chat room
-                continue
-            if current_time >= start_time + self.LATE_TOLERANCE:
-                # Too long
-                continue
-            formatted_time = datetime.fromtimestamp(
-                start_time + (9 * 60 * 60), tz=timezone.utc
-            ).strftime("%m/%d %H:%M JST")
-            if formatted_time not in grouped_time:
-                grouped_time[formatted_time] = []
-            grouped_time[formatted_time].append(data)
-
-        MAX_LENGTH = 2048
-        formatted_schedule = ""
-        LINK_FORMAT = {
-            "youtube": "https://youtu.be/",
-            "twitch": "https://twitch.tv/",
-            "twitcasting": "https://twitcasting.tv/",
-            "mildom": "https://mildom.com/"
-        }
-        ICONS_MAP_FORMAT = {
-            "youtube": "<:vtBYT:843473930348920832>",
-            "twitch": "<:vtBTTV:843474008984518687>",
-            "twitcasting": "<:vtBTW:843473977484509184>",
-            "mildom": "<:vtBMD:843474000159965226>",
-            "bilibili": "<:vtBB2:843474401310670848>"
-        }
-        should_break = False
-        exchanged_fmt = formatted_schedule
-        for start_time, dataset in grouped_time.items():
-            if len(dataset) < 1:
-                continue
-            first_data = dataset[0]
-            real_start_time = first_data["timeData"].get(
-                "scheduledStartTime", first_data["timeData"].get("startTime")
-            )
-            if real_start_time is None:
-                real_start_time = "**" + start_time + "**"
-            else:
-                real_start_time = f"<t:{int(round(real_start_time))}>"
-            temp = f"{formatted_schedule} {real_start_time}\n"
-            if len(temp) >= MAX_LENGTH:
-                break
-            exchanged_fmt = formatted_schedule
-            formatted_schedule = temp
-            for data in dataset:
-                start_time = data["timeData"].get(
-                    "scheduledStartTime", data["timeData"].get("startTime")
-                )
-                msg_fmt = ""
-                if data.get("is_member", False):
-                    msg_fmt += "🔒 "
-                if data.get("is_premiere", False):
-                    msg_fmt += "▶ "
-                if current_time > start_time + self.LATE:
-                    msg_fmt += "❓ "
-                channel_data = data["channel"]
-                channel_name = channel_data.get(
-                    "en_name", channel_data.get(
-                        "name", "Unknown"
-                    )
-                )
-                LINK_PREFIX = LINK_FORMAT.get(data["platform"])
-                ICON_PREFIX = ICONS_MAP_FORMAT.get(data["platform"], "")
-                if self.bot.user.id == 714518710924345475:
-                    # Add icon prefix if it's my deployed bot
-                    msg_fmt += f"{ICON_PREFIX} "
-                msg_fmt += f"**`{channel_name}`**"
-                msg_fmt += f" - [{data['title']}]({LINK_PREFIX}{data['id']})\n"
-                temp = formatted_schedule + msg_fmt
-                if len(temp) >= MAX_LENGTH:
-                    should_break = True
-                    break
-                formatted_schedule = temp
-            if should_break:
-                break
-            temp = formatted_schedule + "\n"
-            if len(temp) >= MAX_LENGTH:
-                formatted_schedule = exchanged_fmt
-                break
-            formatted_schedule = temp
-        formatted_schedule = formatted_schedule.rstrip("\n")
-        return formatted_schedule
-
-    async def collect_and_map_messages(self) -> t.Dict[str, discord.Message]:
-        holomessages = nijimessages = othermessages = None
-        if self.channels_set["hololive"] is not None and self.upcoming_message_set["hololive"] is not None:
-            holomessages: discord.Message = await self.channels_set["hololive"].fetch_message(
-                self.upcoming_message_set["hololive"]
-            )
-        if self.channels_set["nijisanji"] is not None and self.upcoming_message_set["nijisanji"] is not None:
-            nijimessages: discord.Message = await self.channels_set["nijisanji"].fetch_message(
-                self.upcoming_message_set["nijisanji"]
-            )
-        if self.channels_set["other"] is not None and self.upcoming_message_set["other"] is not None:
-            othermessages: discord.Message = await self.channels_set["other"].fetch_message(
-                self.upcoming_message_set["other"]
-            )
-        return {
-            "hololive": holomessages,
-            "nijisanji": nijimessages,
-            "other": othermessages
-        }
+        return design_schedule(
+            dataset, self.LATE, self.LATE_TOLERANCE, with_icons=self.bot.user.id == DEPLOYED_BOT_ID
+        )
 
-    def is_nijisanji(self, group_name):
-        groups_set = [
-            "nijisanji",
-            "nijisanjijp",
-            "nijisanjikr",
-            "nijisanjiid",
-            "nijisanjien",
-            "nijisanjiin",
-            "virtuareal"
-        ]
-        if group_name in groups_set:
-            return True
-        return False
+    async def send_reminder(self, data: dict, group: str, offset: int):
+        channel = self.channels_set.get(group)
+        if channel is None or self.is_freechat(data["title"]):
+            return
+        channel_data = data["channel"]
+        channel_name = channel_data.get("en_name") or channel_data.get("name", "Unknown")
+        if offset > 0:
+            text_res = f"⏰ **{channel_name}** is starting in {offset // 60} minutes!"
+        else:
+            text_res = f"🔔 **{channel_name}** should be live now!"
+        text_res += f"\n{data['title']}\n<{stream_url(data)}>"
+        self.logger.info(f"[Upcoming:{group}] Sending reminder for {data['id']} ({offset}s)")
+        # Deleted by the live cycle once it expire, see ``LiveWatcher.sweep_notifications``
+        await self.bot.rest_planner.submit(PRIORITY_POST, f"send:{channel.id}", partial(channel.send, content=text_res))
 
-    def is_holopro(self, group_name):
-        groups_set = ["hololive", "hololiveid", "hololivecn",
-                      "hololiveen", "hololivejp", "holostars"]
-        if group_name in groups_set:
-            return True
-        return False
+    async def collect_group_message(self, group: str) -> t.Optional[discord.Message]:
+        channel = self.channels_set[group]
+        message_id = self.upcoming_message_set[group]
+        if channel is None or message_id is None:
+            return None
+        message = self.bot.warmup.take_placeholder(group)
+        if message is not None and message.id == message_id:
+            return message
+        return await channel.fetch_message(message_id)
 
     async def _split_results_into_group(self, results_items):
-        streams_data = {
-            "hololive": [],
-            "nijisanji": [],
-            "other": []
-        }
-        for result in results_items:
-            if result["group"] in self.bot.ignore_lists:
-                continue
-            if result["platform"] == "bilibili":
-                if result["group"] not in ["hololive", "nijisanji", "hololivecn", "virtuareal"]:
-                    continue
-            if self.is_nijisanji(result["group"]):
-                streams_data["nijisanji"].append(result)
-            elif self.is_holopro(result["group"]):
-                streams_data["hololive"].append(result)
-            else:
-                streams_data["other"].append(result)
-        return streams_data
+        return split_into_groups(results_items, self.bot.ignore_lists)
 
-    async def update_message_data(self, message: discord.Message, upcoming_data: list, group: str):
-        self.logger.info(f"[Upcoming:{group}] Mapping data...")
-        schedule_formatted = await self.design_scheduled(upcoming_data)
+    async def update_message_data(
+        self,
+        message: discord.Message,
+        upcoming_data: list,
+        group: str,
+        schedule_formatted: t.Optional[str] = None,
+    ):
+        if schedule_formatted is None:
+            self.logger.info(f"[Upcoming:{group}] Mapping data...")
+            schedule_formatted = await self.design_scheduled(upcoming_data)
 
         self.logger.info(f"[Upcoming:{group}] Generating new embed...")
         embed = discord.Embed(title="Upcoming Stream", timestamp=datetime.now(tz=self.jst))
@@ -244,59 +171,147 @@ class UpcomingWatcher(commands.Cog):
 
         self.logger.info(f"[Upcoming:{group}] Updating message....")
         try:
-            await message.edit(embed=embed)
+            await self.bot.rest_planner.submit(
+                PRIORITY_EDIT,
+                f"edit:{message.channel.id}",
+                partial(message.edit, embed=embed),
+                coalesce_key=f"upcoming:{group}",
+            )
+            self.bot.record_first_post("Upcoming")
+        except ActionShed:
+            self.logger.warn(f"[Upcoming:{group}] Update was dropped, will retry on the next cycle.")
         except Exception as e:
             tb = traceback.format_exception(type(e), e, e.__traceback__)
             self.logger.error("".join(tb))
         self.logger.info(f"[Upcoming:{group}] Message updated!")
 
+    async def run_group_pipeline(
+        self,
+        group: str,
+        mapped_upcoming_data: dict,
+        rendered_schedules: t.Optional[t.Dict[str, str]] = None,
+    ):
+        """Update a single group schedule, a failure stay inside the group."""
+        start_time = time.perf_counter()
+        failed = False
+        try:
+            self.logger.info(f"[Upcoming:{group}] Collecting message...")
+            message = await self.collect_group_message(group)
+            if message is None:
+                return
+            await self.update_message_data(
+                message,
+                mapped_upcoming_data[group],
+                group,
+                rendered_schedules[group] if rendered_schedules is not None else None,
+            )
+        except asyncio.CancelledError:
+            # Timed out (or unloaded), counted as failed on vt!shards
+            failed = True
+            raise
+        except Exception as e:
+            failed = True
+            tb = traceback.format_exception(type(e), e, e.__traceback__)
+            self.logger.error(f"[Upcoming:{group}] Error occured.")
+            self.logger.error("".join(tb))
+        finally:
+            self.bot.record_group_cycle("upcoming", group, time.perf_counter() - start_time, failed)
+
+    async def run_shard_cycle(
+        self,
+        shard_id: int,
+        groups: t.List[str],
+        mapped_upcoming_data: dict,
+        rendered_schedules: t.Optional[t.Dict[str, str]] = None,
+    ):
+        start_time = time.perf_counter()
+        try:
+            self.logger.info(f"[Upcoming:shard-{shard_id}] Starting upcoming update processing...")
+            # Every group run on its own task, a slow channel will not hold the others or the next tick.
+            launched = [
+                self.pipelines.launch(
+                    group, partial(self.run_group_pipeline, group, mapped_upcoming_data, rendered_schedules)
+                )
+                for group in groups
+            ]
+            launched = [task for task in launched if task is not None]
+            if launched:
+                await asyncio.wait(launched)
+        finally:
+            self.bot.record_shard_cycle(shard_id, "upcoming", time.perf_counter() - start_time)
+
     @tasks.loop(minutes=3.0)
     async def improved_upcoming_watcher(self):
+        async with self.bot.supervisor.cycle("upcoming"):
+            await self.bot.profiler.run("upcoming", self.upcoming_watcher_cycle)
+
+    async def upcoming_watcher_cycle(self):
         try:
-            if (
-                self.upcoming_message_set["hololive"] is None
-                and self.upcoming_message_set["nijisanji"] is None
-                and self.upcoming_message_set["other"] is None
-            ):
+            owned_channels = {
+                group: channel
+                for group, channel in self.channels_set.items()
+                if self.upcoming_message_set.get(group) is not None
+            }
+            shard_groups = self.bot.group_channels_by_shard(owned_channels)
+            if not shard_groups:
                 self.logger.warn(
                     "[Upcoming] There's no placeholder message, ignoring"
                 )
                 return
-            self.logger.info("[Upcoming] Collecting messages...")
-            collected_messages = await self.collect_and_map_messages()
 
-            current_upcoming_all = []
-            self.logger.info(
-                "[Upcoming] Fetching ihateani.me API upcoming streams...")
-            try:
-                current_upcoming_ihaapi = await self.ihaapi.fetch_upcoming()
-                current_upcoming_all.extend(current_upcoming_ihaapi)
-            except ValueError:
-                self.logger.error(
-                    "[Upcoming] Received ihaapi data are incomplete, cancelling...")
-                return
-            except asyncio.TimeoutError:
-                self.logger.error(
-                    "[Upcoming] Timeout error while fetching ihaapi data, cancelling...")
-                return
+            rendered_schedules = None
+            if self.bot.plan_feed is not None:
+                self.logger.info("[Upcoming] Using the worker plan...")
+                upcoming_plan = self.bot.plan_feed.latest("upcoming")
+                if upcoming_plan is None:
+                    self.logger.error("[Upcoming] There's no fresh plan from the worker, cancelling...")
+                    return
+                schedule_key = "schedule_icons" if self.bot.user.id == DEPLOYED_BOT_ID else "schedule"
+                mapped_upcoming_data = {
+                    group: plan_data["items"] for group, plan_data in upcoming_plan["groups"].items()
+                }
+                rendered_schedules = {
+                    group: plan_data[schedule_key] for group, plan_data in upcoming_plan["groups"].items()
+                }
+            else:
+                current_upcoming_all = []
+                self.logger.info(
+                    "[Upcoming] Fetching ihateani.me API upcoming streams...")
+                try:
+                    current_upcoming_ihaapi = self.bot.warmup.take_snapshot("upcoming")
+                    if current_upcoming_ihaapi is None:
+                        current_upcoming_ihaapi = await self.ihaapi.fetch_upcoming()
+                    current_upcoming_all.extend(current_upcoming_ihaapi)
+                except ValueError:
+                    self.logger.error(
+                        "[Upcoming] Received ihaapi data are incomplete, cancelling...")
+                    return
+                except asyncio.TimeoutError:
+                    self.logger.error(
+                        "[Upcoming] Timeout error while fetching ihaapi data, cancelling...")
+                    return
+                except CircuitOpen as e:
+                    self.logger.warn(f"[Upcoming] {e}, keeping the current schedule.")
+                    return
 
-            self.logger.info("[Upcoming] Mapping results...")
-            mapped_upcoming_data = await self._split_results_into_group(current_upcoming_all)
-            self.logger.info(
-                "[Upcoming] Starting upcoming update processing..."
+                self.logger.info("[Upcoming] Mapping results...")
+                mapped_upcoming_data = await self._split_results_into_group(current_upcoming_all)
+            # The search index and the reminders follow the deltas
+            self.ihaapi.changes.publish(
+                "upcoming", [upcoming for upcomings in mapped_upcoming_data.values() for upcoming in upcomings]
             )
-            if self.upcoming_message_set["hololive"] is not None:
-                await self.update_message_data(
-                    collected_messages["hololive"], mapped_upcoming_data["hololive"], "hololive"
-                )
-            if self.upcoming_message_set["nijisanji"] is not None:
-                await self.update_message_data(
-                    collected_messages["nijisanji"], mapped_upcoming_data["nijisanji"], "nijisanji"
-                )
-            if self.upcoming_message_set["other"] is not None:
-                await self.update_message_data(
-                    collected_messages["other"], mapped_upcoming_data["other"], "other"
+            # One fetch per tick, every shard only work on the channels in its guilds.
+            # The tick doesn't wait for the pipelines, unless they're being profiled.
+            shard_cycles = [
+                asyncio.ensure_future(
+                    self.run_shard_cycle(shard_id, groups, mapped_upcoming_data, rendered_schedules)
                 )
+                for shard_id, groups in shard_groups.items()
+            ]
+            for shard_cycle in shard_cycles:
+                self.bot.supervisor.track(shard_cycle)
+            if self.bot.profiler.is_armed("upcoming"):
+                await asyncio.wait(shard_cycles)
             self.logger.info("[Upcoming] Now sleeping...")
         except Exception as e:
             tb = traceback.format_exception(type(e), e, e.__traceback__)
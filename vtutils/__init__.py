@@ -1,6 +1,21 @@
 # flake8: noqa
+from .analytics import StreamHistoryStore
+from .breaker import CircuitBreaker, CircuitOpen
+from .budget import ActionShed, RestBudgetPlanner
+from .changefeed import ChangeSubscription, SnapshotChangeFeed, SnapshotDelta
 from .ihateanime import ihateanimeAPIV2
+from .latency import LatencyProbe, LatencyRing
+from .pipelines import GroupPipelines
+from .platforms import PLATFORMS, Platform, PlatformRegistry
+from .webclient import SharedHTTPClient
+from .webhooks import LiveWebhookPool
 from .bot import VTuberBot
+from .profiler import CycleProfiler
+from .search import StreamSearchIndex
+from .subscriptions import SubscriberNotifier, SubscriptionStore
+from .supervisor import LoopSupervisor
+from .warmup import StartupWarmup
+from .worker import PlanSubscriber, PlanWorker
 
 
 class APIInvalidResponse(Exception):
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+from .platforms import PLATFORMS
+
+# The API fields needed to record a stream
+HISTORY_FIELDS = ["id", "title", "group", "platform", "channel.id", "channel.name"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS streams (
+    stream_key TEXT PRIMARY KEY,
+    stream_id TEXT NOT NULL,
+    platform TEXT NOT NULL,
+    group_name TEXT NOT NULL,
+    channel_id TEXT NOT NULL,
+    channel_name TEXT,
+    title TEXT,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_streams_group_seen ON streams (last_seen, first_seen, group_name);
+CREATE INDEX IF NOT EXISTS idx_streams_channel_seen ON streams (last_seen, first_seen, channel_id, channel_name);
+"""
+
+
+class StreamHistoryStore:
+    """An append-only SQLite store of every stream the live watcher have seen.
+
+    Every stream is a single row with the first and last time it's seen on
+    a snapshot, writes and queries are run on a dedicated thread so the
+    event loop is never blocked by SQLite.
+    """
+
+    def __init__(self, db_path: str = "vtuber_history.db"):
+        self.logger = logging.getLogger("vtutils.analytics.StreamHistoryStore")
+        self.db_path = db_path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream-history")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._pending: t.Optional[asyncio.Future] = None
+
+    @staticmethod
+    def _to_row(item: dict, seen_at: int) -> tuple:
+        channel = item.get("channel", {})
+        return (
+            PLATFORMS.key_of(item),
+            item["id"],
+            item["platform"],
+            item["group"],
+            channel.get("id", ""),
+            channel.get("name"),
+            item.get("title"),
+            seen_at,
+            seen_at,
+        )
+
+    def _write(self, rows: t.List[tuple], seen_at: int):
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO streams VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                self._conn.executemany(
+                    "UPDATE streams SET last_seen = ?, title = ? WHERE stream_key = ?",
+                    [(seen_at, row[6], row[0]) for row in rows],
+                )
+
+    def record_snapshot(self, items: t.List[dict], seen_at: t.Optional[int] = None):
+        """Record a live snapshot in a single batch without waiting for it."""
+        if not items:
+            return
+        if seen_at is None:
+            seen_at = int(time.time())
+        rows = [self._to_row(item, seen_at) for item in items]
+        loop = asyncio.get_event_loop()
+        self._pending = loop.run_in_executor(self._executor, self._write, rows, seen_at)
+
+    def _query(self, sql: str, params: tuple) -> t.List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def _run_query(self, sql: str, params: tuple) -> t.List[tuple]:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, self._query, sql, params)
+
+    async def hours_per_group(self, since: int, until: t.Optional[int] = None) -> t.List[t.Tuple[str, float]]:
+        """Get the total hours streamed per group between ``since`` and ``until``"""
+        if until is None:
+            until = int(time.time())
+        return await self._run_query(
+            "SELECT group_name, SUM(MIN(last_seen, ?) - MAX(first_seen, ?)) / 3600.0 AS hours "
+            "FROM streams WHERE last_seen >= ? AND first_seen <= ? "
+            "GROUP BY group_name ORDER BY hours DESC",
+            (until, since, since, until),
+        )
+
+    async def top_channels(
+        self, since: int, until: t.Optional[int] = None, limit: int = 10
+    ) -> t.List[t.Tuple[str, str, float, int]]:
+        """Get the channels that streamed the most between ``since`` and ``until``
+
+        :return: list of (channel_id, channel_name, hours, total streams)
+        """
+        if until is None:
+            until = int(time.time())
+        return await self._run_query(
+            "SELECT channel_id, MAX(channel_name), "
+            "SUM(MIN(last_seen, ?) - MAX(first_seen, ?)) / 3600.0 AS hours, COUNT(*) "
+            "FROM streams WHERE last_seen >= ? AND first_seen <= ? "
+            "GROUP BY channel_id ORDER BY hours DESC LIMIT ?",
+            (until, since, since, until, limit),
+        )
+
+    async def close(self):
+        if self._pending is not None:
+            await self._pending
+            self._pending = None
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._conn.close()
@@ -1,12 +1,23 @@
 import discord
+import time
 import typing as t
 from discord.ext import commands
 from datetime import timezone
+from .analytics import StreamHistoryStore
+from .budget import RestBudgetPlanner
 from .ihateanime import ihateanimeAPIV2
+from .latency import LatencyProbe
+from .profiler import CycleProfiler
+from .search import StreamSearchIndex
+from .subscriptions import SubscriberNotifier, SubscriptionStore
+from .supervisor import LoopSupervisor
+from .webclient import SharedHTTPClient
+from .warmup import StartupWarmup
+from .worker import PlanSubscriber
 import logging
 
 
-class VTuberBot(commands.Bot):
+class VTuberBot(commands.AutoShardedBot):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -20,6 +31,119 @@ class VTuberBot(commands.Bot):
         self.jst_tz: timezone
 
         self.uptime: float
+        # Replaced with the process start time by the runner
+        self.boot_time: float = time.perf_counter()
+        # Seconds from the boot time to the first on_ready and the first post
+        self.time_to_ready: t.Optional[float] = None
+        self.time_to_first_post: t.Optional[float] = None
+        self.warmup = StartupWarmup()
         self.owner: t.Union[discord.User, discord.TeamMember]
 
         self.ihaapiv2: ihateanimeAPIV2
+        self.web_client: SharedHTTPClient
+        self.profiler = CycleProfiler()
+        self.supervisor = LoopSupervisor()
+        # Every Discord REST call from the watchers go through this
+        self.rest_planner = RestBudgetPlanner()
+        # Sample the latencies for the ping command
+        self.latency_probe: t.Optional[LatencyProbe] = None
+        # Updated by the watchers on every snapshot
+        self.live_index = StreamSearchIndex()
+        self.upcoming_index = StreamSearchIndex()
+        self.subscriptions: SubscriptionStore
+        self.notifier: t.Optional[SubscriberNotifier] = None
+        # Set when the stream analytics is enabled
+        self.stream_history: t.Optional[StreamHistoryStore] = None
+        # Set when the fetch/diff worker process is enabled
+        self.plan_feed: t.Optional[PlanSubscriber] = None
+
+        # shard_id -> watcher name -> cycle timing
+        self.shard_cycle_stats: t.Dict[int, t.Dict[str, t.Dict[str, float]]] = {}
+        # watcher name -> group -> pipeline timing
+        self.group_cycle_stats: t.Dict[str, t.Dict[str, t.Dict[str, float]]] = {}
+
+    def owned_shard_of(self, channel: t.Optional[discord.abc.GuildChannel]) -> t.Optional[int]:
+        """Get the shard ID that handle the channel guild.
+
+        Will return None if the channel is missing or the shard is not
+        running on this process (manual ``shard_ids``).
+        """
+        if channel is None:
+            return None
+        guild = getattr(channel, "guild", None)
+        if guild is None:
+            return None
+        # A fetched channel only have a discord.Object as its guild until the guild is cached
+        shard_id = (guild.id >> 22) % (self.shard_count or 1)
+        if shard_id not in self.shards:
+            return None
+        return shard_id
+
+    def group_channels_by_shard(
+        self, channels_set: t.Dict[str, t.Optional[discord.abc.GuildChannel]]
+    ) -> t.Dict[int, t.List[str]]:
+        """Map every owned shard into the list of groups it should handle.
+
+        The channels fetched by the warm-up are swapped for the cached one
+        once their guild is available.
+        """
+        shard_groups: t.Dict[int, t.List[str]] = {}
+        for group, channel in list(channels_set.items()):
+            if channel is not None and not isinstance(channel.guild, discord.Guild):
+                cached_channel = self.get_channel(channel.id)
+                if cached_channel is not None:
+                    channel = channels_set[group] = cached_channel
+            shard_id = self.owned_shard_of(channel)
+            if shard_id is None:
+                continue
+            shard_groups.setdefault(shard_id, []).append(group)
+        return shard_groups
+
+    def record_shard_cycle(self, shard_id: int, watcher: str, elapsed: float):
+        """Record how long a watcher cycle took for a shard."""
+        shard_stats = self.shard_cycle_stats.setdefault(shard_id, {})
+        stats = shard_stats.setdefault(watcher, {"last": 0.0, "total": 0.0, "runs": 0})
+        stats["last"] = elapsed
+        stats["total"] += elapsed
+        stats["runs"] += 1
+        self.logger.info(f"[Shard:{shard_id}] {watcher} cycle took {elapsed:.3f}s")
+
+    def record_group_cycle(self, watcher: str, group: str, elapsed: float, failed: bool = False):
+        """Record how long a group pipeline took on a watcher cycle."""
+        watcher_stats = self.group_cycle_stats.setdefault(watcher, {})
+        stats = watcher_stats.setdefault(group, {"last": 0.0, "total": 0.0, "runs": 0, "failures": 0})
+        stats["last"] = elapsed
+        stats["total"] += elapsed
+        stats["runs"] += 1
+        if failed:
+            stats["failures"] += 1
+        self.logger.info(f"[{watcher}:{group}] pipeline took {elapsed:.3f}s")
+
+    def record_first_post(self, watcher: str):
+        """Record the time-to-first-post, only the first call count."""
+        if self.time_to_first_post is not None:
+            return
+        self.time_to_first_post = time.perf_counter() - self.boot_time
+        self.logger.info(f"[{watcher}] First post sent {self.time_to_first_post:.2f}s after boot")
+
+    async def close(self):
+        if self.is_closed():
+            return
+        # Let the running watcher cycles finish their posts
+        await self.supervisor.drain()
+        if self.notifier is not None:
+            # Flush the pending DMs while we're still connected
+            await self.notifier.close()
+        if hasattr(self, "subscriptions"):
+            await self.subscriptions.flush()
+        await super().close()
+        self.supervisor.close()
+        self.rest_planner.close()
+        if self.latency_probe is not None:
+            self.latency_probe.close()
+        if hasattr(self, "ihaapiv2"):
+            await self.ihaapiv2.close()
+        if hasattr(self, "web_client"):
+            await self.web_client.close()
+        if self.stream_history is not None:
+            await self.stream_history.close()
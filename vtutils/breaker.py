@@ -0,0 +1,145 @@
+import logging
+import time
+import typing as t
+
+# Breaker states
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half-open"
+
+
+class CircuitOpen(Exception):
+    """The upstream is considered down, the request was not sent"""
+
+
+class CircuitBreaker:
+    """Stop calling an upstream after ``failure_threshold`` consecutive failures.
+
+    Once open, every call is refused until ``reset_timeout`` seconds passed,
+    then the breaker is half-open and a single probe decide if it's closed
+    again. Every failed probe double the wait, up to ``max_reset_timeout``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        max_reset_timeout: float = 300.0,
+    ):
+        self.logger = logging.getLogger(f"vtutils.breaker.CircuitBreaker.{name}")
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.last_error: t.Optional[str] = None
+        self._current_timeout = reset_timeout
+        self._opened_at: t.Optional[float] = None
+        self._state_since = time.monotonic()
+        # A half-open probe is waiting to be reported
+        self._probing = False
+
+        # "closed->open" -> count
+        self.transitions: t.Dict[str, int] = {}
+        self.skipped = 0
+        self.probes = 0
+
+    @classmethod
+    def from_config(cls, name: str, config: dict) -> "CircuitBreaker":
+        return cls(
+            name,
+            config.get("failure_threshold", 3),
+            config.get("reset_timeout", 30.0),
+            config.get("max_reset_timeout", 300.0),
+        )
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        transition = f"{self.state}->{state}"
+        self.transitions[transition] = self.transitions.get(transition, 0) + 1
+        self.logger.warning(f"Circuit {transition} ({self.failures} failures, last error: {self.last_error})")
+        self.state = state
+        self._state_since = time.monotonic()
+
+    def retry_in(self) -> float:
+        """Seconds before the next probe, 0 when not open"""
+        if self.state != STATE_OPEN or self._opened_at is None:
+            return 0.0
+        return max(self._current_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def should_probe(self) -> bool:
+        """Check if the call should be refused or probed first.
+
+        :raises CircuitOpen: the breaker is open and it's not the time to probe yet
+        :return: ``True`` if the caller should send the probe before the call
+        """
+        if self.state == STATE_CLOSED:
+            return False
+        if self.state == STATE_OPEN and self.retry_in() > 0.0:
+            self.skipped += 1
+            raise CircuitOpen(f"{self.name} is down, retrying in {self.retry_in():.0f}s")
+        # Only one caller probe at a time, unless the probing call never reported back
+        if (
+            self.state == STATE_HALF_OPEN
+            and self._probing
+            and time.monotonic() - self._state_since < self.max_reset_timeout
+        ):
+            self.skipped += 1
+            raise CircuitOpen(f"{self.name} is being probed")
+        self._transition(STATE_HALF_OPEN)
+        self._state_since = time.monotonic()
+        self._probing = True
+        self.probes += 1
+        return True
+
+    def release(self):
+        """The probing call ended without telling if the upstream is up, let the next call probe"""
+        self._probing = False
+
+    def record_success(self):
+        self._probing = False
+        self.failures = 0
+        self._current_timeout = self.reset_timeout
+        self._opened_at = None
+        self._transition(STATE_CLOSED)
+
+    def record_failure(self, error: str):
+        self._probing = False
+        self.failures += 1
+        self.last_error = error
+        if self.state == STATE_HALF_OPEN:
+            self._current_timeout = min(self._current_timeout * 2, self.max_reset_timeout)
+        elif self.failures < self.failure_threshold:
+            return
+        self._opened_at = time.monotonic()
+        self._transition(STATE_OPEN)
+
+    def stats(self) -> t.Dict[str, t.Any]:
+        return {
+            "state": self.state,
+            "state_for": time.monotonic() - self._state_since,
+            "failures": self.failures,
+            "retry_in": self.retry_in(),
+            "skipped": self.skipped,
+            "probes": self.probes,
+            "transitions": dict(self.transitions),
+            "last_error": self.last_error,
+        }
+
+    def report(self) -> str:
+        stats = self.stats()
+        text = f"**{self.name}**: `{stats['state']}` for `{stats['state_for']:.0f}s`"
+        text += f", `{stats['failures']}` failures, `{stats['skipped']}` skipped, `{stats['probes']}` probes"
+        if stats["state"] == STATE_OPEN:
+            text += f", probing in `{stats['retry_in']:.0f}s`"
+        if stats["transitions"]:
+            text += "\nTransitions: " + ", ".join(
+                f"`{transition}` x{count}" for transition, count in stats["transitions"].items()
+            )
+        if stats["last_error"]:
+            text += f"\nLast error: `{stats['last_error']}`"
+        return text
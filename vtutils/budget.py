@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import time
+import traceback
+import typing as t
+
+# Priority classes, lower run first
+PRIORITY_POST = 0
+PRIORITY_DELETE = 1
+PRIORITY_EDIT = 2
+PRIORITY_RENAME = 3
+PRIORITY_AVATAR = 4
+PRIORITY_NAMES = {
+    PRIORITY_POST: "post",
+    PRIORITY_DELETE: "delete",
+    PRIORITY_EDIT: "edit",
+    PRIORITY_RENAME: "rename",
+    PRIORITY_AVATAR: "avatar",
+}
+# priority -> (max queued seconds before being shed, shed right away when the route is limited)
+PRIORITY_POLICY: t.Dict[int, t.Tuple[t.Optional[float], bool]] = {
+    PRIORITY_POST: (None, False),
+    PRIORITY_DELETE: (None, False),
+    PRIORITY_EDIT: (120.0, False),
+    PRIORITY_RENAME: (30.0, True),
+    PRIORITY_AVATAR: (30.0, True),
+}
+# Discord route kind -> (requests, per seconds), the bucket is per channel (or webhook) for the channel routes
+ROUTE_LIMITS: t.Dict[str, t.Tuple[int, float]] = {
+    "send": (5, 5.0),
+    "edit": (5, 5.0),
+    "delete": (5, 1.0),
+    "bulk_delete": (1, 1.0),
+    "rename": (2, 600.0),
+    "avatar": (2, 3600.0),
+    "webhook": (5, 2.0),
+}
+DEFAULT_ROUTE_LIMIT = (5, 5.0)
+
+ActionFactory = t.Callable[[], t.Awaitable[t.Any]]
+
+
+class ActionShed(Exception):
+    """The action was dropped by the planner before being run"""
+
+
+class _TokenBucket:
+    def __init__(self, capacity: int, per: float):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1.0
+
+
+class _Action:
+    __slots__ = ("priority", "sequence", "route", "factory", "coalesce_key", "future", "submitted_at")
+
+    def __init__(self, priority: int, sequence: int, route: str, factory: ActionFactory, coalesce_key: t.Optional[str]):
+        self.priority = priority
+        self.sequence = sequence
+        self.route = route
+        self.factory = factory
+        self.coalesce_key = coalesce_key
+        self.future: asyncio.Future = asyncio.get_event_loop().create_future()
+        self.submitted_at = time.monotonic()
+
+
+class RestBudgetPlanner:
+    """Schedule the Discord REST actions by priority class within the rate-limit budget.
+
+    Every route (``kind:channel_id``) and the global bucket is modelled as a
+    token bucket from the known Discord limits. The highest priority action
+    with a free route go first, so a rename or an avatar change can't hold up
+    a new live post. Edits are deferred under pressure and dropped after
+    waiting too long, renames and avatar changes are dropped as soon as their
+    route is limited (the next cycle will submit the latest one again).
+    """
+
+    def __init__(self, global_per_second: int = 50, concurrency: int = 4):
+        self.logger = logging.getLogger("vtutils.budget.RestBudgetPlanner")
+        self._global = _TokenBucket(global_per_second, 1.0)
+        self._routes: t.Dict[str, _TokenBucket] = {}
+        self._pending: t.List[_Action] = []
+        self._sequence = 0
+        self._concurrency = concurrency
+        self._slots: t.Optional[asyncio.Semaphore] = None
+        self._wakeup = asyncio.Event()
+        self._task: t.Optional[asyncio.Task] = None
+
+        self._stats: t.Dict[int, t.Dict[str, float]] = {
+            priority: {"executed": 0, "shed": 0, "failed": 0, "wait_total": 0.0, "wait_max": 0.0}
+            for priority in PRIORITY_NAMES
+        }
+
+    def _route_bucket(self, route: str) -> _TokenBucket:
+        bucket = self._routes.get(route)
+        if bucket is None:
+            capacity, per = ROUTE_LIMITS.get(route.split(":", 1)[0], DEFAULT_ROUTE_LIMIT)
+            bucket = self._routes[route] = _TokenBucket(capacity, per)
+        return bucket
+
+    def _shed(self, action: _Action, reason: str):
+        if action in self._pending:
+            self._pending.remove(action)
+        self._stats[action.priority]["shed"] += 1
+        self.logger.warning(f"[{PRIORITY_NAMES[action.priority]}] Shedding {action.route}: {reason}")
+        if not action.future.done():
+            action.future.set_exception(ActionShed(reason))
+
+    async def submit(
+        self, priority: int, route: str, factory: ActionFactory, coalesce_key: t.Optional[str] = None
+    ) -> t.Any:
+        """Queue an action and wait for its result.
+
+        :param priority: one of the ``PRIORITY_*`` class
+        :param route: ``kind:channel_id``, the kind is one of ``ROUTE_LIMITS``
+        :param factory: create the coroutine to run
+        :param coalesce_key: a newer action with the same key replace the pending one
+        :raises ActionShed: the action was dropped
+        """
+        if self._task is None:
+            # Not started yet, run it right away.
+            return await factory()
+        self._sequence += 1
+        action = _Action(priority, self._sequence, route, factory, coalesce_key)
+        if coalesce_key is not None:
+            for pending in list(self._pending):
+                if pending.coalesce_key == coalesce_key:
+                    self._shed(pending, "replaced by a newer action")
+        self._pending.append(action)
+        self._wakeup.set()
+        try:
+            return await asyncio.shield(action.future)
+        except asyncio.CancelledError:
+            if action in self._pending:
+                self._pending.remove(action)
+            raise
+
+    def _next_action(self, now: float) -> t.Tuple[t.Optional[_Action], t.Optional[float]]:
+        """Pick the next action to run, or how long to wait for one."""
+        global_wait = self._global.wait_time(now)
+        shortest_wait: t.Optional[float] = None
+        for action in sorted(self._pending, key=lambda action: (action.priority, action.sequence)):
+            max_wait, shed_on_limit = PRIORITY_POLICY[action.priority]
+            if max_wait is not None and now - action.submitted_at > max_wait:
+                self._shed(action, f"waited more than {max_wait:.0f}s")
+                continue
+            wait = max(self._route_bucket(action.route).wait_time(now), global_wait)
+            if wait <= 0.0:
+                return action, None
+            if shed_on_limit:
+                self._shed(action, f"rate limited for {wait:.1f}s")
+                continue
+            shortest_wait = wait if shortest_wait is None else min(shortest_wait, wait)
+        return None, shortest_wait
+
+    async def _execute(self, action: _Action):
+        stats = self._stats[action.priority]
+        waited = time.monotonic() - action.submitted_at
+        stats["wait_total"] += waited
+        stats["wait_max"] = max(stats["wait_max"], waited)
+        try:
+            result = await action.factory()
+            stats["executed"] += 1
+            if not action.future.done():
+                action.future.set_result(result)
+        except Exception as e:
+            stats["failed"] += 1
+            if not action.future.done():
+                action.future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    async def run(self):
+        while True:
+            await self._slots.acquire()
+            while True:
+                now = time.monotonic()
+                action, wait = self._next_action(now)
+                if action is not None:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+            self._pending.remove(action)
+            self._global.take(now)
+            self._route_bucket(action.route).take(now)
+            asyncio.ensure_future(self._execute(action))
+
+    async def _run_forever(self):
+        try:
+            await self.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            tb = traceback.format_exception(type(e), e, e.__traceback__)
+            self.logger.error("Planner stopped unexpectedly.")
+            self.logger.error("".join(tb))
+
+    def start(self):
+        if self._task is None:
+            self._slots = asyncio.Semaphore(self._concurrency)
+            self._task = asyncio.ensure_future(self._run_forever())
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for action in list(self._pending):
+            self._shed(action, "planner closed")
+
+    def stats(self) -> t.Dict[str, t.Dict[str, float]]:
+        now = time.monotonic()
+        results = {}
+        for priority, name in PRIORITY_NAMES.items():
+            stats = self._stats[priority]
+            queued = [action for action in self._pending if action.priority == priority]
+            finished = stats["executed"] + stats["failed"]
+            results[name] = {
+                "queued": len(queued),
+                "oldest_wait": max((now - action.submitted_at for action in queued), default=0.0),
+                "executed": stats["executed"],
+                "failed": stats["failed"],
+                "shed": stats["shed"],
+                "avg_wait": stats["wait_total"] / finished if finished > 0 else 0.0,
+                "max_wait": stats["wait_max"],
+            }
+        return results
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import time
+import traceback
+import typing as t
+
+from .platforms import PLATFORMS
+
+# Nested API objects are compared field by field (``channel.name``)
+_NESTED_FIELDS = ("channel", "timeData")
+
+
+def _changed_fields(old: dict, new: dict) -> t.List[str]:
+    changed = []
+    for field in set(old.keys()) | set(new.keys()):
+        old_value = old.get(field)
+        new_value = new.get(field)
+        if old_value == new_value:
+            continue
+        if field in _NESTED_FIELDS and isinstance(old_value, dict) and isinstance(new_value, dict):
+            for sub_field in set(old_value.keys()) | set(new_value.keys()):
+                if old_value.get(sub_field) != new_value.get(sub_field):
+                    changed.append(f"{field}.{sub_field}")
+        else:
+            changed.append(field)
+    changed.sort()
+    return changed
+
+
+class SnapshotDelta:
+    """What changed on a query between two snapshots.
+
+    A ``resync`` delta carry the whole snapshot as ``added``, it's sent as the
+    first delta of a subscription and when a subscriber fell too far behind,
+    the subscriber should rebuild its state from it.
+    """
+
+    def __init__(
+        self,
+        query_type: str,
+        added: t.List[dict],
+        removed: t.List[dict],
+        modified: t.List[t.Tuple[dict, t.List[str]]],
+        resync: bool = False,
+    ):
+        self.query_type = query_type
+        self.added = added
+        self.removed = removed
+        self.modified = modified
+        self.resync = resync
+        self.created_at = time.time()
+
+    def __repr__(self):
+        return (
+            f"<SnapshotDelta {self.query_type} added={len(self.added)} removed={len(self.removed)} "
+            f"modified={len(self.modified)} resync={self.resync}>"
+        )
+
+    def __bool__(self):
+        return self.resync or bool(self.added or self.removed or self.modified)
+
+
+def compute_delta(query_type: str, previous: t.Dict[str, dict], current: t.Dict[str, dict]) -> SnapshotDelta:
+    """Compare two snapshots keyed by ``PLATFORMS.key_of``"""
+    added = [item for key, item in current.items() if key not in previous]
+    removed = [item for key, item in previous.items() if key not in current]
+    modified = []
+    for key, item in current.items():
+        old_item = previous.get(key)
+        if old_item is None or old_item == item:
+            continue
+        modified.append((item, _changed_fields(old_item, item)))
+    return SnapshotDelta(query_type, added, removed, modified)
+
+
+class ChangeSubscription:
+    """An async iterator of the deltas of the subscribed queries.
+
+    .. code-block:: python
+
+        async with api.changes.subscribe("live") as subscription:
+            async for delta in subscription:
+                ...
+    """
+
+    def __init__(self, feed: "SnapshotChangeFeed", query_types: t.Set[str], max_pending: int):
+        self._feed = feed
+        self.query_types = query_types
+        self.max_pending = max_pending
+        self._queue: "asyncio.Queue[t.Optional[SnapshotDelta]]" = asyncio.Queue()
+        self.closed = False
+        self.resyncs = 0
+
+    def _push(self, delta: SnapshotDelta):
+        if self.closed:
+            return
+        if self._queue.qsize() >= self.max_pending:
+            # Too far behind, collapse everything pending into one full snapshot per query type.
+            query_types = []
+            while not self._queue.empty():
+                pending = self._queue.get_nowait()
+                if pending.query_type not in query_types:
+                    query_types.append(pending.query_type)
+            if delta.query_type not in query_types:
+                query_types.append(delta.query_type)
+            self.resyncs += 1
+            for query_type in query_types:
+                self._queue.put_nowait(self._feed.resync_delta(query_type))
+            return
+        self._queue.put_nowait(delta)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._feed._unsubscribe(self)
+        # Wake up the consumer waiting on the next delta
+        self._queue.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> SnapshotDelta:
+        if self.closed and self._queue.empty():
+            raise StopAsyncIteration
+        delta = await self._queue.get()
+        if delta is None:
+            raise StopAsyncIteration
+        return delta
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SnapshotChangeFeed:
+    """Keep the previous snapshot of every query and publish the keyed deltas.
+
+    The watchers publish the streams they route (after the ignore list and
+    the disabled platforms), from the API or from the worker plan. Every
+    subscriber get its own queue, a slow subscriber never hold up the
+    fetch or the other subscribers. Empty deltas are not published.
+    """
+
+    def __init__(self, max_pending: int = 10):
+        self.logger = logging.getLogger("vtutils.changefeed.SnapshotChangeFeed")
+        self.max_pending = max_pending
+        self._snapshots: t.Dict[str, t.Dict[str, dict]] = {}
+        self._subscriptions: t.List[ChangeSubscription] = []
+        self._stats: t.Dict[str, t.Dict[str, int]] = {}
+
+    def snapshot(self, query_type: str) -> t.List[dict]:
+        return list(self._snapshots.get(query_type, {}).values())
+
+    def resync_delta(self, query_type: str) -> SnapshotDelta:
+        return SnapshotDelta(query_type, self.snapshot(query_type), [], [], resync=True)
+
+    def subscribe(self, *query_types: str, max_pending: t.Optional[int] = None) -> ChangeSubscription:
+        """Subscribe to the ``live`` and/or ``upcoming`` deltas, every query if none given.
+
+        The current snapshot of every subscribed query that has been fetched
+        is sent first as a ``resync`` delta.
+        """
+        subscription = ChangeSubscription(
+            self, set(query_types or ("live", "upcoming")), max_pending or self.max_pending
+        )
+        for query_type in subscription.query_types:
+            if query_type in self._snapshots:
+                subscription._push(self.resync_delta(query_type))
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def follow(self, callback: t.Callable[[SnapshotDelta], None], *query_types: str) -> ChangeSubscription:
+        """Subscribe and call ``callback`` with every delta from a background task.
+
+        Close the returned subscription to stop following.
+        """
+        subscription = self.subscribe(*query_types)
+        asyncio.ensure_future(self._follow(subscription, callback))
+        return subscription
+
+    async def _follow(self, subscription: ChangeSubscription, callback: t.Callable[[SnapshotDelta], None]):
+        async with subscription:
+            async for delta in subscription:
+                try:
+                    callback(delta)
+                except Exception as e:
+                    tb = traceback.format_exception(type(e), e, e.__traceback__)
+                    self.logger.error(f"Failed to apply {delta!r}")
+                    self.logger.error("".join(tb))
+
+    def _unsubscribe(self, subscription: ChangeSubscription):
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+
+    def publish(self, query_type: str, items: t.List[dict]) -> t.Optional[SnapshotDelta]:
+        """Replace the query snapshot with a complete result and publish the delta.
+
+        The delta is not computed (and None is returned) when nobody follow
+        the query, a later subscriber start from the snapshot anyway.
+        """
+        current = {PLATFORMS.key_of(item): item for item in items}
+        previous = self._snapshots.get(query_type)
+        subscriptions = [
+            subscription for subscription in self._subscriptions if query_type in subscription.query_types
+        ]
+        stats = self._stats.setdefault(
+            query_type, {"published": 0, "added": 0, "removed": 0, "modified": 0, "skipped": 0}
+        )
+        if not subscriptions:
+            self._snapshots[query_type] = current
+            stats["skipped"] += 1
+            return None
+        if previous is None:
+            delta = SnapshotDelta(query_type, list(current.values()), [], [], resync=True)
+        else:
+            delta = compute_delta(query_type, previous, current)
+        self._snapshots[query_type] = current
+
+        if not delta:
+            return delta
+        stats["published"] += 1
+        if not delta.resync:
+            stats["added"] += len(delta.added)
+            stats["removed"] += len(delta.removed)
+            stats["modified"] += len(delta.modified)
+            self.logger.debug(f"{delta!r}")
+        for subscription in subscriptions:
+            subscription._push(delta)
+        return delta
+
+    def close(self):
+        for subscription in list(self._subscriptions):
+            subscription.close()
+
+    def stats(self) -> t.Dict[str, t.Dict[str, int]]:
+        results = {query_type: dict(stats) for query_type, stats in self._stats.items()}
+        for query_type, stats in results.items():
+            stats["streams"] = len(self._snapshots.get(query_type, {}))
+            stats["subscribers"] = sum(
+                1 for subscription in self._subscriptions if query_type in subscription.query_types
+            )
+        return results
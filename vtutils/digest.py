@@ -0,0 +1,98 @@
+import typing as t
+
+import discord
+
+# Discord limits for a single message
+DIGEST_MAX_EMBEDS = 10
+DIGEST_MAX_CHARACTERS = 6000
+
+
+def pack_embeds(embeds: t.List[discord.Embed]) -> t.List[t.List[discord.Embed]]:
+    """Pack the embeds into as few messages as possible, keeping the order."""
+    packs: t.List[t.List[discord.Embed]] = []
+    current: t.List[discord.Embed] = []
+    current_size = 0
+    for embed in embeds:
+        embed_size = len(embed)
+        if current and (len(current) >= DIGEST_MAX_EMBEDS or current_size + embed_size > DIGEST_MAX_CHARACTERS):
+            packs.append(current)
+            current = []
+            current_size = 0
+        current.append(embed)
+        current_size += embed_size
+    if current:
+        packs.append(current)
+    return packs
+
+
+class LiveDigestIndex:
+    """Record which digest message holds which stream key.
+
+    Built from the channel history, every embed footer is a stream key.
+    Removing or replacing a stream mark its host message as dirty, the
+    caller then edit the dirty host with its remaining embeds (or delete it
+    when nothing is left).
+    """
+
+    def __init__(self):
+        self.hosts: t.Dict[int, discord.Message] = {}
+        # message ID -> ordered stream keys
+        self._keys: t.Dict[int, t.List[str]] = {}
+        self._embeds: t.Dict[str, discord.Embed] = {}
+        self._host_of: t.Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._host_of)
+
+    def __contains__(self, stream_key: str):
+        return stream_key in self._host_of
+
+    @classmethod
+    def from_messages(cls, messages: t.List[discord.Message]) -> "LiveDigestIndex":
+        index = cls()
+        for message in messages:
+            for embed in message.embeds:
+                stream_key = embed.footer.text if embed.footer else None
+                if not stream_key or stream_key in index._host_of:
+                    continue
+                index.hosts[message.id] = message
+                index._keys.setdefault(message.id, []).append(stream_key)
+                index._embeds[stream_key] = embed
+                index._host_of[stream_key] = message.id
+        return index
+
+    def keys(self) -> t.List[str]:
+        return list(self._host_of.keys())
+
+    def embed_of(self, stream_key: str) -> discord.Embed:
+        return self._embeds[stream_key]
+
+    def host_of(self, stream_key: str) -> int:
+        return self._host_of[stream_key]
+
+    def embeds_of(self, message_id: int) -> t.List[discord.Embed]:
+        return [self._embeds[stream_key] for stream_key in self._keys.get(message_id, [])]
+
+    def remove(self, stream_keys: t.Iterable[str]) -> t.Set[int]:
+        """Drop the streams and return their host message IDs"""
+        dirty: t.Set[int] = set()
+        for stream_key in stream_keys:
+            message_id = self._host_of.pop(stream_key, None)
+            if message_id is None:
+                continue
+            self._embeds.pop(stream_key, None)
+            self._keys[message_id].remove(stream_key)
+            dirty.add(message_id)
+        return dirty
+
+    def replace(self, stream_key: str, embed: discord.Embed) -> int:
+        """Replace the stream embed and return its host message ID"""
+        self._embeds[stream_key] = embed
+        return self._host_of[stream_key]
+
+    def add(self, message: discord.Message, stream_keys: t.List[str], embeds: t.List[discord.Embed]):
+        self.hosts[message.id] = message
+        self._keys[message.id] = list(stream_keys)
+        for stream_key, embed in zip(stream_keys, embeds):
+            self._embeds[stream_key] = embed
+            self._host_of[stream_key] = message.id
@@ -0,0 +1,103 @@
+import time
+import typing as t
+
+from .platforms import PLATFORMS
+
+# platform -> (missing snapshots, missing seconds), whichever is reached first
+DEFAULT_GRACE: t.Dict[str, t.Tuple[int, float]] = {
+    "youtube": (2, 150),
+    "bilibili": (3, 240),
+    "twitch": (2, 150),
+    "twitcasting": (3, 240),
+    "mildom": (3, 240),
+}
+
+
+class EndedStreamGrace:
+    """Only let a live embed be deleted after its stream is missing for a while.
+
+    A stream must be missing from ``snapshots`` consecutive snapshots or for
+    ``seconds`` before it's considered ended. Streams that come back while in
+    grace are counted as ``recovered`` and streams that are posted again
+    shortly after being deleted are counted as ``reposted``, use them to tune
+    the policy.
+    """
+
+    def __init__(self, policy: t.Optional[t.Dict[str, dict]] = None, repost_window: float = 30 * 60):
+        self.policy: t.Dict[str, t.Tuple[int, float]] = dict(DEFAULT_GRACE)
+        for platform, platform_policy in (policy or {}).items():
+            default_snapshots, default_seconds = self.policy.get(platform, DEFAULT_GRACE["youtube"])
+            self.policy[platform] = (
+                platform_policy.get("snapshots", default_snapshots),
+                platform_policy.get("seconds", default_seconds),
+            )
+        self.repost_window = repost_window
+
+        # group -> stream key -> (missing count, missing since)
+        self._missing: t.Dict[str, t.Dict[str, t.Tuple[int, float]]] = {}
+        # group -> stream key -> deleted at
+        self._deleted_at: t.Dict[str, t.Dict[str, float]] = {}
+        # platform -> recovered/reposted/deleted count
+        self.flaps: t.Dict[str, t.Dict[str, int]] = {}
+
+    def _count(self, stream_key: str, kind: str):
+        platform_flaps = self.flaps.setdefault(
+            PLATFORMS.platform_of_key(stream_key).name, {"recovered": 0, "reposted": 0, "deleted": 0}
+        )
+        platform_flaps[kind] += 1
+
+    def filter_ended(
+        self,
+        group: str,
+        present_keys: t.Iterable[str],
+        ended_keys: t.Iterable[str],
+        now: t.Optional[float] = None,
+    ) -> t.List[str]:
+        """Get the ended streams that are past their grace and should be deleted now."""
+        if now is None:
+            now = time.time()
+        present_keys = set(present_keys)
+        ended_keys = list(ended_keys)
+        ended_set = set(ended_keys)
+        missing = self._missing.setdefault(group, {})
+        for stream_key in list(missing):
+            if stream_key in present_keys:
+                self._count(stream_key, "recovered")
+                del missing[stream_key]
+            elif stream_key not in ended_set:
+                # The message is gone by other means.
+                del missing[stream_key]
+
+        to_delete = []
+        for stream_key in ended_keys:
+            count, since = missing.get(stream_key, (0, now))
+            count += 1
+            platform_name = PLATFORMS.platform_of_key(stream_key).name
+            max_snapshots, max_seconds = self.policy.get(platform_name, DEFAULT_GRACE["youtube"])
+            if count >= max_snapshots or now - since >= max_seconds:
+                missing.pop(stream_key, None)
+                to_delete.append(stream_key)
+            else:
+                missing[stream_key] = (count, since)
+        return to_delete
+
+    def in_grace(self, group: str) -> int:
+        return len(self._missing.get(group, {}))
+
+    def record_deleted(self, group: str, stream_keys: t.Iterable[str], now: t.Optional[float] = None):
+        if now is None:
+            now = time.time()
+        deleted_at = self._deleted_at.setdefault(group, {})
+        for stream_key in stream_keys:
+            deleted_at[stream_key] = now
+            self._count(stream_key, "deleted")
+        for stream_key, at in list(deleted_at.items()):
+            if now - at > self.repost_window:
+                del deleted_at[stream_key]
+
+    def record_posted(self, group: str, stream_key: str, now: t.Optional[float] = None):
+        if now is None:
+            now = time.time()
+        deleted_at = self._deleted_at.get(group, {}).pop(stream_key, None)
+        if deleted_at is not None and now - deleted_at <= self.repost_window:
+            self._count(stream_key, "reposted")
@@ -0,0 +1,58 @@
+import typing as t
+
+from .platforms import PLATFORMS
+
+NIJISANJI_GROUPS = [
+    "nijisanji",
+    "nijisanjijp",
+    "nijisanjikr",
+    "nijisanjiid",
+    "nijisanjien",
+    "nijisanjiin",
+    "virtuareal"
+]
+HOLOPRO_GROUPS = ["hololive", "hololiveid", "hololivecn",
+                  "hololiveen", "hololivejp", "holostars"]
+BILIBILI_GROUPS = ["hololive", "nijisanji", "hololivecn", "virtuareal"]
+
+
+def is_nijisanji(group_name: str) -> bool:
+    return group_name in NIJISANJI_GROUPS
+
+
+def is_holopro(group_name: str) -> bool:
+    return group_name in HOLOPRO_GROUPS
+
+
+def destination_group(result: dict) -> str:
+    """The channel group a stream is posted to"""
+    if is_nijisanji(result["group"]):
+        return "nijisanji"
+    if is_holopro(result["group"]):
+        return "hololive"
+    return "other"
+
+
+def split_into_groups(
+    results_items: t.List[dict],
+    ignore_lists: t.List[str],
+) -> t.Dict[str, t.List[dict]]:
+    """Route the API results into the channel group they should be posted.
+
+    Streams from a platform that is disabled on the registry are dropped.
+    """
+    streams_data = {
+        "hololive": [],
+        "nijisanji": [],
+        "other": []
+    }
+    for result in results_items:
+        if result["group"] in ignore_lists:
+            continue
+        if not PLATFORMS.is_enabled(result["platform"]):
+            continue
+        if result["platform"] == "bilibili":
+            if result["group"] not in BILIBILI_GROUPS:
+                continue
+        streams_data[destination_group(result)].append(result)
+    return streams_data
@@ -1,91 +1,183 @@
 import asyncio
 import logging
+import time
 import typing as t
 
 import aiohttp
 
+from .breaker import CircuitBreaker, CircuitOpen
+from .changefeed import SnapshotChangeFeed
+from .snapshot import LastGoodSnapshot
+from .webclient import SharedHTTPClient
+
+
+# Always requested since the client need it to sort and route the results.
+BASE_FIELDS = ["id", "group", "platform", "timeData.startTime"]
+LIVE_FIELDS = [
+    "id",
+    "room_id",
+    "title",
+    "thumbnail",
+    "timeData.startTime",
+    "group",
+    "channel.id",
+    "channel.name",
+    "channel.image",
+    "platform",
+    "is_premiere",
+    "is_member",
+]
+UPCOMING_FIELDS = [
+    "id",
+    "room_id",
+    "title",
+    "group",
+    "timeData.startTime",
+    "channel.id",
+    "channel.name",
+    "channel.en_name",
+    "is_member",
+    "is_premiere",
+    "platform",
+]
+# Only used to check the channel IDs given to the subscribe commands
+CHANNEL_FIELDS = ["id", "platform", "group"]
 
-vtuberlive_gql = r"""query($cursor:String) {
-    vtuber {
-        live(cursor:$cursor,limit:100) {
-            _total
-            items {
-                id
-                room_id
-                title
-                thumbnail
-                timeData {
-                    startTime
-                }
-                group
-                channel {
-                    id
-                    name
-                    image
-                }
-                platform
-                is_premiere
-                is_member
-            }
-            pageInfo {
-                nextCursor
-                hasNextPage
-            }
-        }
-    }
-}
-"""
-
-vtuberupcoming_gql = r"""query($cursor:String) {
-    vtuber {
-        upcoming(cursor:$cursor,limit:100) {
-            _total
-            items {
-                id
-                room_id
-                title
-                group
-                timeData {
-                    startTime
-                }
-                channel {
-                    id
-                    name
-                    en_name
-                }
-                is_member
-                is_premiere
-                platform
-            }
-            pageInfo {
-                nextCursor
-                hasNextPage
-            }
-        }
-    }
-}
-"""
+
+def _build_selection(fields: t.Iterable[str], depth: int) -> str:
+    field_tree: t.Dict[str, dict] = {}
+    for field in fields:
+        node = field_tree
+        for part in field.split("."):
+            node = node.setdefault(part, {})
+
+    def _render(tree: t.Dict[str, dict], level: int) -> str:
+        indent = "    " * level
+        text = ""
+        for name, children in tree.items():
+            if children:
+                text += f"{indent}{name} {{\n{_render(children, level + 1)}{indent}}}\n"
+            else:
+                text += f"{indent}{name}\n"
+        return text
+
+    return _render(field_tree, depth)
+
+
+def build_vtuber_query(
+    query_type: str, fields: t.Iterable[str], limit: int = 100, base_fields: t.Iterable[str] = BASE_FIELDS
+) -> str:
+    """Build the paginated vtuber query with only the requested fields
+
+    :param query_type: ``live``, ``upcoming`` or ``channels``
+    :param fields: the item fields, nested field are separated by dot (``channel.name``)
+    :param limit: the page size
+    :param base_fields: the fields always requested
+    """
+    selected_fields = list(base_fields)
+    for field in fields:
+        if field not in selected_fields:
+            selected_fields.append(field)
+    return (
+        "query($cursor:String) {\n"
+        "    vtuber {\n"
+        f"        {query_type}(cursor:$cursor,limit:{limit}) {{\n"
+        "            _total\n"
+        "            items {\n"
+        f"{_build_selection(selected_fields, 4)}"
+        "            }\n"
+        "            pageInfo {\n"
+        "                nextCursor\n"
+        "                hasNextPage\n"
+        "            }\n"
+        "        }\n"
+        "    }\n"
+        "}\n"
+    )
+
+
+vtuberlive_gql = build_vtuber_query("live", LIVE_FIELDS)
+vtuberupcoming_gql = build_vtuber_query("upcoming", UPCOMING_FIELDS)
 
 
 class ihateanimeAPIV2:
 
     BASE_PATH = "https://api.ihateani.me/v2/"
+    ECHO_URL = "https://api.ihateani.me/echo"
 
-    def __init__(self, loop=None):
-        if loop is None:
-            loop = asyncio.get_event_loop()
+    def __init__(
+        self,
+        http_client: t.Optional[SharedHTTPClient] = None,
+        page_size: int = 100,
+        upcoming_max_stale: float = 15 * 60,
+        breaker: t.Optional[CircuitBreaker] = None,
+        probe_timeout: float = 5.0,
+        channels_max_age: float = 6 * 60 * 60,
+    ):
         self.logger = logging.getLogger("vtutils.ihateanime.ihateanimeAPIV2")
-        self.session = aiohttp.ClientSession(
-            headers={"User-Agent": "Listeners/1.0"}, loop=loop
-        )
+        self._own_http_client = http_client is None
+        self.http_client = SharedHTTPClient() if http_client is None else http_client
+        self.page_size = page_size
+        self.upcoming_snapshot = LastGoodSnapshot(upcoming_max_stale)
+        # Keyed deltas between the routed snapshots published by the watchers, see ``SnapshotChangeFeed.subscribe``
+        self.changes = SnapshotChangeFeed()
+        # Shared by every query, they all hit the same upstream
+        self.breaker = CircuitBreaker("api.ihateani.me") if breaker is None else breaker
+        self.probe_timeout = probe_timeout
+        self.channels_max_age = channels_max_age
+        self._channel_ids: t.Optional[t.Set[str]] = None
+        self._channel_ids_at = 0.0
+
+        self._consumer_fields: t.Dict[str, t.Dict[str, t.List[str]]] = {"live": {}, "upcoming": {}}
+        self._query_cache: t.Dict[str, str] = {}
+
+    def register_fields(self, query_type: str, consumer: str, fields: t.Iterable[str]):
+        """Declare the fields a consumer need from the ``live`` or ``upcoming`` query.
+
+        The query will only request the fields that every registered consumers
+        declared, if there's no consumer everything will be requested.
+        """
+        self._consumer_fields[query_type][consumer] = list(fields)
+        self._query_cache.pop(query_type, None)
+
+    def unregister_fields(self, query_type: str, consumer: str):
+        self._consumer_fields[query_type].pop(consumer, None)
+        self._query_cache.pop(query_type, None)
+
+    def set_page_size(self, page_size: int):
+        self.page_size = page_size
+        self._query_cache.clear()
+
+    def get_query(self, query_type: str) -> str:
+        if query_type in self._query_cache:
+            return self._query_cache[query_type]
+        consumers = self._consumer_fields[query_type]
+        if consumers:
+            fields = []
+            for consumer_fields in consumers.values():
+                fields.extend(field for field in consumer_fields if field not in fields)
+        else:
+            fields = LIVE_FIELDS if query_type == "live" else UPCOMING_FIELDS
+        query = build_vtuber_query(query_type, fields, self.page_size)
+        self._query_cache[query_type] = query
+        return query
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        return self.http_client.session
 
     async def close(self):
-        """Close sessions"""
-        await self.session.close()
+        """Close sessions, a shared HTTP client is closed by its owner"""
+        self.changes.close()
+        if self._own_http_client:
+            await self.http_client.close()
 
     async def _post_gql(self, endpoint: str, payload: dict):
         url = self.BASE_PATH + endpoint
         async with self.session.post(url, json=payload) as resp:
+            if resp.status >= 500:
+                # An upstream outage rather than a bad page, raised as a ClientResponseError
+                resp.raise_for_status()
             if "application/json" not in resp.headers["Content-Type"]:
                 raise ValueError("Not poggers.")
             res = await resp.json()
@@ -129,17 +221,102 @@ class ihateanimeAPIV2:
                 break
         return collect_throughout, incomplete_data
 
+    async def probe(self) -> t.Optional[str]:
+        """Send a single cheap request to the upstream, return the error if it failed"""
+        try:
+            async with self.session.get(
+                self.ECHO_URL, timeout=aiohttp.ClientTimeout(total=self.probe_timeout)
+            ) as resp:
+                await resp.read()
+                if resp.status >= 500:
+                    return f"HTTP {resp.status}"
+        except asyncio.TimeoutError:
+            return f"timed out after {self.probe_timeout:.0f}s"
+        except aiohttp.ClientError as e:
+            return f"{type(e).__name__}: {e}"
+        return None
+
+    async def _guarded_paginate(self, req_type: str, query: t.Optional[str] = None) -> t.Tuple[t.List[dict], bool]:
+        """Paginate through the query behind the circuit breaker
+
+        Only the transport failures (timeouts, connection errors and 5xx) are
+        counted, an incomplete result still mean the upstream answered.
+
+        :raises CircuitOpen: the upstream is down, nothing was requested
+        """
+        if self.breaker.should_probe():
+            self.logger.info(f"[{req_type}] Probing {self.ECHO_URL} before fetching...")
+            try:
+                error = await self.probe()
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            if error is not None:
+                self.breaker.record_failure(f"probe: {error}")
+                raise CircuitOpen(f"{self.breaker.name} is still down ({error})")
+        try:
+            final_results, is_incomplete = await self.paginate_through(
+                query or self.get_query(req_type), "", req_type
+            )
+        except asyncio.TimeoutError:
+            self.breaker.record_failure(f"{req_type}: timed out")
+            raise
+        except aiohttp.ClientError as e:
+            self.breaker.record_failure(f"{req_type}: {type(e).__name__}: {e}")
+            raise
+        except (asyncio.CancelledError, Exception):
+            # Cancelled or not a transport failure (a malformed payload), nothing is counted
+            # but the next call may probe again instead of waiting on this one.
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return final_results, is_incomplete
+
     async def fetch_lives(self) -> t.List[dict]:
         """
         This will fetch all lives that are currently running.
         """
-        final_results, is_incomplete = await self.paginate_through(vtuberlive_gql)
+        final_results, is_incomplete = await self._guarded_paginate("live")
         if is_incomplete:
             raise ValueError("Failed to get all data, ignoring...")
         final_results = self._sort_by_time(final_results)
         return final_results
 
     async def fetch_upcoming(self) -> t.List[dict]:
-        final_results, _ = await self.paginate_through(vtuberupcoming_gql, "", "upcoming")
+        """
+        This will fetch all upcoming streams.
+
+        A partial result is merged with the last complete snapshot instead
+        of dropping the streams from the failed pages.
+        """
+        final_results, is_incomplete = await self._guarded_paginate("upcoming")
+        if is_incomplete:
+            self.logger.warning(
+                f"Upcoming data are incomplete, merging with the last snapshot ({len(self.upcoming_snapshot)} streams)"
+            )
+        final_results = self.upcoming_snapshot.merge(final_results, not is_incomplete)
         final_results = self._sort_by_time(final_results)
         return final_results
+
+    async def fetch_channel_ids(self) -> t.Set[str]:
+        """
+        This will fetch the ID of every VTuber channel known by the API.
+
+        The list is cached for ``channels_max_age`` seconds, the previous
+        list is kept if the refresh failed.
+        """
+        if self._channel_ids is not None and time.monotonic() - self._channel_ids_at < self.channels_max_age:
+            return self._channel_ids
+        query = build_vtuber_query("channels", CHANNEL_FIELDS, self.page_size, [])
+        try:
+            final_results, is_incomplete = await self._guarded_paginate("channels", query)
+            if is_incomplete:
+                raise ValueError("Failed to get all channels, ignoring...")
+        except (ValueError, asyncio.TimeoutError, aiohttp.ClientError, CircuitOpen) as e:
+            if self._channel_ids is None:
+                raise
+            self.logger.warning(f"Failed to refresh the channel list, keeping the previous one: {e}")
+            return self._channel_ids
+        self._channel_ids = {channel["id"] for channel in final_results}
+        self._channel_ids_at = time.monotonic()
+        return self._channel_ids
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import math
+import time
+import traceback
+import typing as t
+from collections import deque
+
+Sampler = t.Callable[[], t.Awaitable[t.Optional[float]]]
+
+
+class LatencyRing:
+    """Fixed-size ring buffer of ``(timestamp, seconds)`` samples, a failed sample is ``None``"""
+
+    def __init__(self, size: int):
+        self.samples: t.Deque[t.Tuple[float, t.Optional[float]]] = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, latency: t.Optional[float], now: t.Optional[float] = None):
+        self.samples.append((time.monotonic() if now is None else now, latency))
+
+    def current(self) -> t.Optional[float]:
+        if not self.samples:
+            return None
+        return self.samples[-1][1]
+
+    def window(self, seconds: float, now: t.Optional[float] = None) -> t.Tuple[t.List[float], int]:
+        """Get the sorted successful samples and the failure count from the last ``seconds``"""
+        since = (time.monotonic() if now is None else now) - seconds
+        values = []
+        failures = 0
+        for sampled_at, latency in self.samples:
+            if sampled_at < since:
+                continue
+            if latency is None:
+                failures += 1
+            else:
+                values.append(latency)
+        values.sort()
+        return values, failures
+
+    def percentiles(
+        self, seconds: float, ranks: t.Iterable[float] = (0.5, 0.95, 0.99)
+    ) -> t.Tuple[t.Dict[float, float], int]:
+        values, failures = self.window(seconds)
+        if not values:
+            return {}, failures
+        return {rank: values[min(int(len(values) * rank), len(values) - 1)] for rank in ranks}, failures
+
+
+class LatencyProbe:
+    """Sample every latency source on an interval into its own ring buffer.
+
+    The buffers are sized to hold ``window`` seconds of samples, so the
+    ``ping`` command can answer from memory without measuring anything.
+    A sampler return the latency in seconds, ``None`` when there's no
+    sample to take, and raise when the measurement failed.
+    """
+
+    def __init__(self, samplers: t.Dict[str, Sampler], interval: float = 30.0, window: float = 3600.0):
+        self.logger = logging.getLogger("vtutils.latency.LatencyProbe")
+        self.samplers = samplers
+        self.interval = interval
+        self.window = window
+        size = int(math.ceil(window / interval)) + 1
+        self.rings: t.Dict[str, LatencyRing] = {name: LatencyRing(size) for name in samplers}
+        self._task: t.Optional[asyncio.Task] = None
+
+    async def _sample(self, name: str, sampler: Sampler):
+        try:
+            latency = await sampler()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.warning(f"[{name}] Failed to sample the latency: {type(e).__name__}: {e}")
+            self.rings[name].add(None)
+            return
+        if latency is not None and math.isfinite(latency):
+            self.rings[name].add(latency)
+
+    async def sample_all(self):
+        await asyncio.gather(*[self._sample(name, sampler) for name, sampler in self.samplers.items()])
+
+    async def run(self):
+        while True:
+            start_time = time.perf_counter()
+            await self.sample_all()
+            await asyncio.sleep(max(0.0, self.interval - (time.perf_counter() - start_time)))
+
+    async def _run_forever(self):
+        try:
+            await self.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            tb = traceback.format_exception(type(e), e, e.__traceback__)
+            self.logger.error("Latency probe stopped unexpectedly.")
+            self.logger.error("".join(tb))
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run_forever())
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> t.Dict[str, t.Dict[str, t.Any]]:
+        results = {}
+        for name, ring in self.rings.items():
+            percentiles, failures = ring.percentiles(self.window)
+            results[name] = {
+                "current": ring.current(),
+                "p50": percentiles.get(0.5),
+                "p95": percentiles.get(0.95),
+                "p99": percentiles.get(0.99),
+                "failures": failures,
+                "samples": len(ring),
+            }
+        return results
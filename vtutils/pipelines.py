@@ -0,0 +1,56 @@
+import asyncio
+import logging
+import typing as t
+
+import discord
+
+PipelineFactory = t.Callable[[], t.Coroutine]
+
+
+class GroupPipelines:
+    """Keep at most one running pipeline per destination group.
+
+    The watcher tick start the group pipelines without waiting for them, a
+    group still busy from a previous tick is skipped so a slow channel only
+    delay itself. A pipeline running for more than ``timeout`` seconds is
+    cancelled, so a stuck group is retried on the next tick. Every pipeline
+    is tracked by the profiler and the loop supervisor (drained on shutdown).
+    """
+
+    def __init__(self, watcher: str, bot: discord.Client, timeout: float = 5 * 60):
+        self.logger = logging.getLogger(f"vtutils.pipelines.GroupPipelines.{watcher}")
+        self.watcher = watcher
+        self.bot = bot
+        self.timeout = timeout
+        self._running: t.Dict[str, asyncio.Future] = {}
+        # group -> ticks skipped because the previous pipeline was still running
+        self.skipped: t.Dict[str, int] = {}
+        # group -> pipelines cancelled after the timeout
+        self.timeouts: t.Dict[str, int] = {}
+
+    def is_running(self, group: str) -> bool:
+        task = self._running.get(group)
+        return task is not None and not task.done()
+
+    def launch(self, group: str, pipeline: PipelineFactory) -> t.Optional[asyncio.Future]:
+        """Start the group pipeline, None if the previous one is still running"""
+        if self.is_running(group):
+            self.skipped[group] = self.skipped.get(group, 0) + 1
+            self.logger.warning(f"[{group}] Previous pipeline is still running, skipping this tick.")
+            return None
+        task = asyncio.ensure_future(self.bot.profiler.track(self.watcher, self._run(group, pipeline)))
+        self._running[group] = task
+        self.bot.supervisor.track(task)
+        return task
+
+    async def _run(self, group: str, pipeline: PipelineFactory):
+        try:
+            await asyncio.wait_for(pipeline(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts[group] = self.timeouts.get(group, 0) + 1
+            self.logger.error(f"[{group}] Pipeline is still running after {self.timeout:.0f}s, cancelled.")
+
+    def cancel(self):
+        for task in self._running.values():
+            task.cancel()
+        self._running.clear()
@@ -0,0 +1,167 @@
+import logging
+import typing as t
+
+import discord
+
+UrlBuilder = t.Callable[[dict], str]
+
+
+class Platform:
+    """Everything the bot need to know about a streaming platform.
+
+    :param key_prefix: prepended to the stream ID on the stream key (the live embed footer)
+    :param id_prefix: the stream ID already start with this, used to recognize the key
+        of the platforms without ``key_prefix``
+    """
+
+    def __init__(
+        self,
+        name: str,
+        label: str,
+        color: t.Union[int, discord.Color],
+        icon_url: str,
+        emote: str,
+        watch_url: UrlBuilder,
+        channel_url: UrlBuilder,
+        schedule_url: UrlBuilder,
+        key_prefix: str = "",
+        id_prefix: str = "",
+        enabled: bool = True,
+    ):
+        self.name = name
+        self.label = label
+        self.color = color
+        self.icon_url = icon_url
+        self.emote = emote
+        self.watch_url = watch_url
+        self.channel_url = channel_url
+        self.schedule_url = schedule_url
+        self.key_prefix = key_prefix
+        self.id_prefix = id_prefix
+        self.enabled = enabled
+
+    def __repr__(self):
+        return f"<Platform {self.name} enabled={self.enabled}>"
+
+    def encode_key(self, data: dict) -> str:
+        return self.key_prefix + data["id"]
+
+    def owns_key(self, stream_key: str) -> bool:
+        prefix = self.key_prefix or self.id_prefix
+        return bool(prefix) and stream_key.startswith(prefix)
+
+
+class PlatformRegistry:
+    """Lookup table of every platform, the only place with per-platform branches.
+
+    It also own the stream key used everywhere (the live embed footer, the
+    snapshots, the indexes and the history). The platform without any
+    key/ID prefix is the ``fallback`` when decoding a stream key (YouTube).
+    """
+
+    def __init__(self, platforms: t.List[Platform], fallback: str):
+        self.logger = logging.getLogger("vtutils.platforms.PlatformRegistry")
+        self._platforms: t.Dict[str, Platform] = {platform.name: platform for platform in platforms}
+        self._fallback = self._platforms[fallback]
+        self._unknown: t.Set[str] = set()
+
+    def __iter__(self) -> t.Iterator[Platform]:
+        return iter(self._platforms.values())
+
+    def __getitem__(self, name: str) -> Platform:
+        """:raises KeyError: the platform is unknown"""
+        platform = self._platforms.get(name)
+        if platform is None:
+            raise KeyError(f"Unknown platform {name!r}")
+        return platform
+
+    def configure(self, config: t.Dict[str, dict]):
+        """Apply the ``platforms`` config, ``{"twitch": {"enabled": false}}``"""
+        for name, platform_config in config.items():
+            if name in self._platforms:
+                self._platforms[name].enabled = platform_config.get("enabled", True)
+
+    def is_enabled(self, name: str) -> bool:
+        platform = self._platforms.get(name)
+        return platform is not None and platform.enabled
+
+    def key_of(self, data: dict) -> str:
+        """The stream key, also put on the live embed footer.
+
+        A stream from a platform the bot doesn't know yet is keyed like the
+        fallback platform (its bare ID), this is logged once per platform.
+        """
+        platform = self._platforms.get(data["platform"])
+        if platform is None:
+            if data["platform"] not in self._unknown:
+                self._unknown.add(data["platform"])
+                self.logger.warning(f"Unknown platform {data['platform']!r}, keyed like {self._fallback.name}")
+            platform = self._fallback
+        return platform.encode_key(data)
+
+    def platform_of_key(self, stream_key: str) -> Platform:
+        for platform in self._platforms.values():
+            if platform.owns_key(stream_key):
+                return platform
+        return self._fallback
+
+
+PLATFORMS = PlatformRegistry(
+    [
+        Platform(
+            "youtube",
+            "Youtube",
+            0xFF0000,
+            "https://s.ytimg.com/yts/img/favicon_144-vfliLAfaB.png",
+            "<:vtBYT:843473930348920832>",
+            watch_url=lambda data: f"https://youtube.com/watch?v={data['id']}",
+            channel_url=lambda data: f"https://youtube.com/channel/{data['channel']['id']}",
+            schedule_url=lambda data: f"https://youtu.be/{data['id']}",
+        ),
+        Platform(
+            "bilibili",
+            "Bilibili",
+            0x23ADE5,
+            "https://logodix.com/logo/1224389.png",
+            "<:vtBB2:843474401310670848>",
+            watch_url=lambda data: f"https://live.bilibili.com/{data['room_id']}",
+            channel_url=lambda data: f"https://space.bilibili.com/{data['channel']['id']}",
+            schedule_url=lambda data: f"https://live.bilibili.com/{data['room_id']}",
+            id_prefix="bili",
+        ),
+        Platform(
+            "twitch",
+            "Twitch",
+            0x9147FF,
+            "https://p.n4o.xyz/i/twitchlogo.png",
+            "<:vtBTTV:843474008984518687>",
+            watch_url=lambda data: f"https://www.twitch.tv/{data['channel']['id']}",
+            channel_url=lambda data: f"https://twitch.tv/{data['channel']['id']}",
+            schedule_url=lambda data: f"https://twitch.tv/{data['id']}",
+            key_prefix="twitch",
+        ),
+        Platform(
+            "twitcasting",
+            "Twitcasting",
+            0x280FC,
+            "https://twitcasting.tv/img/icon192.png",
+            "<:vtBTW:843473977484509184>",
+            watch_url=lambda data: f"https://twitcasting.tv/{data['channel']['id']}",
+            channel_url=lambda data: f"https://twitcasting.tv/{data['channel']['id']}",
+            schedule_url=lambda data: f"https://twitcasting.tv/{data['id']}",
+            key_prefix="twcast",
+        ),
+        Platform(
+            "mildom",
+            "Mildom",
+            discord.Color.from_rgb(56, 204, 227),
+            "https://mildom.com/assets/logo.png",
+            "<:vtBMD:843474000159965226>",
+            watch_url=lambda data: f"https://mildom.com/{data['channel']['id']}",
+            channel_url=lambda data: f"https://mildom.com/profile/{data['channel']['id']}",
+            schedule_url=lambda data: f"https://mildom.com/{data['id']}",
+            key_prefix="mildom",
+        ),
+    ],
+    fallback="youtube",
+)
@@ -0,0 +1,123 @@
+import asyncio
+import cProfile
+import io
+import pstats
+import time
+import typing as t
+
+
+class _ProfileSession:
+    def __init__(self, watcher: str, cycles: int):
+        self.watcher = watcher
+        self.cycles = cycles
+        self.profile = cProfile.Profile()
+        self.future: asyncio.Future = asyncio.get_event_loop().create_future()
+
+        self.depth = 0
+        self.cycle_walls: t.List[float] = []
+        self.busy_time = 0.0
+        self.cpu_time = 0.0
+
+    def report(self, top: int = 30) -> str:
+        wall_time = sum(self.cycle_walls)
+        wait_time = max(wall_time - self.busy_time, 0.0)
+        text = f"Profile of {len(self.cycle_walls)} {self.watcher} cycle(s)\n"
+        text += "Cycle wall time: " + ", ".join(f"{cycle:.3f}s" for cycle in self.cycle_walls) + "\n"
+        text += f"Total wall time : {wall_time:.3f}s\n"
+        text += f"On-loop time    : {self.busy_time:.3f}s (summed over every cycle task)\n"
+        text += f"  CPU time      : {self.cpu_time:.3f}s\n"
+        text += f"  Blocking time : {max(self.busy_time - self.cpu_time, 0.0):.3f}s (sync call without CPU)\n"
+        text += f"Await wait time : {wait_time:.3f}s (network, rate limit, sleep)\n\n"
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats("cumulative").print_stats(top)
+        return text + stream.getvalue()
+
+
+class _TimedCoroutine:
+    """Drive a coroutine step by step and only profile while it's running.
+
+    The time between the steps is the time spent awaiting something else.
+    """
+
+    def __init__(self, coro: t.Coroutine, session: _ProfileSession):
+        self._coro = coro
+        self._session = session
+
+    def _step(self, value: t.Any, exc: t.Optional[BaseException]):
+        session = self._session
+        outermost = session.depth == 0
+        session.depth += 1
+        if outermost:
+            wall_start = time.perf_counter()
+            cpu_start = time.thread_time()
+            session.profile.enable()
+        try:
+            if exc is not None:
+                return self._coro.throw(exc)
+            return self._coro.send(value)
+        finally:
+            session.depth -= 1
+            if outermost:
+                session.profile.disable()
+                session.cpu_time += time.thread_time() - cpu_start
+                session.busy_time += time.perf_counter() - wall_start
+
+    def __await__(self):
+        value, exc = None, None
+        while True:
+            try:
+                yielded = self._step(value, exc)
+            except StopIteration as stop:
+                return stop.value
+            try:
+                value, exc = (yield yielded), None
+            except BaseException as e:
+                value, exc = None, e
+
+
+class CycleProfiler:
+    """Profile the next N cycles of a watcher on demand.
+
+    While nothing is requested, ``run`` and ``track`` only cost a dict lookup.
+    """
+
+    def __init__(self):
+        self._sessions: t.Dict[str, _ProfileSession] = {}
+
+    def is_armed(self, watcher: str) -> bool:
+        return watcher in self._sessions
+
+    def arm(self, watcher: str, cycles: int) -> asyncio.Future:
+        """Request a profile, the future will be resolved with the text report"""
+        if watcher in self._sessions:
+            raise ValueError(f"{watcher} is already being profiled")
+        session = _ProfileSession(watcher, cycles)
+        self._sessions[watcher] = session
+        return session.future
+
+    def disarm(self, watcher: str):
+        session = self._sessions.pop(watcher, None)
+        if session is not None and not session.future.done():
+            session.future.cancel()
+
+    def track(self, watcher: str, coro: t.Coroutine) -> t.Awaitable:
+        """Wrap a sub-task coroutine of the cycle (e.g. passed to gather)"""
+        session = self._sessions.get(watcher)
+        if session is None:
+            return coro
+        return _TimedCoroutine(coro, session)
+
+    async def run(self, watcher: str, cycle_func: t.Callable[[], t.Coroutine]) -> t.Any:
+        session = self._sessions.get(watcher)
+        if session is None:
+            return await cycle_func()
+        start_time = time.perf_counter()
+        try:
+            return await _TimedCoroutine(cycle_func(), session)
+        finally:
+            session.cycle_walls.append(time.perf_counter() - start_time)
+            if len(session.cycle_walls) >= session.cycles:
+                del self._sessions[watcher]
+                if not session.future.done():
+                    session.future.set_result(session.report())
@@ -0,0 +1,158 @@
+import asyncio
+import heapq
+import logging
+import time
+import traceback
+import typing as t
+
+from .changefeed import SnapshotDelta
+from .groups import destination_group
+from .platforms import PLATFORMS
+
+ReminderCallback = t.Callable[[dict, str, int], t.Awaitable[None]]
+
+
+class ReminderScheduler:
+    """Fire reminders at the exact time from a time-ordered heap.
+
+    It follow the upcoming snapshot deltas (``apply``), only the streams that
+    changed are rescheduled. Every stream gets one heap entry per offset
+    (seconds before the start time). A reschedule or cancellation bump the stream version in O(1) and
+    push the new entries in O(log n), stale entries are skipped when popped.
+    """
+
+    def __init__(self, callback: ReminderCallback, offsets: t.Iterable[int] = (10 * 60, 0)):
+        self.logger = logging.getLogger("vtutils.reminders.ReminderScheduler")
+        self.callback = callback
+        self.offsets = sorted(set(offsets), reverse=True)
+
+        # (fire_at, sequence, key, version, offset)
+        self._heap: t.List[t.Tuple[float, int, str, int, int]] = []
+        self._sequence = 0
+        # key -> (version, start_time, item, group)
+        self._entries: t.Dict[str, t.Tuple[int, float, dict, str]] = {}
+        self._versions: t.Dict[str, int] = {}
+        self._wakeup = asyncio.Event()
+        self._task: t.Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _push(self, key: str, version: int, start_time: float, now: float):
+        for offset in self.offsets:
+            fire_at = start_time - offset
+            if fire_at < now:
+                continue
+            self._sequence += 1
+            heapq.heappush(self._heap, (fire_at, self._sequence, key, version, offset))
+
+    def _cancel(self, key: str):
+        self._versions[key] = self._versions.get(key, 0) + 1
+        self._entries.pop(key, None)
+
+    def _schedule(self, key: str, item: dict, group: str, now: float):
+        start_time = item["timeData"].get("startTime")
+        entry = self._entries.get(key)
+        if start_time is None:
+            if entry is not None:
+                self.logger.info(f"Cancelling {key}")
+                self._cancel(key)
+            return
+        if entry is not None and entry[1] == start_time:
+            # Keep the latest data for the message
+            self._entries[key] = (entry[0], start_time, item, group)
+            return
+        if entry is not None:
+            self.logger.info(f"Rescheduling {key}")
+        self._cancel(key)
+        version = self._versions[key]
+        self._entries[key] = (version, start_time, item, group)
+        self._push(key, version, start_time, now)
+
+    def _changed(self, earliest: t.Optional[float]):
+        self._maybe_compact()
+        if self._heap and (earliest is None or self._heap[0][0] < earliest):
+            self._wakeup.set()
+
+    def update(self, mapped_items: t.Dict[str, t.List[dict]]):
+        """Apply a whole upcoming snapshot, grouped by the destination group."""
+        now = time.time()
+        earliest = self._heap[0][0] if self._heap else None
+        seen_keys = set()
+        for group, items in mapped_items.items():
+            for item in items:
+                key = PLATFORMS.key_of(item)
+                seen_keys.add(key)
+                self._schedule(key, item, group, now)
+        for key in list(self._entries.keys()):
+            if key not in seen_keys:
+                self.logger.info(f"Cancelling {key}")
+                self._cancel(key)
+        self._changed(earliest)
+
+    def apply(self, delta: SnapshotDelta):
+        """Apply an upcoming snapshot delta, a resync replace everything."""
+        if delta.resync:
+            mapped_items: t.Dict[str, t.List[dict]] = {}
+            for item in delta.added:
+                mapped_items.setdefault(destination_group(item), []).append(item)
+            self.update(mapped_items)
+            return
+        now = time.time()
+        earliest = self._heap[0][0] if self._heap else None
+        for item in delta.removed:
+            key = PLATFORMS.key_of(item)
+            if key in self._entries:
+                self.logger.info(f"Cancelling {key}")
+                self._cancel(key)
+        for item in delta.added + [item for item, _ in delta.modified]:
+            self._schedule(PLATFORMS.key_of(item), item, destination_group(item), now)
+        self._changed(earliest)
+
+    def _maybe_compact(self):
+        if len(self._heap) <= 64 or len(self._heap) <= 2 * len(self._entries) * len(self.offsets):
+            return
+        self._heap = [entry for entry in self._heap if self._is_current(entry)]
+        heapq.heapify(self._heap)
+        self._versions = {key: version for key, version in self._versions.items() if key in self._entries}
+
+    def _is_current(self, heap_entry: t.Tuple[float, int, str, int, int]) -> bool:
+        entry = self._entries.get(heap_entry[2])
+        return entry is not None and entry[0] == heap_entry[3]
+
+    async def _fire(self, item: dict, group: str, offset: int):
+        try:
+            await self.callback(item, group, offset)
+        except Exception as e:
+            tb = traceback.format_exception(type(e), e, e.__traceback__)
+            self.logger.error("".join(tb))
+
+    async def run(self):
+        while True:
+            while self._heap and not self._is_current(self._heap[0]):
+                heapq.heappop(self._heap)
+            if not self._heap:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            fire_at = self._heap[0][0]
+            delay = fire_at - time.time()
+            if delay <= 0:
+                _, _, key, _, offset = heapq.heappop(self._heap)
+                _, _, item, group = self._entries[key]
+                asyncio.ensure_future(self._fire(item, group, offset))
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
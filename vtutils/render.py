@@ -0,0 +1,200 @@
+import re
+import typing as t
+from datetime import datetime, timezone
+
+import discord
+
+from .platforms import PLATFORMS
+
+DEPLOYED_BOT_ID = 714518710924345475
+LATE_THRESHOLD = 5 * 60
+LATE_TOLERANCE = 12 * 60
+
+# The API fields used by the renderer below
+LIVE_EMBED_FIELDS = [
+    "id",
+    "room_id",
+    "title",
+    "thumbnail",
+    "timeData.startTime",
+    "channel.id",
+    "channel.name",
+    "channel.image",
+    "platform",
+    "is_premiere",
+    "is_member",
+]
+SCHEDULE_FIELDS = [
+    "id",
+    "room_id",
+    "title",
+    "timeData.startTime",
+    "channel.name",
+    "channel.en_name",
+    "platform",
+    "is_premiere",
+    "is_member",
+]
+
+
+def stream_url(live_data: dict, web_type: t.Optional[str] = None) -> str:
+    if web_type is None:
+        web_type = live_data["platform"]
+    return PLATFORMS[web_type].watch_url(live_data)
+
+
+def create_live_embed(live_data: dict, web_type: t.Optional[str] = None) -> discord.Embed:
+    if web_type is None:
+        web_type = live_data["platform"]
+    platform = PLATFORMS[web_type]
+    channeru = live_data["channel"]
+    stream_link = platform.watch_url(live_data)
+    channel_url = platform.channel_url(live_data)
+    start_time = datetime.fromtimestamp(
+        live_data["timeData"]["startTime"], tz=timezone.utc
+    )
+    is_member = live_data.get("is_member", False)
+    is_premiere = live_data.get("is_premiere", False)
+
+    embed = discord.Embed(
+        title=live_data["title"],
+        colour=platform.color,
+        url=stream_link,
+        description=f"[Watch Here!]({stream_link})",
+        timestamp=start_time
+    )
+
+    embed.description += f"\n{platform.label} "
+    if is_premiere:
+        embed.description += "Premiere"
+        embed.description = "▶ " + embed.description
+    else:
+        embed.description += "Stream"
+    if is_member:
+        embed.description += " **(Member-Only)**"
+
+    embed.set_image(url=live_data["thumbnail"])
+    embed.set_thumbnail(url=channeru["image"])
+    embed.set_author(
+        name=channeru["name"],
+        icon_url=channeru["image"],
+        url=channel_url,
+    )
+    embed.set_footer(text=platform.encode_key(live_data), icon_url=platform.icon_url)
+    return embed
+
+
+def detect_embed_changes(embed: discord.Embed, live_data: dict) -> t.List[str]:
+    """Compare a posted live embed with the current API data
+
+    :return: the name of the fields that changed since it was posted
+    """
+    changed_fields = []
+    if embed.title != live_data["title"]:
+        changed_fields.append("title")
+    if "thumbnail" in live_data and embed.image.url != live_data["thumbnail"]:
+        changed_fields.append("thumbnail")
+    description = embed.description or ""
+    if description.startswith("▶ ") != bool(live_data.get("is_premiere", False)):
+        changed_fields.append("is_premiere")
+    if ("**(Member-Only)**" in description) != bool(live_data.get("is_member", False)):
+        changed_fields.append("is_member")
+    return changed_fields
+
+
+def is_freechat(title: str) -> bool:
+    all_match = re.findall(r"(fr[e]{2}).*(chat)", title, re.I)
+    if len(all_match) > 0:
+        return True
+    return False
+
+
+def design_schedule(
+    dataset: list, late: int, late_tolerance: int, with_icons: bool = False
+) -> str:
+    """Create the upcoming schedule text for the placeholder message
+
+    :param dataset: the upcoming streams of one group
+    :param late: seconds before a stream marked as late
+    :param late_tolerance: seconds before a late stream is dropped
+    :param with_icons: add the platform emote before every stream
+    """
+    grouped_time: t.Dict[str, t.List[dict]] = {}
+    current_time = datetime.now(timezone.utc).timestamp()
+
+    for data in dataset:
+        start_time = data["timeData"].get(
+            "scheduledStartTime", data["timeData"].get("startTime")
+        )
+        if start_time is None:
+            continue
+        start_time = int(round(start_time))
+        if is_freechat(data["title"]):
+            # Skip free chat room
+            continue
+        if current_time >= start_time + late_tolerance:
+            # Too long
+            continue
+        formatted_time = datetime.fromtimestamp(
+            start_time + (9 * 60 * 60), tz=timezone.utc
+        ).strftime("%m/%d %H:%M JST")
+        if formatted_time not in grouped_time:
+            grouped_time[formatted_time] = []
+        grouped_time[formatted_time].append(data)
+
+    MAX_LENGTH = 2048
+    formatted_schedule = ""
+    should_break = False
+    exchanged_fmt = formatted_schedule
+    for start_time, dataset in grouped_time.items():
+        if len(dataset) < 1:
+            continue
+        first_data = dataset[0]
+        real_start_time = first_data["timeData"].get(
+            "scheduledStartTime", first_data["timeData"].get("startTime")
+        )
+        if real_start_time is None:
+            real_start_time = "**" + start_time + "**"
+        else:
+            real_start_time = f"<t:{int(round(real_start_time))}>"
+        temp = f"{formatted_schedule} {real_start_time}\n"
+        if len(temp) >= MAX_LENGTH:
+            break
+        exchanged_fmt = formatted_schedule
+        formatted_schedule = temp
+        for data in dataset:
+            start_time = data["timeData"].get(
+                "scheduledStartTime", data["timeData"].get("startTime")
+            )
+            msg_fmt = ""
+            if data.get("is_member", False):
+                msg_fmt += "🔒 "
+            if data.get("is_premiere", False):
+                msg_fmt += "▶ "
+            if current_time > start_time + late:
+                msg_fmt += "❓ "
+            channel_data = data["channel"]
+            channel_name = channel_data.get(
+                "en_name", channel_data.get(
+                    "name", "Unknown"
+                )
+            )
+            platform = PLATFORMS[data["platform"]]
+            if with_icons:
+                msg_fmt += f"{platform.emote} "
+            msg_fmt += f"**`{channel_name}`**"
+            msg_fmt += f" - [{data['title']}]({platform.schedule_url(data)})\n"
+            temp = formatted_schedule + msg_fmt
+            if len(temp) >= MAX_LENGTH:
+                should_break = True
+                break
+            formatted_schedule = temp
+        if should_break:
+            break
+        temp = formatted_schedule + "\n"
+        if len(temp) >= MAX_LENGTH:
+            formatted_schedule = exchanged_fmt
+            break
+        formatted_schedule = temp
+    formatted_schedule = formatted_schedule.rstrip("\n")
+    return formatted_schedule
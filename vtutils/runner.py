@@ -0,0 +1,66 @@
+import asyncio
+import logging
+import signal
+import typing as t
+
+logger = logging.getLogger("vtutils.runner")
+
+
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    """Create and set a new event loop, using uvloop when it's installed."""
+    try:
+        import uvloop
+
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        logger.info("Using uvloop event loop")
+    except ImportError:
+        pass
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    return loop
+
+
+def install_signal_handlers(loop: asyncio.AbstractEventLoop, callback: t.Callable[[], t.Any]) -> bool:
+    """Call ``callback`` on SIGINT/SIGTERM, return False if the platform doesn't support it."""
+    try:
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, callback)
+    except (NotImplementedError, RuntimeError):
+        # Windows, fallback to KeyboardInterrupt
+        return False
+    return True
+
+
+def cancel_all_tasks(loop: asyncio.AbstractEventLoop):
+    """Cancel every leftover tasks and wait for them, a copy of discord.Client _cancel_tasks"""
+    tasks = {task for task in asyncio.all_tasks(loop) if not task.done()}
+    if not tasks:
+        return
+
+    logger.info("Cleaning up after %d tasks.", len(tasks))
+    for task in tasks:
+        task.cancel()
+
+    loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+    logger.info("All tasks finished cancelling.")
+
+    for task in tasks:
+        if task.cancelled():
+            continue
+        if task.exception() is not None:
+            loop.call_exception_handler(
+                {
+                    "message": "Unhandled exception during shutdown.",
+                    "exception": task.exception(),
+                    "task": task,
+                }
+            )
+
+
+def close_event_loop(loop: asyncio.AbstractEventLoop):
+    try:
+        cancel_all_tasks(loop)
+        loop.run_until_complete(loop.shutdown_asyncgens())
+    finally:
+        logger.info("Closing the event loop.")
+        loop.close()
@@ -0,0 +1,135 @@
+import bisect
+import re
+import typing as t
+
+from .changefeed import SnapshotDelta
+from .platforms import PLATFORMS
+
+# The API fields used to build the index
+SEARCH_FIELDS = [
+    "id",
+    "room_id",
+    "title",
+    "group",
+    "platform",
+    "timeData.startTime",
+    "channel.id",
+    "channel.name",
+    "channel.en_name",
+]
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: t.Optional[str]) -> t.Set[str]:
+    if not text:
+        return set()
+    return set(_TOKEN_RE.findall(text.lower()))
+
+
+class StreamSearchIndex:
+    """An inverted index over the streams of the latest snapshot.
+
+    The index follow the snapshot deltas (``apply``), only the streams that
+    are added, removed or changed are (re)indexed. Query tokens are matched as prefix
+    against a sorted vocabulary and every query token must match.
+    """
+
+    def __init__(self):
+        self._items: t.Dict[str, dict] = {}
+        self._item_tokens: t.Dict[str, t.FrozenSet[str]] = {}
+        self._postings: t.Dict[str, t.Set[str]] = {}
+        self._vocabulary: t.List[str] = []
+
+    def __len__(self):
+        return len(self._items)
+
+    @staticmethod
+    def _tokens_of(item: dict) -> t.FrozenSet[str]:
+        channel = item.get("channel", {})
+        tokens = set()
+        tokens.update(tokenize(channel.get("name")))
+        tokens.update(tokenize(channel.get("en_name")))
+        tokens.update(tokenize(item.get("title")))
+        tokens.update(tokenize(item.get("group")))
+        tokens.update(tokenize(item.get("platform")))
+        return frozenset(tokens)
+
+    def _add_tokens(self, key: str, tokens: t.Iterable[str]):
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = set()
+                bisect.insort(self._vocabulary, token)
+            posting.add(key)
+
+    def _remove_tokens(self, key: str, tokens: t.Iterable[str]):
+        for token in tokens:
+            posting = self._postings.get(token)
+            if posting is None:
+                continue
+            posting.discard(key)
+            if not posting:
+                del self._postings[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+
+    def _put(self, key: str, item: dict):
+        tokens = self._tokens_of(item)
+        old_tokens = self._item_tokens.get(key)
+        if old_tokens != tokens:
+            if old_tokens is not None:
+                self._remove_tokens(key, old_tokens - tokens)
+                self._add_tokens(key, tokens - old_tokens)
+            else:
+                self._add_tokens(key, tokens)
+            self._item_tokens[key] = tokens
+        self._items[key] = item
+
+    def _remove(self, key: str):
+        if key in self._items:
+            self._remove_tokens(key, self._item_tokens.pop(key))
+            del self._items[key]
+
+    def update(self, items: t.List[dict]):
+        """Replace the index content with a whole snapshot"""
+        new_items = {PLATFORMS.key_of(item): item for item in items}
+        for key in list(self._items.keys()):
+            if key not in new_items:
+                self._remove(key)
+        for key, item in new_items.items():
+            self._put(key, item)
+
+    def apply(self, delta: SnapshotDelta):
+        """Apply a snapshot delta, a resync replace everything"""
+        if delta.resync:
+            self.update(delta.added)
+            return
+        for item in delta.removed:
+            self._remove(PLATFORMS.key_of(item))
+        for item in delta.added:
+            self._put(PLATFORMS.key_of(item), item)
+        for item, _ in delta.modified:
+            self._put(PLATFORMS.key_of(item), item)
+
+    def _match_prefix(self, prefix: str) -> t.Set[str]:
+        matched: t.Set[str] = set()
+        position = bisect.bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+            matched.update(self._postings[self._vocabulary[position]])
+            position += 1
+        return matched
+
+    def search(self, query: str, limit: int = 5) -> t.List[dict]:
+        """Find the streams matching every token of the query, sorted by start time"""
+        query_tokens = sorted(tokenize(query), key=len, reverse=True)
+        if not query_tokens:
+            return []
+        matched: t.Optional[t.Set[str]] = None
+        for token in query_tokens:
+            token_match = self._match_prefix(token)
+            matched = token_match if matched is None else matched & token_match
+            if not matched:
+                return []
+        results = [self._items[key] for key in matched]
+        results.sort(key=lambda x: x["timeData"]["startTime"])
+        return results[:limit]
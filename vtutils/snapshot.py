@@ -0,0 +1,42 @@
+import time
+import typing as t
+
+from .platforms import PLATFORMS
+
+
+class LastGoodSnapshot:
+    """Keep the last good snapshot keyed by stream and merge partial results into it.
+
+    A complete fetch replace everything, a partial fetch only refresh the
+    streams it contains. Streams that are not seen for ``max_stale``
+    seconds are expired so a cancelled stream will not stay forever.
+    """
+
+    def __init__(self, max_stale: float = 15 * 60):
+        self.max_stale = max_stale
+        self._items: t.Dict[str, dict] = {}
+        self._seen_at: t.Dict[str, float] = {}
+
+    def __len__(self):
+        return len(self._items)
+
+    def last_seen(self, key: str) -> t.Optional[float]:
+        return self._seen_at.get(key)
+
+    def merge(self, items: t.List[dict], is_complete: bool, now: t.Optional[float] = None) -> t.List[dict]:
+        if now is None:
+            now = time.time()
+        if is_complete:
+            self._items = {PLATFORMS.key_of(item): item for item in items}
+            self._seen_at = {key: now for key in self._items.keys()}
+            return list(items)
+
+        for item in items:
+            key = PLATFORMS.key_of(item)
+            self._items[key] = item
+            self._seen_at[key] = now
+        for key, seen_at in list(self._seen_at.items()):
+            if now - seen_at > self.max_stale:
+                del self._seen_at[key]
+                del self._items[key]
+        return list(self._items.values())
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import typing as t
+from functools import partial
+
+import discord
+
+from .budget import PRIORITY_POST, ActionShed
+from .render import stream_url
+
+MESSAGE_LIMIT = 2000
+
+
+class SubscriptionStore:
+    """A durable VTuber channel ID -> subscribers index.
+
+    Saved as JSON, written to a temporary file then replaced so a crash
+    will never leave a half-written file behind. The changes are batched
+    and written off the event loop ``save_delay`` seconds after the first one.
+    Every role is stored with its guild ID.
+    """
+
+    def __init__(self, path: str = "subscriptions.json", save_delay: float = 2.0):
+        self.logger = logging.getLogger("vtutils.subscriptions.SubscriptionStore")
+        self.path = path
+        self.save_delay = save_delay
+        self.users: t.Dict[str, t.Set[int]] = {}
+        # VTuber channel ID -> role ID -> guild ID
+        self.roles: t.Dict[str, t.Dict[int, int]] = {}
+        self._save_handle: t.Optional[asyncio.Handle] = None
+        self._saving: t.Optional[asyncio.Future] = None
+        self._load()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as fp:
+            data = json.load(fp)
+        self.users = {channel_id: set(user_ids) for channel_id, user_ids in data.get("users", {}).items()}
+        self.roles = {
+            channel_id: {int(role_id): guild_id for role_id, guild_id in roles.items()}
+            for channel_id, roles in data.get("roles", {}).items()
+        }
+        self.logger.info(f"Loaded subscriptions for {len(self.users) + len(self.roles)} channels")
+
+    def _dump(self) -> dict:
+        return {
+            "users": {channel_id: sorted(user_ids) for channel_id, user_ids in self.users.items() if user_ids},
+            "roles": {
+                channel_id: {str(role_id): guild_id for role_id, guild_id in sorted(roles.items())}
+                for channel_id, roles in self.roles.items()
+                if roles
+            },
+        }
+
+    def _write(self, data: dict):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as fp:
+            json.dump(data, fp, indent=4)
+        os.replace(temp_path, self.path)
+
+    def save(self):
+        """Write everything right away, blocking"""
+        self._write(self._dump())
+
+    def schedule_save(self):
+        if self._save_handle is not None:
+            return
+        self._save_handle = asyncio.get_event_loop().call_later(self.save_delay, self._start_save)
+
+    def _start_save(self):
+        self._save_handle = None
+        if self._saving is not None and not self._saving.done():
+            # Still writing the previous batch
+            self.schedule_save()
+            return
+        self._saving = asyncio.get_event_loop().run_in_executor(None, self._write, self._dump())
+        self._saving.add_done_callback(self._on_saved)
+
+    def _on_saved(self, future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            self.logger.error(f"Failed to save the subscriptions: {future.exception()}")
+
+    async def flush(self):
+        """Write the pending changes now, called on shutdown"""
+        if self._saving is not None and not self._saving.done():
+            await asyncio.wait([self._saving])
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+            await asyncio.get_event_loop().run_in_executor(None, self._write, self._dump())
+
+    def _change(self, index: t.Dict[str, t.Set[int]], channel_id: str, target_id: int, add: bool) -> bool:
+        targets = index.get(channel_id, set())
+        if add == (target_id in targets):
+            return False
+        if add:
+            index.setdefault(channel_id, targets).add(target_id)
+        else:
+            targets.discard(target_id)
+            if not targets:
+                del index[channel_id]
+        self.schedule_save()
+        return True
+
+    def subscribe_user(self, channel_id: str, user_id: int) -> bool:
+        return self._change(self.users, channel_id, user_id, True)
+
+    def unsubscribe_user(self, channel_id: str, user_id: int) -> bool:
+        return self._change(self.users, channel_id, user_id, False)
+
+    def subscribe_role(self, channel_id: str, role_id: int, guild_id: int) -> bool:
+        roles = self.roles.setdefault(channel_id, {})
+        if roles.get(role_id) == guild_id:
+            return False
+        roles[role_id] = guild_id
+        self.schedule_save()
+        return True
+
+    def unsubscribe_role(self, channel_id: str, role_id: int) -> bool:
+        roles = self.roles.get(channel_id)
+        if roles is None or role_id not in roles:
+            return False
+        del roles[role_id]
+        if not roles:
+            del self.roles[channel_id]
+        self.schedule_save()
+        return True
+
+    def roles_in_guild(self, channel_id: str, guild: discord.Guild) -> t.List[int]:
+        """The roles subscribed to the VTuber that belong to ``guild``"""
+        return sorted(role_id for role_id, guild_id in self.roles.get(channel_id, {}).items() if guild_id == guild.id)
+
+    def user_subscriptions(self, user_id: int) -> t.List[str]:
+        return [channel_id for channel_id, user_ids in self.users.items() if user_id in user_ids]
+
+
+class SubscriberNotifier:
+    """Notify the subscribers of the streams that just started.
+
+    Role mentions are packed into as few messages as possible, DMs are
+    merged per user and sent from a rate-limited background queue.
+    """
+
+    def __init__(self, bot: discord.Client, store: SubscriptionStore, dm_per_second: float = 1.0):
+        self.bot = bot
+        self.store = store
+        self.dm_interval = 1.0 / dm_per_second
+        self.logger = logging.getLogger("vtutils.subscriptions.SubscriberNotifier")
+
+        self._dm_queue: "asyncio.Queue[t.Tuple[int, str]]" = asyncio.Queue()
+        self._dm_task: t.Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._dm_task is None or self._dm_task.done():
+            self._dm_task = asyncio.ensure_future(self._dm_worker())
+
+    @staticmethod
+    def _format_live(live_data: dict) -> str:
+        channel_name = live_data["channel"].get("name", live_data["channel"]["id"])
+        return f"**{channel_name}** is live: <{stream_url(live_data)}>"
+
+    @staticmethod
+    def pack_lines(lines: t.List[str], limit: int = MESSAGE_LIMIT) -> t.List[str]:
+        packed: t.List[str] = []
+        current = ""
+        for line in lines:
+            line = line[:limit]
+            if current and len(current) + len(line) + 1 > limit:
+                packed.append(current)
+                current = ""
+            current = f"{current}\n{line}" if current else line
+        if current:
+            packed.append(current)
+        return packed
+
+    async def notify_new_lives(self, channel: t.Optional[discord.TextChannel], new_lives: t.List[dict]):
+        """Called once per cycle with the streams that just started on a channel."""
+        mention_lines = []
+        user_lines: t.Dict[int, t.List[str]] = {}
+        for live_data in new_lives:
+            vtuber_id = live_data["channel"]["id"]
+            # Only mention the roles of the guild that own the live channel
+            role_ids = self.store.roles_in_guild(vtuber_id, channel.guild) if channel is not None else []
+            user_ids = self.store.users.get(vtuber_id)
+            if not role_ids and not user_ids:
+                continue
+            live_text = self._format_live(live_data)
+            if role_ids:
+                mentions = " ".join(f"<@&{role_id}>" for role_id in role_ids)
+                mention_lines.append(f"{mentions} {live_text}")
+            for user_id in user_ids or []:
+                user_lines.setdefault(user_id, []).append(live_text)
+
+        for user_id, lines in user_lines.items():
+            for text in self.pack_lines(lines):
+                self._dm_queue.put_nowait((user_id, text))
+
+        if channel is None or not mention_lines:
+            return
+        allowed_mentions = discord.AllowedMentions(everyone=False, users=False, roles=True)
+        for text in self.pack_lines(mention_lines):
+            try:
+                await self.bot.rest_planner.submit(
+                    PRIORITY_POST,
+                    f"send:{channel.id}",
+                    partial(channel.send, content=text, allowed_mentions=allowed_mentions),
+                )
+            except (discord.HTTPException, ActionShed):
+                self.logger.error(f"Failed to send subscriber mentions to #{channel}")
+
+    async def _dm_worker(self):
+        while True:
+            user_id, text = await self._dm_queue.get()
+            start_time = time.perf_counter()
+            try:
+                user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+                await user.send(content=text)
+            except discord.HTTPException:
+                self.logger.warning(f"Failed to DM {user_id}, probably closed DMs.")
+            except Exception:
+                self.logger.exception(f"Unexpected error while DMing {user_id}")
+            finally:
+                self._dm_queue.task_done()
+            await asyncio.sleep(max(0.0, self.dm_interval - (time.perf_counter() - start_time)))
+
+    async def close(self, timeout: float = 10.0):
+        """Try to flush the pending DMs, then stop the worker."""
+        if self._dm_task is None:
+            return
+        try:
+            await asyncio.wait_for(self._dm_queue.join(), timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Dropping {self._dm_queue.qsize()} pending DMs.")
+        self._dm_task.cancel()
+        self._dm_task = None
@@ -0,0 +1,230 @@
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+import typing as t
+
+from discord.ext import tasks
+
+
+class _WatcherState:
+    def __init__(self, name: str, loop: tasks.Loop, interval: float):
+        self.name = name
+        self.loop = loop
+        self.interval = interval
+        self.registered_at = time.monotonic()
+        self.cycle_started: t.Optional[float] = None
+        self.overrun_reported = False
+        self.last_duration = 0.0
+        self.finished_at: t.Deque[float] = collections.deque(maxlen=1024)
+        self.overruns = 0
+        self.restarts = 0
+
+    def cycle_rate(self, window: float) -> t.Tuple[int, float]:
+        """Get the (done, expected) amount of cycles in the last ``window`` seconds"""
+        now = time.monotonic()
+        window = min(window, now - self.registered_at)
+        done = sum(1 for finished_at in self.finished_at if now - finished_at <= window)
+        return done, window / self.interval
+
+
+class _CycleContext:
+    def __init__(self, supervisor: "LoopSupervisor", name: str):
+        self._supervisor = supervisor
+        self._name = name
+
+    async def __aenter__(self):
+        self._supervisor._cycle_started(self._name)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._supervisor._cycle_finished(self._name)
+
+
+class LoopSupervisor:
+    """Watch the event loop lag and the watcher cycles.
+
+    - A task measure how late ``asyncio.sleep`` wake up (event loop lag).
+    - A thread capture the stack of the event loop thread when it's blocked
+      longer than ``lag_threshold``, which show the slow callback.
+    - Every registered watcher is checked for overrunning cycles and cycles
+      stalled for more than ``stall_factor`` times its interval are restarted.
+    """
+
+    def __init__(
+        self,
+        lag_interval: float = 0.5,
+        lag_threshold: float = 0.25,
+        stall_factor: float = 3.0,
+        check_interval: float = 15.0,
+    ):
+        self.logger = logging.getLogger("vtutils.supervisor.LoopSupervisor")
+        self.lag_interval = lag_interval
+        self.lag_threshold = lag_threshold
+        self.stall_factor = stall_factor
+        self.check_interval = check_interval
+
+        self.lag_samples: t.Deque[float] = collections.deque(maxlen=int(3600 / lag_interval))
+        self.blocked_events: t.Deque[t.Tuple[float, float, str]] = collections.deque(maxlen=20)
+        self._watchers: t.Dict[str, _WatcherState] = {}
+
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: t.Optional[int] = None
+        self._stop_event = threading.Event()
+        self._watchdog: t.Optional[threading.Thread] = None
+        self._tasks: t.List[asyncio.Task] = []
+        self._draining = False
+        # Work started by a cycle that outlive it (the group pipelines)
+        self._background: t.Set[asyncio.Future] = set()
+
+    def register(self, name: str, loop: tasks.Loop):
+        interval = loop.seconds + loop.minutes * 60 + loop.hours * 3600
+        self._watchers[name] = _WatcherState(name, loop, interval)
+
+    def unregister(self, name: str):
+        self._watchers.pop(name, None)
+
+    def track(self, future: asyncio.Future):
+        """Let ``drain`` wait for a task started by a cycle without being awaited by it"""
+        self._background.add(future)
+        future.add_done_callback(self._background.discard)
+
+    def cycle(self, name: str) -> _CycleContext:
+        """``async with supervisor.cycle(name):`` around a watcher cycle"""
+        return _CycleContext(self, name)
+
+    def _cycle_started(self, name: str):
+        state = self._watchers.get(name)
+        if state is not None:
+            state.cycle_started = time.monotonic()
+            state.overrun_reported = False
+
+    def _cycle_finished(self, name: str):
+        state = self._watchers.get(name)
+        if state is None or state.cycle_started is None:
+            return
+        now = time.monotonic()
+        state.last_duration = now - state.cycle_started
+        state.finished_at.append(now)
+        state.cycle_started = None
+
+    async def _lag_monitor(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            self._heartbeat = time.monotonic()
+            start_time = loop.time()
+            await asyncio.sleep(self.lag_interval)
+            lag = max(loop.time() - start_time - self.lag_interval, 0.0)
+            self.lag_samples.append(lag)
+            if lag >= self.lag_threshold:
+                self.logger.warning(f"Event loop was blocked for {lag:.3f}s")
+
+    def _watchdog_thread(self):
+        reported_heartbeat = None
+        while not self._stop_event.wait(self.lag_threshold / 2):
+            heartbeat = self._heartbeat
+            blocked_for = time.monotonic() - heartbeat - self.lag_interval
+            if blocked_for < self.lag_threshold or reported_heartbeat == heartbeat:
+                continue
+            reported_heartbeat = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            self.blocked_events.append((time.time(), blocked_for, stack))
+            self.logger.warning(f"Event loop blocked for more than {blocked_for:.3f}s, currently running:\n{stack}")
+
+    async def _check_watchers(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            now = time.monotonic()
+            if self._draining:
+                continue
+            for state in list(self._watchers.values()):
+                if state.cycle_started is not None:
+                    elapsed = now - state.cycle_started
+                    if elapsed > state.interval * self.stall_factor:
+                        self.logger.error(f"[{state.name}] Cycle stalled for {elapsed:.1f}s, restarting...")
+                        state.restarts += 1
+                        state.cycle_started = None
+                        state.loop.restart()
+                        continue
+                    if elapsed > state.interval and not state.overrun_reported:
+                        state.overrun_reported = True
+                        state.overruns += 1
+                        self.logger.warning(
+                            f"[{state.name}] Cycle overrunning its {state.interval:g}s interval ({elapsed:.1f}s)"
+                        )
+                elif not state.loop.is_running() and not state.loop.is_being_cancelled():
+                    self.logger.error(f"[{state.name}] Watcher task is dead, starting it again...")
+                    state.restarts += 1
+                    state.loop.start()
+
+    def start(self):
+        if self._tasks:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._tasks = [
+            asyncio.ensure_future(self._lag_monitor()),
+            asyncio.ensure_future(self._check_watchers()),
+        ]
+        self._stop_event.clear()
+        self._watchdog = threading.Thread(target=self._watchdog_thread, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def drain(self, timeout: float = 30.0):
+        """Stop every watchers, letting the running cycles finish their posts first."""
+        self._draining = True
+        running = []
+        for state in self._watchers.values():
+            if state.cycle_started is not None:
+                state.loop.stop()
+                running.append(state)
+            else:
+                state.loop.cancel()
+        if not running and not self._background:
+            return
+        self.logger.info(
+            f"Waiting for {', '.join(state.name for state in running) or 'no'} cycle and "
+            f"{len(self._background)} background tasks to finish..."
+        )
+        deadline = time.monotonic() + timeout
+        while any(state.cycle_started is not None for state in running) or self._background:
+            if time.monotonic() >= deadline:
+                self.logger.warning("Timed out waiting for the watcher cycles, cancelling...")
+                break
+            await asyncio.sleep(0.1)
+        for state in running:
+            state.loop.cancel()
+        for future in list(self._background):
+            future.cancel()
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._stop_event.set()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+
+    def report(self, window: float = 3600.0) -> str:
+        text = ":stethoscope: Event Loop Health :stethoscope:"
+        if self.lag_samples:
+            samples = sorted(self.lag_samples)
+            p99 = samples[min(int(len(samples) * 0.99), len(samples) - 1)]
+            text += f"\nLag: last `{self.lag_samples[-1] * 1000:.1f}ms`, p99 `{p99 * 1000:.1f}ms`"
+            text += f", max `{samples[-1] * 1000:.1f}ms`"
+        text += f"\nBlocked events: `{len(self.blocked_events)}`"
+        for state in self._watchers.values():
+            done, expected = state.cycle_rate(window)
+            behind = max(1.0 - (done / expected), 0.0) * 100 if expected >= 1 else 0.0
+            text += f"\n**{state.name}**: last cycle `{state.last_duration:.2f}s`"
+            text += f", `{done}`/`{expected:.0f}` cycles ({behind:.0f}% behind)"
+            text += f", `{state.overruns}` overruns, `{state.restarts}` restarts"
+            if state.cycle_started is not None:
+                text += f", running for `{time.monotonic() - state.cycle_started:.1f}s`"
+        return text
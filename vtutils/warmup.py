@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+import traceback
+import typing as t
+
+import discord
+
+# Destination group -> key on the ``channels`` config
+GROUP_CHANNEL_KEYS = {"hololive": "holo", "nijisanji": "niji", "other": "other"}
+
+
+class StartupWarmup:
+    """Resolve and pre-fetch everything the watchers need before their first cycle.
+
+    The channels, the upcoming placeholder messages and the first API
+    snapshots are fetched concurrently, a channel that is not on the cache
+    yet will be fetched from the REST API instead of being left as None.
+    This only run once, reconnection will reuse the result (or retry it if
+    it failed).
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger("vtutils.warmup.StartupWarmup")
+        # The services were started and the cogs loaded
+        self.started = False
+        self.running = False
+        self.done = False
+        self.channels: t.Dict[str, t.Optional[discord.TextChannel]] = {
+            group: None for group in GROUP_CHANNEL_KEYS
+        }
+        self.placeholders: t.Dict[str, t.Optional[discord.Message]] = {}
+        self._snapshots: t.Dict[str, list] = {}
+        self.timings: t.Dict[str, float] = {}
+
+    async def _resolve_channel(self, bot: discord.Client, group: str, channel_id) -> t.Optional[discord.TextChannel]:
+        if channel_id is None:
+            return None
+        channel_id = int(channel_id)
+        channel = bot.get_channel(channel_id)
+        if channel is not None:
+            return channel
+        self.logger.info(f"[{group}] Channel is not cached yet, fetching it...")
+        try:
+            return await bot.fetch_channel(channel_id)
+        except (discord.HTTPException, discord.InvalidData):
+            self.logger.error(f"[{group}] Failed to fetch channel {channel_id}")
+            return None
+
+    async def _warm_group(self, bot: discord.Client, group: str, channel_id, message_id):
+        start_time = time.perf_counter()
+        channel = await self._resolve_channel(bot, group, channel_id)
+        self.channels[group] = channel
+        if channel is not None and message_id is not None:
+            try:
+                self.placeholders[group] = await channel.fetch_message(int(message_id))
+            except discord.HTTPException:
+                self.logger.error(f"[{group}] Failed to fetch the placeholder message {message_id}")
+        self.timings[group] = time.perf_counter() - start_time
+
+    async def _warm_snapshot(self, fetch_type: str, fetcher: t.Callable[[], t.Awaitable[list]]):
+        start_time = time.perf_counter()
+        try:
+            self._snapshots[fetch_type] = await fetcher()
+        except Exception as e:
+            tb = traceback.format_exception(type(e), e, e.__traceback__)
+            self.logger.error(f"[{fetch_type}] Failed to pre-fetch the first snapshot, the watcher will fetch it")
+            self.logger.error("".join(tb))
+        self.timings[fetch_type] = time.perf_counter() - start_time
+
+    async def run(
+        self,
+        bot: discord.Client,
+        channel_ids: t.Dict[str, t.Any],
+        message_ids: t.Dict[str, t.Optional[int]],
+        fetchers: t.Optional[t.Dict[str, t.Callable[[], t.Awaitable[list]]]] = None,
+    ):
+        start_time = time.perf_counter()
+        jobs = [
+            self._warm_group(bot, group, channel_ids.get(key), message_ids.get(group))
+            for group, key in GROUP_CHANNEL_KEYS.items()
+        ]
+        for fetch_type, fetcher in (fetchers or {}).items():
+            jobs.append(self._warm_snapshot(fetch_type, fetcher))
+        await asyncio.gather(*jobs)
+        self.timings["total"] = time.perf_counter() - start_time
+        self.done = True
+        self.logger.info(
+            "Warm-up done in {:.2f}s ({})".format(
+                self.timings["total"],
+                ", ".join(f"{name}: {took:.2f}s" for name, took in self.timings.items() if name != "total"),
+            )
+        )
+
+    def take_snapshot(self, fetch_type: str) -> t.Optional[list]:
+        """Get the pre-fetched snapshot, only once."""
+        return self._snapshots.pop(fetch_type, None)
+
+    def take_placeholder(self, group: str) -> t.Optional[discord.Message]:
+        """Get the pre-fetched placeholder message, only once."""
+        return self.placeholders.pop(group, None)
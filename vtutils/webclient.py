@@ -0,0 +1,88 @@
+import logging
+import typing as t
+
+import aiohttp
+
+
+class SharedHTTPClient:
+    """A single pooled aiohttp session shared by every outbound HTTP call.
+
+    The session is created lazily on the first use so it will always be
+    bound to the running event loop.
+    """
+
+    def __init__(
+        self,
+        user_agent: str = "Listeners/1.0",
+        limit: int = 100,
+        limit_per_host: int = 10,
+        keepalive_timeout: float = 60.0,
+        dns_cache_ttl: int = 300,
+        total_timeout: float = 30.0,
+        connect_timeout: float = 10.0,
+    ):
+        self.logger = logging.getLogger("vtutils.webclient.SharedHTTPClient")
+        self.user_agent = user_agent
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = aiohttp.ClientTimeout(total=total_timeout, connect=connect_timeout)
+
+        self._session: t.Optional[aiohttp.ClientSession] = None
+        self._stats: t.Dict[str, int] = {
+            "requests": 0,
+            "errors": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "dns_cache_hit": 0,
+            "dns_cache_miss": 0,
+        }
+
+    def _create_trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        def _counter(key: str):
+            async def _increment(session, trace_ctx, params):
+                self._stats[key] += 1
+
+            return _increment
+
+        trace_config.on_request_end.append(_counter("requests"))
+        trace_config.on_request_exception.append(_counter("errors"))
+        trace_config.on_connection_create_end.append(_counter("connections_created"))
+        trace_config.on_connection_reuseconn.append(_counter("connections_reused"))
+        trace_config.on_dns_cache_hit.append(_counter("dns_cache_hit"))
+        trace_config.on_dns_cache_miss.append(_counter("dns_cache_miss"))
+        return trace_config
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl,
+                use_dns_cache=True,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers={"User-Agent": self.user_agent},
+                trace_configs=[self._create_trace_config()],
+            )
+        return self._session
+
+    def stats(self) -> t.Dict[str, float]:
+        """Get the request and connection reuse stats"""
+        stats: t.Dict[str, float] = dict(self._stats)
+        total_connections = stats["connections_created"] + stats["connections_reused"]
+        stats["reuse_ratio"] = stats["connections_reused"] / total_connections if total_connections else 0.0
+        return stats
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            self.logger.info("Closing shared HTTP session...")
+            await self._session.close()
+        self._session = None
@@ -0,0 +1,87 @@
+import logging
+import time
+import typing as t
+
+import discord
+
+from .webclient import SharedHTTPClient
+
+
+class LiveWebhookPool:
+    """Create or reuse one webhook per destination channel for the live posts.
+
+    The webhooks are called through the shared pooled session, so the live
+    posts get their own rate limit bucket separate from the bot user.
+    A channel where the webhook can't be created (missing ``Manage Webhooks``)
+    will be retried after ``retry_after`` seconds, the caller should fallback
+    to the bot send in the meantime.
+    """
+
+    def __init__(
+        self,
+        bot: discord.Client,
+        http_client: SharedHTTPClient,
+        name: str = "VTuber Live",
+        retry_after: float = 600.0,
+    ):
+        self.logger = logging.getLogger("vtutils.webhooks.LiveWebhookPool")
+        self.bot = bot
+        self.http_client = http_client
+        self.name = name
+        self.retry_after = retry_after
+
+        # channel ID -> webhook
+        self._webhooks: t.Dict[int, discord.Webhook] = {}
+        # channel ID -> failed at
+        self._failed_at: t.Dict[int, float] = {}
+        # Every webhook we've posted with, including the lost one
+        self._known_ids: t.Set[int] = set()
+
+    def owns(self, message: discord.Message) -> bool:
+        """Check if the message is posted by one of our webhooks"""
+        return message.webhook_id is not None and message.webhook_id in self._known_ids
+
+    def cached_for(self, message: discord.Message) -> t.Optional[discord.Webhook]:
+        """Get the webhook that can still edit or delete the message"""
+        webhook = self._webhooks.get(message.channel.id)
+        if webhook is None or webhook.id != message.webhook_id:
+            return None
+        return webhook
+
+    def _bind(self, webhook: discord.Webhook) -> discord.Webhook:
+        return discord.Webhook.partial(
+            webhook.id, webhook.token, adapter=discord.AsyncWebhookAdapter(self.http_client.session)
+        )
+
+    async def get(self, channel: discord.TextChannel) -> t.Optional[discord.Webhook]:
+        webhook = self._webhooks.get(channel.id)
+        if webhook is not None:
+            return webhook
+        failed_at = self._failed_at.get(channel.id)
+        if failed_at is not None and time.monotonic() - failed_at < self.retry_after:
+            return None
+        try:
+            for existing in await channel.webhooks():
+                if existing.token is not None and existing.user is not None and existing.user.id == self.bot.user.id:
+                    self._known_ids.add(existing.id)
+                    webhook = existing
+            if webhook is None:
+                self.logger.info(f"Creating live webhook on #{channel}")
+                webhook = await channel.create_webhook(name=self.name, reason="Live stream posting")
+        except discord.HTTPException as e:
+            self.logger.error(f"Failed to get a webhook on #{channel} ({e}), using the bot send")
+            self._failed_at[channel.id] = time.monotonic()
+            return None
+        self._failed_at.pop(channel.id, None)
+        self._known_ids.add(webhook.id)
+        webhook = self._webhooks[channel.id] = self._bind(webhook)
+        return webhook
+
+    def invalidate(self, channel_id: int):
+        """Forget the webhook of a channel, it will be recreated on the next use"""
+        self.logger.warning(f"Live webhook for channel {channel_id} is lost")
+        self._webhooks.pop(channel_id, None)
+
+    def webhook_kwargs(self) -> t.Dict[str, str]:
+        """Make the webhook post look like the bot"""
+        return {"username": self.bot.user.name, "avatar_url": str(self.bot.user.avatar_url)}
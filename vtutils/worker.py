@@ -0,0 +1,305 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import traceback
+import typing as t
+
+from .breaker import CircuitBreaker, CircuitOpen
+from .groups import split_into_groups
+from .ihateanime import ihateanimeAPIV2
+from .platforms import PLATFORMS
+from .render import (
+    LATE_THRESHOLD,
+    LATE_TOLERANCE,
+    LIVE_EMBED_FIELDS,
+    SCHEDULE_FIELDS,
+    create_live_embed,
+    design_schedule,
+)
+from .search import SEARCH_FIELDS
+from .webclient import SharedHTTPClient
+
+
+def _require_unix():
+    """The worker mode use Unix sockets and lock files, fail clearly on the other platforms"""
+    if not hasattr(asyncio, "start_unix_server"):
+        raise RuntimeError("The worker mode need Unix sockets, disable worker.enabled on this platform.")
+
+
+class WorkerElection:
+    """A lock file election, only the process holding the lock may poll the API."""
+
+    def __init__(self, lock_path: str):
+        try:
+            import fcntl
+        except ImportError:
+            raise RuntimeError("The worker election need fcntl, disable worker.enabled on this platform.")
+
+        self._fcntl = fcntl
+        self.lock_path = lock_path
+        self._fd: t.Optional[int] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            self._fcntl.flock(fd, self._fcntl.LOCK_EX | self._fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode("utf-8"))
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is None:
+            return
+        self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+class PlanPublisher:
+    """Broadcast the action plans as newline-delimited JSON over an Unix socket.
+
+    Newly connected gateway will receive the latest plan of every type directly.
+    """
+
+    def __init__(self, socket_path: str, write_timeout: float = 5.0):
+        _require_unix()
+        self.socket_path = socket_path
+        self.write_timeout = write_timeout
+        self.logger = logging.getLogger("vtutils.worker.PlanPublisher")
+
+        self._server: t.Optional[asyncio.AbstractServer] = None
+        self._clients: t.Set[asyncio.StreamWriter] = set()
+        self._latest: t.Dict[str, bytes] = {}
+
+    async def start(self):
+        if os.path.exists(self.socket_path):
+            # Stale socket from the previous leader
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._on_client, path=self.socket_path)
+        self.logger.info(f"Publishing plans on {self.socket_path}")
+
+    async def _on_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.logger.info("Gateway connected.")
+        try:
+            for data in self._latest.values():
+                writer.write(data)
+            await asyncio.wait_for(writer.drain(), self.write_timeout)
+        except (ConnectionError, asyncio.TimeoutError):
+            writer.close()
+            return
+        self._clients.add(writer)
+        try:
+            # Gateway never send anything, this will wait until it disconnect.
+            await reader.read()
+        except ConnectionError:
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+            self.logger.info("Gateway disconnected.")
+
+    async def _send(self, writer: asyncio.StreamWriter, data: bytes):
+        try:
+            writer.write(data)
+            await asyncio.wait_for(writer.drain(), self.write_timeout)
+        except (ConnectionError, asyncio.TimeoutError):
+            self.logger.warning("Dropping slow or disconnected gateway.")
+            self._clients.discard(writer)
+            writer.close()
+
+    async def publish(self, plan: dict):
+        data = (json.dumps(plan, separators=(",", ":")) + "\n").encode("utf-8")
+        self._latest[plan["type"]] = data
+        await asyncio.gather(*[self._send(writer, data) for writer in list(self._clients)])
+
+    async def close(self):
+        for writer in list(self._clients):
+            writer.close()
+        self._clients.clear()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class PlanSubscriber:
+    """Consume the action plans published by the worker process.
+
+    Used by the gateway process instead of fetching the API by itself.
+    """
+
+    def __init__(self, socket_path: str, max_plan_age: float = 300.0, retry_delay: float = 5.0):
+        _require_unix()
+        self.socket_path = socket_path
+        self.max_plan_age = max_plan_age
+        self.retry_delay = retry_delay
+        self.logger = logging.getLogger("vtutils.worker.PlanSubscriber")
+
+        self._plans: t.Dict[str, dict] = {}
+        self._task: t.Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+
+    def latest(self, plan_type: str) -> t.Optional[dict]:
+        """Get the latest plan, or None if there's no fresh plan."""
+        plan = self._plans.get(plan_type)
+        if plan is None:
+            return None
+        if time.time() - plan["generated_at"] > self.max_plan_age:
+            return None
+        return plan
+
+    async def run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(
+                    self.socket_path, limit=2 ** 24
+                )
+            except (OSError, ConnectionError):
+                self.logger.warning(f"Worker is not available, retrying in {self.retry_delay}s")
+                await asyncio.sleep(self.retry_delay)
+                continue
+            self.logger.info(f"Connected to worker at {self.socket_path}")
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    plan = json.loads(line)
+                    self._plans[plan["type"]] = plan
+            except (ConnectionError, ValueError) as e:
+                self.logger.error(f"Worker connection error: {e}")
+            finally:
+                writer.close()
+            self.logger.warning(f"Worker disconnected, reconnecting in {self.retry_delay}s")
+            await asyncio.sleep(self.retry_delay)
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+class PlanWorker:
+    """Fetch, route and render everything outside of the gateway process.
+
+    The result are published per group as an action plan:
+        - ``live``: every stream with its key and the rendered embed.
+        - ``upcoming``: every upcoming stream and the rendered schedule text.
+    """
+
+    def __init__(self, config: dict):
+        worker_conf: dict = config.get("worker", {})
+        self.logger = logging.getLogger("vtutils.worker.PlanWorker")
+        self.ignore_lists: t.List[str] = config["ignore"]["groups"]
+        PLATFORMS.configure(config.get("platforms", {}))
+        self.live_interval: float = worker_conf.get("live_interval", 60)
+        self.upcoming_interval: float = worker_conf.get("upcoming_interval", 180)
+        self.standby_interval: float = worker_conf.get("standby_interval", 10)
+
+        self.http_client = SharedHTTPClient()
+        api_conf: dict = config.get("api", {})
+        self.api = ihateanimeAPIV2(
+            self.http_client,
+            api_conf.get("page_size", 100),
+            api_conf.get("upcoming_max_stale", 15 * 60),
+            CircuitBreaker.from_config("api.ihateani.me", api_conf.get("breaker", {})),
+        )
+        self.api.register_fields("live", "worker", LIVE_EMBED_FIELDS)
+        self.api.register_fields("upcoming", "worker", SCHEDULE_FIELDS)
+        self.api.register_fields("live", "search", SEARCH_FIELDS)
+        self.api.register_fields("upcoming", "search", SEARCH_FIELDS)
+        self.election = WorkerElection(worker_conf.get("lock", "vtuber_worker.lock"))
+        self.publisher = PlanPublisher(worker_conf.get("socket", "vtuber_worker.sock"))
+
+    def create_live_plan(self, lives_data: t.List[dict]) -> dict:
+        mapped_lives = split_into_groups(lives_data, self.ignore_lists)
+        groups = {}
+        for group, lives in mapped_lives.items():
+            groups[group] = {
+                "streams": [
+                    {
+                        "key": PLATFORMS.key_of(live),
+                        "item": live,
+                        "embed": create_live_embed(live, live["platform"]).to_dict(),
+                    }
+                    for live in lives
+                ]
+            }
+        return {"type": "live", "generated_at": time.time(), "groups": groups}
+
+    def create_upcoming_plan(self, upcoming_data: t.List[dict]) -> dict:
+        mapped_upcoming = split_into_groups(upcoming_data, self.ignore_lists)
+        groups = {}
+        for group, upcoming in mapped_upcoming.items():
+            groups[group] = {
+                "items": upcoming,
+                "schedule": design_schedule(upcoming, LATE_THRESHOLD, LATE_TOLERANCE),
+                "schedule_icons": design_schedule(
+                    upcoming, LATE_THRESHOLD, LATE_TOLERANCE, with_icons=True
+                ),
+            }
+        return {"type": "upcoming", "generated_at": time.time(), "groups": groups}
+
+    async def _poll(
+        self,
+        plan_type: str,
+        interval: float,
+        fetcher: t.Callable[[], t.Awaitable[t.List[dict]]],
+        planner: t.Callable[[t.List[dict]], dict],
+    ):
+        while True:
+            start_time = time.perf_counter()
+            try:
+                self.logger.info(f"[{plan_type}] Fetching ihateani.me API...")
+                fetched_data = await fetcher()
+                plan = planner(fetched_data)
+                await self.publisher.publish(plan)
+                self.logger.info(
+                    f"[{plan_type}] Plan published in {time.perf_counter() - start_time:.3f}s"
+                )
+            except ValueError:
+                self.logger.error(f"[{plan_type}] Received ihaapi data are incomplete, skipping...")
+            except asyncio.TimeoutError:
+                self.logger.error(f"[{plan_type}] Timeout error while fetching ihaapi data, skipping...")
+            except CircuitOpen as e:
+                self.logger.warning(f"[{plan_type}] {e}, skipping...")
+            except Exception as e:
+                tb = traceback.format_exception(type(e), e, e.__traceback__)
+                self.logger.error("".join(tb))
+            await asyncio.sleep(max(0.0, interval - (time.perf_counter() - start_time)))
+
+    async def run(self):
+        while not self.election.try_acquire():
+            self.logger.info("Another worker is polling, standing by...")
+            await asyncio.sleep(self.standby_interval)
+        self.logger.info("Elected as the polling worker.")
+        await self.publisher.start()
+        try:
+            await asyncio.gather(
+                self._poll("live", self.live_interval, self.api.fetch_lives, self.create_live_plan),
+                self._poll(
+                    "upcoming", self.upcoming_interval, self.api.fetch_upcoming, self.create_upcoming_plan
+                ),
+            )
+        finally:
+            await self.publisher.close()
+            await self.api.close()
+            await self.http_client.close()
+            self.election.release()
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import json
+import logging
+import sys
+
+from vtutils import PlanWorker
+from vtutils.runner import close_event_loop, install_signal_handlers, new_event_loop
+
+logger = logging.getLogger()
+logging.basicConfig(
+    level=logging.DEBUG,
+    handlers=[logging.FileHandler("vtuber_worker.log", "w", "utf-8")],
+    format="[%(asctime)s] - (%(name)s)[%(levelname)s](%(funcName)s): %(message)s",  # noqa: E501
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+
+console = logging.StreamHandler(sys.stdout)
+console.setLevel(logging.INFO)
+console_formatter = logging.Formatter(
+    "[%(levelname)s] (%(name)s): %(funcName)s: %(message)s"
+)
+console.setFormatter(console_formatter)
+logger.addHandler(console)
+
+
+def main():
+    logger.info("Looking up config")
+    with open("config.json", "r") as fp:
+        config = json.load(fp)
+
+    async_loop = new_event_loop()
+    worker = PlanWorker(config)
+    worker_task = asyncio.ensure_future(worker.run())
+    install_signal_handlers(async_loop, worker_task.cancel)
+    try:
+        async_loop.run_until_complete(worker_task)
+    except (KeyboardInterrupt, SystemExit, asyncio.CancelledError):
+        logger.info("Received signal to terminate worker.")
+    finally:
+        close_event_loop(async_loop)
+        logging.shutdown()
+
+
+if __name__ == "__main__":
+    main()